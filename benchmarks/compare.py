@@ -0,0 +1,45 @@
+"""Compare two benchmark results of `run.py` and report regressions.
+
+	$ python benchmarks/compare.py baseline.json results.json --threshold 0.1
+"""
+import argparse
+import json
+import sys
+
+# the metrics compared between the runs, all of them lower is better
+METRICS = ["seconds", "peak_memory_bytes", "output_bytes"]
+
+def compare(baseline, current, threshold) -> list[str]:
+	"""The regressions of `current` relative to `baseline` which exceed the relative `threshold`."""
+
+	baseline_cases = {case["case"]: case for case in baseline["cases"]}
+	regressions = []
+	for case in current["cases"]:
+		previous = baseline_cases.get(case["case"])
+		if previous is None or "error" in previous or "error" in case:
+			continue
+		for metric in METRICS:
+			if previous[metric] > 0 and (case[metric] - previous[metric]) / previous[metric] > threshold:
+				regressions.append(f"{case['case']}: {metric} {previous[metric]} -> {case[metric]}")
+	return regressions
+
+def main():
+	parser = argparse.ArgumentParser(description="Compare two benchmark results.")
+	parser.add_argument("baseline")
+	parser.add_argument("current")
+	parser.add_argument("--threshold", type=float, help="The relative increase reported as regression. (default: 0.1).", default=0.1)
+	args = parser.parse_args()
+
+	with open(args.baseline) as file:
+		baseline = json.load(file)
+	with open(args.current) as file:
+		current = json.load(file)
+
+	regressions = compare(baseline, current, args.threshold)
+	for regression in regressions:
+		print(regression)
+	if regressions:
+		sys.exit(1)
+
+if __name__ == "__main__":
+	main()
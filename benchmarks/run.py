@@ -0,0 +1,136 @@
+"""Throughput benchmarks of cardimpose on synthetic decks.
+
+Every case imposes a synthetic deck in a fresh process and records the wall time, the peak memory,
+the number of sheets per second and the size of the output. The results are stored as JSON,
+so that two runs (e.g. of two releases) can be compared with `compare.py`.
+
+	$ python benchmarks/run.py --output results.json
+	$ python benchmarks/run.py --suite full --output results-full.json
+"""
+import argparse
+import itertools
+import json
+import multiprocessing
+import os
+import platform
+import queue
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import fitz
+from cardimpose.cardimpose import CardImpose
+from cardimpose.layout import Mode, Backside
+from synthetic import deck_path
+
+SUITES = {
+	# (pages, size, kind) of the decks
+	"quick": [(10, "business", "vector"), (100, "poker", "vector"), (20, "tarot", "images")],
+	"full": [
+		(10, "business", "vector"), (100, "poker", "vector"), (1000, "business", "vector"), (10000, "business", "vector"),
+		(10, "tarot", "images"), (100, "business", "images"), (1000, "poker", "images"),
+	],
+}
+
+GRIDS = ["auto", (2, 2), (3, 3)]
+
+# seconds after which a case is stopped and reported as failed
+DEFAULT_TIMEOUT = 600
+
+def suite_cases(decks):
+	"""The (deck, mode, backside, grid) of every case. Packed cards ignore the grid, so they are run once per deck and backside."""
+
+	for deck, backside in itertools.product(decks, Backside):
+		for mode, grid in itertools.product([Mode.DUPLICATES, Mode.SINGLES], GRIDS):
+			yield deck, mode, backside, grid
+		yield deck, Mode.PACKED, backside, "auto"
+
+def _run_case(deck, mode, backside, grid, results):
+	try:
+		_measure_case(deck, mode, backside, grid, results)
+	except Exception as e:
+		# always report back, the parent is waiting for a result
+		results.put({"error": f"{type(e).__name__}: {e}"})
+
+def _measure_case(deck, mode, backside, grid, results):
+	impose = CardImpose(deck).set_mode(mode).set_backside(backside).set_page_size("A3")
+	with tempfile.TemporaryDirectory() as directory:
+		output = os.path.join(directory, "out.pdf")
+		start = time.perf_counter()
+		document = impose.fill_page() if grid == "auto" else impose.impose(*grid)
+		impose.save(document, output)
+		seconds = time.perf_counter() - start
+		results.put({
+			"seconds": round(seconds, 4),
+			"sheets": document.page_count,
+			"sheets_per_second": round(document.page_count / seconds, 1),
+			"output_bytes": os.path.getsize(output),
+			# ru_maxrss is given in kilobytes on Linux
+			"peak_memory_bytes": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024,
+		})
+
+def run_case(deck, mode, backside, grid, timeout=DEFAULT_TIMEOUT) -> dict:
+	"""Run a single case in a fresh process, so that its peak memory is measured in isolation.
+	A case that crashes its process or takes longer than `timeout` seconds is reported as failed.
+	"""
+
+	context = multiprocessing.get_context("spawn")
+	results = context.Queue()
+	process = context.Process(target=_run_case, args=(deck, mode, backside, grid, results))
+	process.start()
+	deadline = time.monotonic() + timeout
+	result = None
+	while result is None:
+		try:
+			result = results.get(timeout=1)
+		except queue.Empty:
+			# a process killed e.g. by the OOM killer never reports back
+			if process.exitcode is not None:
+				result = {"error": f"The process exited with code {process.exitcode}."}
+			elif time.monotonic() > deadline:
+				process.kill()
+				result = {"error": f"Timed out after {timeout} seconds."}
+	process.join()
+	return result
+
+def environment() -> dict:
+	try:
+		commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True).stdout.strip()
+	except OSError:
+		commit = None
+	return {
+		"commit": commit,
+		"python": platform.python_version(),
+		"pymupdf": fitz.VersionBind,
+		"platform": platform.platform(),
+	}
+
+def main():
+	parser = argparse.ArgumentParser(description="Benchmark cardimpose on synthetic decks.")
+	parser.add_argument("--suite", choices=list(SUITES), default="quick")
+	parser.add_argument("--decks", help="The directory where the generated decks are cached.", default=os.path.join(tempfile.gettempdir(), "cardimpose-decks"))
+	parser.add_argument("--output", help="The path where the JSON results are stored (default: stdout).")
+	parser.add_argument("--timeout", type=float, help=f"The seconds after which a case is reported as failed (default: {DEFAULT_TIMEOUT}).", default=DEFAULT_TIMEOUT)
+	args = parser.parse_args()
+
+	os.makedirs(args.decks, exist_ok=True)
+	cases = []
+	for (pages, size, kind), mode, backside, grid in suite_cases(SUITES[args.suite]):
+		name = f"{kind}-{size}-{pages}/{mode.name.lower()}/{backside.name.lower()}/{grid if grid == 'auto' else '%dx%d' % grid}"
+		result = {"case": name, **run_case(deck_path(args.decks, pages, size, kind), mode, backside, grid, args.timeout)}
+		print(json.dumps(result), file=sys.stderr)
+		cases.append(result)
+
+	results = {"environment": environment(), "suite": args.suite, "cases": cases}
+	if args.output:
+		with open(args.output, "w") as file:
+			json.dump(results, file, indent=2)
+	else:
+		json.dump(results, sys.stdout, indent=2)
+
+if __name__ == "__main__":
+	main()
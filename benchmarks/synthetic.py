@@ -0,0 +1,57 @@
+"""Generator for synthetic card decks used by the benchmarks."""
+import fitz
+import os
+import random
+
+from cardimpose.parse import parse_length
+
+# card sizes including 3mm bleed on every side
+CARD_SIZES = {
+	"business": ("91mm", "61mm"),
+	"poker": ("69mm", "94mm"),
+	"tarot": ("76mm", "126mm"),
+}
+
+BLEED = "3mm"
+
+def _noise_image(seed, size=600):
+	"""An incompressible RGB image, standing in for photos in the card art."""
+
+	samples = random.Random(seed).randbytes(size * size * 3)
+	return fitz.Pixmap(fitz.csRGB, size, size, samples, False).tobytes("png")
+
+def generate_deck(path, pages, size="business", kind="vector", seed=0):
+	"""Generate a card pdf with `pages` pages of the given card `size`.
+	`kind` is either "vector" (shapes and text only) or "images" (a full bleed image on every page).
+	"""
+
+	width, height = (parse_length(length) for length in CARD_SIZES[size])
+	bleed = parse_length(BLEED)
+	rng = random.Random(seed)
+	images = [_noise_image(seed + i) for i in range(8)] if kind == "images" else []
+
+	document = fitz.Document()
+	for number in range(pages):
+		page = document.new_page(width=width, height=height)
+		page.set_trimbox(fitz.Rect(bleed, bleed, width - bleed, height - bleed))
+
+		if kind == "images":
+			page.insert_image(page.rect, stream=images[number % len(images)], keep_proportion=False)
+		else:
+			page.draw_rect(page.rect, fill=(rng.random(), rng.random(), rng.random()), width=0)
+			for _ in range(10):
+				center = fitz.Point(rng.uniform(0, width), rng.uniform(0, height))
+				page.draw_circle(center, rng.uniform(2, 20), color=(0, 0, 0), fill=(rng.random(), rng.random(), rng.random()))
+
+		page.insert_text((bleed + 10, bleed + 20), f"Card {number + 1}", fontsize=12)
+
+	document.save(path, garbage=1, deflate=True)
+	return path
+
+def deck_path(directory, pages, size, kind):
+	"""Generate the deck once and return its path in `directory`."""
+
+	path = os.path.join(directory, f"{kind}-{size}-{pages}.pdf")
+	if not os.path.exists(path):
+		generate_deck(path, pages, size, kind)
+	return path
@@ -1 +1,6 @@
-from cardimpose.cardimpose import CardImpose
\ No newline at end of file
+def __getattr__(name):
+	# `CardImpose` loads PyMuPDF, which is only imported when it is used, so that the command line starts quickly
+	if name == "CardImpose":
+		from cardimpose.cardimpose import CardImpose
+		return CardImpose
+	raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
\ No newline at end of file
@@ -0,0 +1,131 @@
+from cardimpose.cli import parse_args, run
+
+import argparse
+import concurrent.futures
+import contextlib
+import csv
+import io
+import json
+import sys
+import time
+
+def read_manifest(path) -> list[dict]:
+	"""Read the jobs of a manifest file.
+	A JSON manifest contains a list of jobs (or an object with a "jobs" list), a CSV manifest contains one job per row.
+	The keys of each job are the long command line options (e.g. "page-size") and "card" for the card pdf, or a list of card pdfs.
+	"""
+
+	with open(path, newline="") as file:
+		if path.lower().endswith(".csv"):
+			# empty cells use the default of the option
+			return [{key: value for key, value in row.items() if value != ""} for row in csv.DictReader(file)]
+
+		manifest = json.load(file)
+		if isinstance(manifest, dict):
+			manifest = manifest.get("jobs", [])
+		if not isinstance(manifest, list):
+			raise ValueError(f"Manifest \"{path}\" does not contain a list of jobs.")
+		return manifest
+
+def job_arguments(job) -> list[str]:
+	"""Convert a job of the manifest into the equivalent command line arguments."""
+
+	arguments = []
+	for key, value in job.items():
+		if key == "card":
+			continue
+
+		option = f"--{key}"
+		# flags like "no-crop-marks" are given as booleans (or as "true"/"false" in CSV files)
+		if isinstance(value, bool) or str(value).lower() in ("true", "false"):
+			if value is True or str(value).lower() == "true":
+				arguments.append(option)
+		else:
+			arguments += [option, str(value)]
+
+	if "card" not in job:
+		raise ValueError("Job does not specify a card.")
+	# the card is given after "--", so that it is never mistaken for an option
+	cards = job["card"] if isinstance(job["card"], list) else [job["card"]]
+	return arguments + ["--"] + [str(card) for card in cards]
+
+def parse_job(job):
+	"""Parse the options of a job like the command line options.
+	Invalid options raise a ValueError instead of exiting.
+	"""
+
+	# argparse reports invalid options on stderr and exits, which is captured for the error instead
+	errors = io.StringIO()
+	try:
+		with contextlib.redirect_stderr(errors):
+			# the keys are checked against the full option names, an abbreviation could select an option the caller meant to forbid
+			return parse_args(job_arguments(job), allow_abbrev=False)
+	except SystemExit:
+		raise ValueError(errors.getvalue().strip().splitlines()[-1])
+
+def run_job(job) -> dict:
+	"""Run a single job of the manifest and report its result."""
+
+	start = time.perf_counter()
+	result = {"card": None}
+	try:
+		if not isinstance(job, dict):
+			raise ValueError("Job is not an object of options.")
+		result["card"] = job.get("card")
+		args = parse_job(job)
+		# the report is written to stdout, and every job has to finish
+		if args.output == "-":
+			raise ValueError("The output of a job can not be written to stdout.")
+		if args.watch:
+			raise ValueError("Jobs can not watch their card pdf.")
+		result["outputs"] = run(args)
+		result["status"] = "ok"
+	except (ValueError, RuntimeError, OSError) as e:
+		result["status"] = "error"
+		result["error"] = str(e)
+	result["seconds"] = round(time.perf_counter() - start, 3)
+	return result
+
+def run_batch(jobs, workers=1) -> dict:
+	"""Run all jobs in this process, or with a pool of `workers` processes, and return a report of their results."""
+
+	start = time.perf_counter()
+	if workers > 1:
+		with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as executor:
+			results = list(executor.map(run_job, jobs))
+	else:
+		results = [run_job(job) for job in jobs]
+
+	results = [{"job": index, **result} for index, result in enumerate(results)]
+
+	return {
+		"jobs": results,
+		"succeeded": sum(result["status"] == "ok" for result in results),
+		"failed": sum(result["status"] != "ok" for result in results),
+		"seconds": round(time.perf_counter() - start, 3),
+	}
+
+def batch_main(argv):
+	parser = argparse.ArgumentParser(
+                    prog='cardimpose batch',
+                    description='Impose all jobs listed in a JSON or CSV manifest.')
+	parser.add_argument("manifest", metavar="MANIFEST", help="The path of the JSON or CSV manifest listing the jobs.")
+	parser.add_argument("--report", help="The path where the JSON report of the results is stored (default: stdout).")
+	parser.add_argument("--jobs", type=int, help="The number of worker processes running the jobs. (default: 1).", default=1)
+	args = parser.parse_args(argv)
+
+	try:
+		report = run_batch(read_manifest(args.manifest), args.jobs)
+	except (ValueError, OSError) as e:
+		print(f"Error: {e}", file=sys.stderr)
+		exit(1)
+
+	if args.report:
+		with open(args.report, "w") as file:
+			json.dump(report, file, indent=2)
+	else:
+		json.dump(report, sys.stdout, indent=2)
+		print()
+
+	if report["failed"]:
+		exit(1)
@@ -0,0 +1,137 @@
+import fitz
+import hashlib
+import json
+import os
+import re
+import tempfile
+
+from cardimpose.defaults import DEFAULT_CACHE_SIZE
+
+# changes whenever the resulting documents change for the same settings, invalidating old entries
+CACHE_VERSION = 1
+
+# the names of the files written by the cache, other files in its directory are never listed or removed
+ENTRY_NAME = re.compile(r"[0-9a-f]{64}\.(pdf|png|image)")
+
+class ResultCache:
+	"""An on-disk cache of resulting documents, keyed by the content of the card pdf and the settings.
+	When the cache grows beyond `max_size` bytes, the least recently used documents are removed.
+	Other data, e.g. thumbnails of sheets, can be kept with `get_data` and `put_data` and a different suffix.
+	"""
+
+	DEFAULT_MAX_SIZE = DEFAULT_CACHE_SIZE
+
+	def __init__(self, directory, max_size=DEFAULT_MAX_SIZE):
+		self.directory = directory
+		self.max_size = max_size
+		os.makedirs(directory, exist_ok=True)
+		self.stats_path = os.path.join(directory, "stats.json")
+
+	@staticmethod
+	def key(card_hash, settings) -> str:
+		"""The key of the document imposed from the card pdf with the given hash using the given settings."""
+
+		normalized = json.dumps({"version": CACHE_VERSION, "card": card_hash, "settings": settings}, sort_keys=True)
+		return hashlib.sha256(normalized.encode()).hexdigest()
+
+	def _path(self, key, suffix=".pdf"):
+		if not ENTRY_NAME.fullmatch(f"{key}{suffix}"):
+			raise ValueError(f"Invalid cache entry \"{key}{suffix}\".")
+		return os.path.join(self.directory, f"{key}{suffix}")
+
+	def get(self, key) -> fitz.Document:
+		"""The cached document, or None."""
+
+		data = self.get_data(key)
+		return None if data is None else fitz.open("pdf", data)
+
+	def get_data(self, key, suffix=".pdf") -> bytes:
+		"""The cached data, or None."""
+
+		path = self._path(key, suffix)
+		try:
+			with open(path, "rb") as file:
+				data = file.read()
+		except FileNotFoundError:
+			self._count(misses=1)
+			return None
+
+		# the modification time marks the last use for the eviction
+		os.utime(path)
+		self._count(hits=1, bytes_saved=len(data))
+		return data
+
+	def put(self, key, document):
+		"""Store a document and evict the least recently used ones if the cache is too large."""
+
+		self.put_data(key, document.tobytes())
+
+	def put_data(self, key, data, suffix=".pdf", evict=True):
+		"""Store data, with `evict` also evict the least recently used entries if the cache is too large."""
+
+		self._write(self._path(key, suffix), data)
+		if evict:
+			self.evict()
+
+	def _write(self, path, data):
+		# written to a temporary file first, so that concurrent readers never see a partial file
+		descriptor, temporary = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+		with os.fdopen(descriptor, "wb") as file:
+			file.write(data)
+		os.replace(temporary, path)
+
+	def _count(self, **counts):
+		# The statistics are kept in the directory, so that they cover all processes using the cache.
+		# Concurrent updates may lose a count, which is acceptable for statistics.
+		stats = self._load_stats()
+		for name, count in counts.items():
+			stats[name] += count
+		self._write(self.stats_path, json.dumps(stats).encode())
+
+	def _load_stats(self) -> dict:
+		stats = {"hits": 0, "misses": 0, "bytes_saved": 0}
+		try:
+			with open(self.stats_path) as file:
+				stats.update(json.load(file))
+		except (FileNotFoundError, ValueError):
+			pass
+		return stats
+
+	def entries(self) -> list[os.DirEntry]:
+		"""The cached entries, from the least to the most recently used."""
+
+		with os.scandir(self.directory) as entries:
+			documents = [entry for entry in entries if ENTRY_NAME.fullmatch(entry.name) and entry.is_file()]
+		return sorted(documents, key=lambda entry: entry.stat().st_mtime)
+
+	def evict(self):
+		entries = self.entries()
+		size = sum(entry.stat().st_size for entry in entries)
+		for entry in entries:
+			if size <= self.max_size:
+				break
+			size -= entry.stat().st_size
+			try:
+				os.remove(entry.path)
+			except FileNotFoundError:
+				pass
+
+	def clear(self):
+		"""Remove all cached entries and reset the statistics."""
+
+		for entry in self.entries():
+			os.remove(entry.path)
+		if os.path.exists(self.stats_path):
+			os.remove(self.stats_path)
+
+	def stats(self) -> dict:
+		"""The number of hits and misses, the size of the documents returned from the cache instead of being imposed again,
+		and the number and size of the cached documents.
+		"""
+
+		entries = self.entries()
+		return {
+			**self._load_stats(),
+			"entries": len(entries),
+			"size": sum(entry.stat().st_size for entry in entries),
+		}
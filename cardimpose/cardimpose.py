@@ -1,33 +1,87 @@
 #!/usr/bin/env python
+import array
+import contextlib
+import copy
 import fitz
+import hashlib
+import io
 import math
+import os
+import time
 
+from cardimpose import defaults
 from cardimpose.parse import parse_length, parse_tuple, parse_page_spec
-from cardimpose.layout import Mode, Backside, generate_layout
+from cardimpose.pages import PageSequence
+from cardimpose.layout import Mode, Backside, generate_layout, split_front_back, get_ordering
+from cardimpose.plan import ImpositionPlan, SheetPlan, CardSlot
+from cardimpose.geometry import GeometryIndex
+from cardimpose.embed import CardEmbedder, SheetContent, DeduplicationStats
+from cardimpose.parallel import impose_parallel
+from cardimpose.optimize import save_options, save_document
+from cardimpose.cropmarks import CropMarkStyle, merge_lines, cut_guides, clip_lines
+from cardimpose.packing import pack
+from cardimpose.images import is_image_source, open_images
+from cardimpose.source import is_path, source_name, read_source, open_source, content_hash, page_hashes
+from cardimpose.sources import CardDeck
+from cardimpose.cache import ResultCache
+from cardimpose.incremental import impose_incremental
+from cardimpose.stocks import stock_size, search_layouts
+from cardimpose.raster import rasterize, DEFAULT_DPI
+from cardimpose.resample import resample_images, check_resolution, check_quality, DEFAULT_QUALITY
 
 class CardImpose:
-	DEFAULT_GUTTER = "0mm"
-	DEFAULT_MARGIN = "10mm"
-	DEFAULT_BLEED = "0mm"
-	DEFAULT_PAPER_SIZE = "A4"
-	DEFAULT_CM_LENGTH = "5mm"
-	DEFAULT_CM_THICKNESS = "0.2mm"
-	DEFAULT_CM_DISTANCE = "2mm"
-	DEFAULT_CM_NO_SMALLER_THAN = "0.5mm"
-	DEFAULT_PAGE_SPEC = "."
+	DEFAULT_GUTTER = defaults.DEFAULT_GUTTER
+	DEFAULT_MARGIN = defaults.DEFAULT_MARGIN
+	DEFAULT_BLEED = defaults.DEFAULT_BLEED
+	DEFAULT_PAPER_SIZE = defaults.DEFAULT_PAPER_SIZE
+	DEFAULT_CM_LENGTH = defaults.DEFAULT_CM_LENGTH
+	DEFAULT_CM_THICKNESS = defaults.DEFAULT_CM_THICKNESS
+	DEFAULT_CM_DISTANCE = defaults.DEFAULT_CM_DISTANCE
+	DEFAULT_CM_NO_SMALLER_THAN = defaults.DEFAULT_CM_NO_SMALLER_THAN
+	DEFAULT_CM_STYLE = CropMarkStyle.CORNERS
+	DEFAULT_PAGE_SPEC = defaults.DEFAULT_PAGE_SPEC
 	DEFAULT_MODE = Mode.DUPLICATES
 	DEFAULT_BACKSIDE = Backside.SINGLESIDED
+	DEFAULT_ORDERING = "sequential"
+	DEFAULT_CHUNK_SIZE = defaults.DEFAULT_CHUNK_SIZE
+	DEFAULT_JOBS = defaults.DEFAULT_JOBS
+	DEFAULT_OUTPUT_PRESET = defaults.DEFAULT_OUTPUT_PRESET
 
 
-	def __init__(self, card_path: str):
-		"""Construct a new `CardImpose` to impose the card contained in the `card_path` pdf file."""
+	def __init__(self, card, card_size=None, jobs=None):
+		"""Construct a new `CardImpose` to impose the card contained in the `card` pdf.
+		`card` is either a path, the content of the pdf as bytes, bytearray or memoryview, or a binary file object.
+		Large files are memory-mapped instead of being read into memory.
 
-		try:
-			self.card = fitz.open(card_path)
-		except RuntimeError as e:
-			raise RuntimeError(f"Invalid pdf file \"{card_path}\".")
+		`card` can also be a directory or a glob pattern (e.g. "cards/*.png") of images, one card per image.
+		Their size is derived from the resolution of the images, unless `card_size` (e.g. "63mmx88mm") is given.
+		They are converted by `jobs` worker processes, which are also used for imposing, see `set_jobs`.
 
-		self.pages = range(0, self.card.page_count)
+		A list of card pdfs is imposed as one `CardDeck`, whose pages are numbered consecutively.
+		Each of them can be given as a pair (card pdf, page spec) to only use some of its pages.
+		"""
+
+		jobs = CardImpose.DEFAULT_JOBS if jobs is None else jobs
+		if jobs < 1:
+			raise ValueError(f"Number of jobs must be at least 1, not {jobs}.")
+
+		start = time.perf_counter()
+		self.card_hash = None # the hash of the card pdf, computed when first needed
+		self.page_map = None # the page of the card pdf showing each image, for cards given as images
+		if isinstance(card, list):
+			if card_size is not None:
+				raise ValueError("The card size can only be set for cards given as images.")
+			# the card pdfs are kept and opened on demand by the deck
+			self.card = CardDeck(card)
+			self.card_path = ", ".join(self.card.names)
+			self.card_data = None
+			self.geometry = self.card.geometry
+			pages = self.card.pages()
+		else:
+			pages = self._open_card(card, card_size, jobs)
+		self.open_seconds = time.perf_counter() - start
+		self.observers = []
+		self.pages = pages
 
 		self.gutter_x = parse_length(CardImpose.DEFAULT_GUTTER)
 		self.gutter_y = self.gutter_x
@@ -46,10 +100,103 @@ class CardImpose:
 		self.fixed_crop_mark_distance = False # whether the distance was explicitly set by the user
 		self.crop_mark_no_inner = False
 		self.crop_mark_no_smaller_than = parse_length(CardImpose.DEFAULT_CM_NO_SMALLER_THAN)
+		self.disable_crop_marks = False
+		self.crop_mark_style = CardImpose.DEFAULT_CM_STYLE
 
 		self.mode = CardImpose.DEFAULT_MODE
 		self.backside = CardImpose.DEFAULT_BACKSIDE
+		self.ordering = CardImpose.DEFAULT_ORDERING
+		self.card_rotation = 0 # the clockwise rotation of the cards on the sheet
+		self.jobs = jobs
+		self.output_preset = CardImpose.DEFAULT_OUTPUT_PRESET
+		self.cache = None
+		self.layouts = None # the `LayoutCandidate`s found by `optimize_layout`
+		self.deduplication = DeduplicationStats() # the identical resources of the cards stored only once
+		self.image_resolution = None # the maximum resolution and quality set by `downsample_images`
+		self.resampling = None # the `ResampleStats` of `downsample_images`
+
+	def _open_card(self, card, card_size, jobs) -> PageSequence:
+		"""Open a single card pdf or the card images and return all their pages."""
+
+		self.card_path = source_name(card)
+		if is_image_source(card):
+			if isinstance(card_size, str):
+				card_size = parse_tuple(card_size)
+			elif card_size is not None:
+				card_size = (parse_length(card_size[0]), parse_length(card_size[1]))
+			# the images are converted into a pdf, which is then imposed like any other card pdf
+			self.card_data, self.page_map, self.card_hash = open_images(card, card_size, jobs)
+		elif card_size is not None:
+			raise ValueError("The card size can only be set for cards given as images.")
+		else:
+			# a path or a buffer holding the pdf, kept to reopen the pdf in worker processes
+			self.card_data = read_source(card)
+		try:
+			self.card = open_source(self.card_data)
+		except RuntimeError as e:
+			raise RuntimeError(f"Invalid pdf file \"{self.card_path}\".")
+
+		# the page boxes of all pages, so that the pages do not have to be loaded again while imposing
+		self.geometry = GeometryIndex(self.card)
+		return self._map_pages(PageSequence(range(0, self.input_page_count)))
+
+	def __getstate__(self):
+		state = self.__dict__.copy()
+		state["observers"] = []
+		if isinstance(self.card, CardDeck):
+			# the deck opens its card pdfs again on demand
+			return state
+
+		# the opened card pdf can not be pickled, it is opened again from the path or data instead
+		del state["card"]
+		del state["geometry"]
+		if not is_path(self.card_data):
+			state["card_data"] = bytes(self.card_data)
+		return state
+
+	def __setstate__(self, state):
+		self.__dict__.update(state)
+		if "card" not in state:
+			self.card = open_source(self.card_data)
+			self.geometry = GeometryIndex(self.card)
+
+
+	def copy(self):
+		"""A copy with the same settings, sharing the opened card pdf.
+		Changing the settings of the copy does not affect the original.
+		"""
+
+		impose = copy.copy(self)
+		impose.observers = []
+		impose.deduplication = DeduplicationStats()
+		return impose
 
+	def add_observer(self, observer):
+		"""Register a callback `observer(phase, seconds, sheet)`, which is called after each phase of the imposition.
+		`sheet` is the index of the output sheet for phases done per sheet, otherwise None.
+		See `cardimpose.metrics.PHASES` for the reported phases.
+		"""
+
+		self.observers.append(observer)
+		# the card pdf was already opened when constructing
+		observer("open", self.open_seconds, None)
+		if self.resampling is not None:
+			observer("resample", self.resample_seconds, None)
+		return self
+
+	@contextlib.contextmanager
+	def _phase(self, phase, sheet=None):
+		"""Time the enclosed code and report it to the observers."""
+
+		if not self.observers:
+			yield
+			return
+
+		start = time.perf_counter()
+		yield
+		seconds = time.perf_counter() - start
+		for observer in self.observers:
+			observer(phase, seconds, sheet)
 
 	def set_gutter(self, gutter):
 		"""Set both the vertical and horizontal gutter between the cards."""
@@ -71,12 +218,39 @@ class CardImpose:
 		return self
 
 	def set_pages(self, pagespec):
-		""""Set the desired range of pages of the card pdf to impose."""
+		""""Set the desired range of pages of the card pdf to impose.
+		Either a page spec (e.g. "1-3,10x4") or a `PageSequence` of page indices.
+		"""
+
+		if isinstance(pagespec, str):
+			self.pages = self._map_pages(parse_page_spec(pagespec, self.input_page_count))
+			return self
 
-		self.pages = parse_page_spec(pagespec, self.card.page_count)
+		pages = PageSequence(pagespec)
+		for run, _ in pages.runs:
+			# the first and last page of a range are its bounds, its stop may lie past the last page
+			if not (0 <= run[0] < self.input_page_count and 0 <= run[-1] < self.input_page_count):
+				raise ValueError(f"The pages {pages} do not exist in the card pdf.")
+		self.pages = self._map_pages(pages)
 		return self
 
-	def set_crop_marks(self, length=None, distance=None, no_inner=False, no_smaller_than=None, thickness=None, disable_crop_marks=None):
+	@property
+	def input_page_count(self) -> int:
+		"""The number of pages of the card pdf or of all card pdfs of a deck, or of images for cards given as images."""
+
+		return self.card.page_count if self.page_map is None else len(self.page_map)
+
+	def _map_pages(self, pages) -> PageSequence:
+		"""Translate the selected images into the pages of the card pdf, where identical images share a page."""
+
+		if self.page_map is None:
+			return pages
+		mapped = PageSequence()
+		for page, count in pages.iter_runs():
+			mapped.append(self.page_map[page], count)
+		return mapped
+
+	def set_crop_marks(self, length=None, distance=None, no_inner=False, no_smaller_than=None, thickness=None, disable_crop_marks=None, style=None):
 		"""Configure the crop marks.
 
 		length: the length of the crop marks.
@@ -85,6 +259,7 @@ class CardImpose:
 		no_smaller_than: hide crop marks that are smaller than the given length.
 		thickness: the thickness of the crop marks.
 		disable_crop_marks: whether to not insert any crop marks.
+		style: either CropMarkStyle.CORNERS or CropMarkStyle.GUIDES.
 		"""
 
 		if length:
@@ -100,21 +275,19 @@ class CardImpose:
 			self.crop_mark_thickness = parse_length(thickness)
 		if disable_crop_marks is not None:
 			self.disable_crop_marks = disable_crop_marks
+		if style is not None:
+			self.crop_mark_style = style
 		return self
 
 	def set_page_size(self, size, rotate=False):
 		"""Set the size of the resulting document.
-		Can be either a paper format (e.g. "A4"), or a tuple of width and height (e.g. ("2cm", "2cm")).
+		Can be either a paper format (e.g. "A4" or "SRA3"), or a tuple of width and height (e.g. ("2cm", "2cm")).
 		"""
 
 		# if the size is given as a string, we interpret it as a page format (e.g. "A4")
 		# or as a string containing the width and height dimensions
 		if type(size) == str:
-			format_size = fitz.paper_size(size)
-			if format_size == (-1,-1):
-				self.output_size = parse_tuple(size)
-			else:
-				self.output_size = format_size
+			self.output_size = stock_size(size)
 		else:
 			# otherwise, we expect a tuple of width and height
 			self.output_size = (parse_length(size[0]), parse_length(size[1]))
@@ -139,15 +312,171 @@ class CardImpose:
 		self.backside = backside
 		return self
 
+	def set_ordering(self, ordering):
+		"""Set the order in which the cards of Mode.SINGLES are placed on the sheets.
+		Can be either "sequential" (sheet by sheet), "cut-and-stack" (the piles of a cut stack of sheets are in order),
+		or a function `ordering(count, cards_per_sheet)` returning the position `sheet * cards_per_sheet + slot` of every card.
+		Functions have to be defined at module level to be used with several jobs.
+		"""
+
+		get_ordering(ordering) # validate the ordering
+		self.ordering = ordering
+		return self
+
+	def set_card_rotation(self, rotation):
+		"""Rotate all cards on the sheet clockwise by 0 or 90 degrees (ignored for Mode.PACKED, which rotates cards as needed)."""
+
+		if rotation not in (0, 90):
+			raise ValueError(f"Cards can only be rotated by 0 or 90 degrees, not {rotation}.")
+		self.card_rotation = rotation
+		return self
+
+	def set_jobs(self, jobs):
+		"""Set the number of worker processes used to impose the sheets."""
+
+		if jobs < 1:
+			raise ValueError(f"Number of jobs must be at least 1, not {jobs}.")
+		self.jobs = jobs
+		return self
+
+	def set_max_open(self, max_open):
+		"""Set the number of card pdfs of a deck which are kept open at the same time."""
+
+		if max_open < 1:
+			raise ValueError(f"Number of open card pdfs must be at least 1, not {max_open}.")
+		if isinstance(self.card, CardDeck):
+			self.card.pool.max_open = max_open
+			self.card.pool.trim()
+		return self
+
+	def set_output_preset(self, preset):
+		"""Set the optimizations applied when saving the resulting document.
+		Can be either "none", "fast", "small" or "web".
+		"""
+
+		save_options(preset) # validate the preset
+		self.output_preset = preset
+		return self
+
+	def settings(self, rows=None, cols=None) -> dict:
+		"""All settings which affect the resulting document, normalized so that equal settings give equal dicts.
+		If `rows` and `cols` are not given, they are the ones filling the page.
+		"""
+
+		if self.mode != Mode.PACKED and (rows is None or cols is None):
+			rows, cols = self._calculate_nup()
+
+		return {
+			"pages": self.pages.to_list(),
+			"nup": [rows, cols],
+			"page_size": [round(length, 3) for length in self.output_size],
+			"gutter": [round(self.gutter_x, 3), round(self.gutter_y, 3)],
+			"margin": [round(self.margin_x, 3), round(self.margin_y, 3)],
+			"bleed": round(self.bleed, 3) if self.fixed_bleed else None,
+			"crop_marks": None if self.disable_crop_marks else {
+				"length": round(self.crop_mark_length, 3),
+				"distance": round(self.crop_mark_distance, 3) if self.fixed_crop_mark_distance else None,
+				"thickness": round(self.crop_mark_thickness, 3),
+				"no_inner": self.crop_mark_no_inner,
+				"no_smaller_than": round(self.crop_mark_no_smaller_than, 3),
+				"style": self.crop_mark_style.name,
+			},
+			"mode": self.mode.name,
+			"backside": self.backside.name,
+			"ordering": self._ordering_setting(rows, cols),
+			"card_rotation": self.card_rotation,
+			"image_resolution": self.image_resolution,
+		}
+
+	def _ordering_setting(self, rows, cols):
+		"""The name of the ordering, or for a function, which has no unique name (e.g. a lambda), the hash of the positions it gives the cards."""
+
+		if isinstance(self.ordering, str):
+			return self.ordering
+		if self.mode != Mode.SINGLES:
+			# only the cards of Mode.SINGLES are ordered
+			return "function"
+		front, _ = split_front_back(self.pages, self.backside)
+		positions = array.array("q", self.ordering(len(front), rows * cols))
+		return hashlib.sha256(positions.tobytes()).hexdigest()
+
+	def set_cache(self, cache):
+		"""Reuse documents imposed earlier with the same card pdf and settings.
+		`cache` is either a `ResultCache` or the directory of one, or None to disable caching.
+		"""
+
+		if cache is not None and not isinstance(cache, ResultCache):
+			cache = ResultCache(cache)
+		self.cache = cache
+		return self
+
+	def save(self, document, path):
+		"""Save a resulting document with the optimizations of the output preset.
+		`path` can also be a writable binary file object.
+		"""
+
+		with self._phase("save"):
+			save_document(document, path, self.output_preset)
+
+	def optimize_layout(self, stocks=None, prices=None) -> list:
+		"""Choose the stock, its orientation and the rotation of the cards which need the fewest sheets,
+		or which are the cheapest given `prices` (stock -> price per sheet), for filling the pages with cards.
+		Returns all `LayoutCandidate`s which fit, the chosen one first.
+		"""
+
+		self.layouts = search_layouts(self, stocks, prices)
+		self.output_size = self.layouts[0].page_size
+		self.card_rotation = self.layouts[0].card_rotation
+		return self.layouts
+
+	def downsample_images(self, max_dpi, quality=DEFAULT_QUALITY):
+		"""Downsample the images of the card pdf which are shown at more than `max_dpi`,
+		encoding them as JPEG with `quality` (1-100) or without loss with "lossless".
+		Uses the worker processes and the cache set before. Returns the `ResampleStats`.
+		"""
+
+		check_resolution(max_dpi)
+		check_quality(quality)
+		if isinstance(self.card, CardDeck):
+			raise ValueError("Images can only be downsampled for a single card pdf.")
+		if self.image_resolution is not None:
+			raise RuntimeError("The images of the card pdf were already downsampled.")
+
+		start = time.perf_counter()
+		# the cached documents are keyed by the original card pdf and the resolution
+		self.content_hash()
+		self.card_data, self.resampling = resample_images(self.card_data, max_dpi, quality, self.jobs, self.cache)
+		self.card = open_source(self.card_data)
+		self.geometry = GeometryIndex(self.card)
+		self.image_resolution = {"max_dpi": max_dpi, "quality": quality}
+		self.resample_seconds = time.perf_counter() - start
+		for observer in self.observers:
+			observer("resample", self.resample_seconds, None)
+		return self.resampling
+
+	def content_hash(self) -> str:
+		"""The hash of the content of the card pdf, or of all card pdfs of a deck."""
+
+		if self.card_hash is None:
+			self.card_hash = self.card.content_hash() if isinstance(self.card, CardDeck) else content_hash(self.card_data)
+		return self.card_hash
+
+	def page_hashes(self) -> list[str]:
+		"""The hash of every page of the card pdf, see `cardimpose.source.page_hashes`."""
+
+		return self.card.page_hashes() if isinstance(self.card, CardDeck) else page_hashes(self.card)
+
 	def fill_page(self) -> fitz.Document:
 		"""Fill the whole page with as many rows and columns as possible."""
 		output = fitz.Document()
+		if self.mode == Mode.PACKED:
+			# the cards are not placed in rows and columns
+			return self.impose(None, None)
 		rows, cols = self._calculate_nup()
 		return self.impose(rows, cols)
 
 	def _calculate_nup(self) -> tuple[int,int]:
-		card_page = self.card.load_page(self.pages[0])
-		cardwidth, cardheight = card_page.bleedbox.width, card_page.bleedbox.height
+		cardwidth, cardheight = self._card_size(self.pages[0])
 		width, height = self.output_size
 
 		available_width = width - 2 * self.margin_x
@@ -160,53 +489,313 @@ class CardImpose:
 
 		return (rows, cols)
 
+	def _card_size(self, page) -> tuple[float, float]:
+		"""The size of the card on the sheet, including bleed and rotation."""
+
+		width, height = self.geometry[page].size
+		return (height, width) if self.card_rotation % 180 else (width, height)
+
 	def _detect_bleed(self, page):
 		"""Detect the bleed based on information on the given page in the input pdf."""
 
-		first_page = self.card.load_page(page)
-		bleedbox = first_page.bleedbox
-		trimbox = first_page.trimbox
-		horizontal_bleed = round((bleedbox.width - trimbox.width)/2, 3)
-		vertical_bleed = round((bleedbox.height - trimbox.height)/2, 3)
-
-		if horizontal_bleed != vertical_bleed:
+		bleed = self.geometry[page].bleed
+		if bleed is None:
 			raise RuntimeError("Automatically detected horizontal and vertical bleed not equal.")
 
-		return horizontal_bleed
+		return bleed
 
 
-	def impose(self, rows, cols) -> fitz.Document:
-		"""Impose the card in rows and columns at the center of the document."""
+	def plan(self, rows=None, cols=None) -> ImpositionPlan:
+		"""Compute the placement of all cards and crop marks without generating any output.
+		If `rows` and `cols` are not given, the page is filled with as many cards as possible.
+		"""
 
+		if self.mode != Mode.PACKED and (rows is None or cols is None):
+			rows, cols = self._calculate_nup()
+
+		bleed = self.bleed
 		# if there is no explicit bleed set, try to derive it based on the first page
 		if not self.fixed_bleed:
-			derived_bleed = self._detect_bleed(self.pages[0])
+			with self._phase("bleed_detection"):
+				derived_bleed = self._detect_bleed(self.pages[0])
 			if derived_bleed:
-				self.bleed = derived_bleed
+				bleed = derived_bleed
 
 		# if the crop mark distance is not set explicitly, make it equal to the bleed
-		if not self.fixed_crop_mark_distance and self.bleed > 0:
-			self.crop_mark_distance = self.bleed
+		crop_mark_distance = self.crop_mark_distance
+		if not self.fixed_crop_mark_distance and bleed > 0:
+			crop_mark_distance = bleed
+
+		if self.mode == Mode.PACKED:
+			with self._phase("layout"):
+				return self._plan_packed(bleed, crop_mark_distance)
+
+		with self._phase("layout"):
+			sheets = list(generate_layout(self.pages, rows, cols, self.mode, self.backside, self.ordering))
+			self.geometry.check_sheet_sizes(sheets)
+
+			plan = ImpositionPlan(self.output_size, rows, cols, bleed, self.crop_mark_thickness,
+				# cut guides run across the whole sheet, so they are drawn underneath the cards
+				crop_marks_below=self.crop_mark_style == CropMarkStyle.GUIDES)
+
+			# the grid and crop marks are the same on every sheet with the same card size,
+			# so they are only computed once
+			layouts = dict() # card size -> (rects, index of the crop marks)
+			identical = dict() # (id of the list of pages, back) -> SheetPlan
+			for number, pages in enumerate(sheets):
+				cardsize = self._card_size(next(page for page in pages if page is not None))
+				if cardsize not in layouts:
+					rects = self._card_rects(rows, cols, *cardsize, bleed)
+					crop_marks = None
+					if not self.disable_crop_marks:
+						if self.crop_mark_style == CropMarkStyle.GUIDES:
+							lines = cut_guides(rects, bleed, fitz.Rect(0, 0, *self.output_size))
+						else:
+							lines = merge_lines(self._crop_lines(rows, cols, rects, bleed, crop_mark_distance))
+						crop_marks = plan.add_crop_marks(lines)
+					# the slots store plain tuples, converting each `fitz.Rect` once instead of once per card
+					layouts[cardsize] = ([tuple(rect) for rect in rects], crop_marks)
+
+				# with backsides, the layout alternates between front and back sheets
+				back = self.backside != Backside.SINGLESIDED and number % 2 == 1
+				# the layout repeats the same list for identical sheets, which then share one `SheetPlan`
+				if (id(pages), back) not in identical:
+					rects, crop_marks = layouts[cardsize]
+					# rotated backsides are turned the other way, so that they line up with the front sides when the sheet is flipped
+					rotation = (360 - self.card_rotation) % 360 if back else self.card_rotation
+					slots = [CardSlot(page, rect, rotation) for page, rect in zip(pages, rects) if page is not None]
+					identical[(id(pages), back)] = SheetPlan(slots, crop_marks, back)
+				plan.sheets.append(identical[(id(pages), back)])
+		return plan
+
+	def _plan_packed(self, bleed, crop_mark_distance) -> ImpositionPlan:
+		"""Plan the cards of all sizes packed onto as few sheets as possible, see `Mode.PACKED`."""
+
+		if self.crop_mark_style == CropMarkStyle.GUIDES:
+			raise ValueError("Cut guides across the whole page would cut through packed cards, use crop marks at the corners instead.")
+		if self.ordering != CardImpose.DEFAULT_ORDERING:
+			raise ValueError("Packed cards are placed by their size, they can not be ordered for cutting.")
+
+		front, back = split_front_back(self.pages, self.backside)
+		for index, page in enumerate(back):
+			if self.geometry[page].size != self.geometry[front[index]].size:
+				raise RuntimeError(f"The backside (page {page+1}) must have the same size as the front side (page {front[index]+1}).")
+
+		# the gutter is added to every card and to the available space, so that it ends up between the cards
+		width = self.output_size[0] - 2 * self.margin_x + self.gutter_x
+		height = self.output_size[1] - 2 * self.margin_y + self.gutter_y
+		sizes = [self.geometry[page].size for page in front]
+		placements = pack([(w + self.gutter_x, h + self.gutter_y) for w, h in sizes], width, height)
+
+		sheet_count = max((sheet for sheet, _, _, _ in placements), default=-1) + 1
+		fronts = [[] for _ in range(sheet_count)]
+		backs = [[] for _ in range(sheet_count)]
+		for index, (sheet, x, y, rotated) in enumerate(placements):
+			card_width, card_height = sizes[index][::-1] if rotated else sizes[index]
+			rect = fitz.Rect(self.margin_x + x, self.margin_y + y, self.margin_x + x + card_width, self.margin_y + y + card_height)
+			fronts[sheet].append(CardSlot(front[index], rect, 90 if rotated else 0))
+			if back:
+				# the backside is mirrored horizontally, so that it lines up with the front side when the sheet is flipped
+				mirrored = fitz.Rect(self.output_size[0] - rect.x1, rect.y0, self.output_size[0] - rect.x0, rect.y1)
+				backs[sheet].append(CardSlot(back[index], mirrored, 270 if rotated else 0))
+
+		plan = ImpositionPlan(self.output_size, None, None, bleed, self.crop_mark_thickness)
+		for number in range(sheet_count):
+			sides = [(fronts[number], False)] + ([(backs[number], True)] if back else [])
+			for slots, is_back in sides:
+				crop_marks = None
+				if not self.disable_crop_marks:
+					crop_marks = plan.add_crop_marks(merge_lines(self._packed_crop_lines(slots, bleed, crop_mark_distance)))
+				plan.sheets.append(SheetPlan(slots, crop_marks, is_back))
+		return plan
+
+	def _packed_crop_lines(self, slots, bleed, distance) -> list:
+		"""The crop marks at the corners of freely placed cards, without running through other cards."""
+
+		rects = [fitz.Rect(slot.rect) for slot in slots]
+		lines = []
+		for index, rect in enumerate(rects):
+			card_lines = []
+			for corner, directions in [
+				(rect.top_left + (bleed, bleed), ["left", "top"]),
+				(rect.top_right + (-bleed, bleed), ["top", "right"]),
+				(rect.bottom_left + (bleed, -bleed), ["left", "bottom"]),
+				(rect.bottom_right + (-bleed, -bleed), ["right", "bottom"]),
+			]:
+				card_lines += [self.crop_line(corner, direction, False, bleed, distance) for direction in directions]
+
+			others = rects[:index] + rects[index+1:]
+			for start, end in clip_lines([line for line in card_lines if line], others):
+				length = abs(end[0] - start[0]) + abs(end[1] - start[1])
+				if length > 0 and not (self.crop_mark_no_smaller_than and length < self.crop_mark_no_smaller_than):
+					lines.append((start, end))
+		return lines
+
+	def impose(self, rows, cols) -> fitz.Document:
+		"""Impose the card in rows and columns at the center of the document."""
+
+		if self.cache is not None:
+			key = self.cache.key(self.content_hash(), self.settings(rows, cols))
+			document = self.cache.get(key)
+			if document is None:
+				document = self._impose_plan(rows, cols)
+				self.cache.put(key, document)
+			return document
+
+		return self._impose_plan(rows, cols)
+
+	def _impose_plan(self, rows, cols) -> fitz.Document:
+		plan = self.plan(rows, cols)
+		if self.jobs > 1:
+			with self._phase("render"):
+				return impose_parallel(self, plan, self.jobs)
+		return self.render(plan)
+
+	def render(self, plan) -> fitz.Document:
+		"""Generate the document described by an `ImpositionPlan`."""
 
 		output = fitz.Document()
-		for pages in generate_layout(self.pages, rows, cols, self.mode, self.backside):
-			outputpage = output.new_page(width=self.output_size[0], height=self.output_size[1])
-			self._impose(rows, cols, pages, outputpage)
+		# every card is embedded only once and then referenced from all sheets it appears on
+		embedder = CardEmbedder(output, self.card, self.geometry, self.deduplication)
+		self._render(plan, plan.sheets, embedder)
 		return output
 
-	def _impose(self, rows, cols, pages, outputpage):
-		outputbox = outputpage.mediabox
-		card_page = self.card.load_page(pages[0])
-		cardwidth, cardheight = card_page.bleedbox.width, card_page.bleedbox.height
+	def impose_incremental(self, path, rows=None, cols=None) -> list[int]:
+		"""Impose the cards into `path`, rendering only the sheets whose cards changed since the last call.
+		The hashes of the cards on each sheet are remembered in a file next to `path`.
+		Returns the indices of the rendered sheets.
+		"""
+
+		return impose_incremental(self, path, rows, cols)
+
+	def impose_to_bytes(self, rows=None, cols=None) -> bytes:
+		"""Impose the cards and return the resulting pdf, saved with the output preset, without writing it to disk.
+		If `rows` and `cols` are not given, the page is filled with as many cards as possible.
+		"""
+
+		buffer = io.BytesIO()
+		self.impose_to(buffer, rows, cols)
+		return buffer.getvalue()
+
+	def impose_to_images(self, path, rows=None, cols=None, dpi=DEFAULT_DPI, format="png", thumbnails=False) -> list[str]:
+		"""Impose the cards and write every sheet as a PNG or TIFF image at the given resolution,
+		named after `path` (e.g. "cards_0001.png" for "cards.pdf").
+		High resolutions are rendered in bands to bound the memory, using the worker processes set by `set_jobs`.
+		`thumbnails` renders small previews instead, which are kept in the cache set by `set_cache`.
+		Returns the list of written files.
+		"""
+
+		return rasterize(self, self.plan(rows, cols), path, dpi, format, thumbnails)
+
+	def iter_sheets(self, rows=None, cols=None, chunk_size=DEFAULT_CHUNK_SIZE):
+		"""Generator which imposes the cards in chunks of `chunk_size` sheets.
+		Each chunk is yielded as a separate document, so only one chunk has to be kept in memory.
+		If `rows` and `cols` are not given, the page is filled with as many cards as possible.
+		"""
+
+		if chunk_size < 1:
+			raise ValueError(f"Chunk size must be at least 1, not {chunk_size}.")
+		plan = self.plan(rows, cols)
+		for start in range(0, plan.sheet_count, chunk_size):
+			output = fitz.Document()
+			self._render(plan, plan.sheets[start:start+chunk_size], CardEmbedder(output, self.card, self.geometry, self.deduplication), start)
+			yield output
+
+	def impose_to(self, path, rows=None, cols=None, chunk_size=DEFAULT_CHUNK_SIZE, split=False):
+		"""Impose the cards and write the result to `path` in chunks of `chunk_size` sheets, keeping memory bounded.
+		With `split`, every chunk is written into a separate file next to `path`, otherwise all chunks are appended to `path`.
+		Returns the list of written files.
+
+		`path` can also be a writable binary file object. As file objects can not be updated incrementally,
+		the whole document is then built in memory and written at once.
+		"""
+
+		if chunk_size < 1:
+			raise ValueError(f"Chunk size must be at least 1, not {chunk_size}.")
+		if not is_path(path):
+			if split:
+				raise ValueError("The resulting document can only be split into files, not into a file object.")
+			document = self.impose(rows, cols)
+			self.save(document, path)
+			document.close()
+			return [path]
+
+		# the names of the chunks are derived from the path
+		path = os.fspath(path)
+		if split:
+			base = path.removesuffix(".pdf")
+			paths = []
+			for number, document in enumerate(self.iter_sheets(rows, cols, chunk_size), 1):
+				paths.append(f"{base}_{number}.pdf")
+				self.save(document, paths[-1])
+				document.close()
+			return paths
+
+		plan = self.plan(rows, cols)
+
+		# The cards stay embedded only once across all chunks: after each chunk, the document is saved
+		# incrementally and reopened, which releases the already written objects from memory
+		# while keeping their xrefs valid for the next chunks.
+		output = fitz.Document()
+		embedder = CardEmbedder(output, self.card, self.geometry, self.deduplication)
+		# only the compression of the output preset can be applied to incremental saves
+		options = save_options(self.output_preset, incremental=True)
+		for start in range(0, plan.sheet_count, chunk_size):
+			self._render(plan, plan.sheets[start:start+chunk_size], embedder, start)
+			with self._phase("save"):
+				if start > 0:
+					output.save(path, incremental=True, encryption=fitz.PDF_ENCRYPT_KEEP, **options)
+				else:
+					output.save(path, **options)
+			output.close()
+			output = fitz.open(path)
+			embedder.reopen(output)
+		output.close()
+		return [path]
+
+	def _render(self, plan, sheets, embedder, first=0):
+		"""Render the given sheets of the plan into the output document of the `embedder`.
+		`first` is the index of the first of the `sheets` in the plan, used when reporting the phases.
+		"""
+
+		for number, sheet in enumerate(sheets, first):
+			with self._phase("embedding", number):
+				embedder.embed(slot.page for slot in sheet.slots)
+			outputpage = embedder.output.new_page(width=plan.sheet_size[0], height=plan.sheet_size[1])
+			self._impose(plan, sheet, outputpage, embedder, number)
 
-		for page_id in pages:
-			page = self.card.load_page(page_id)
-			if page.bleedbox.width != cardwidth or page.bleedbox.height != cardheight:
-				raise RuntimeError("All cards must have the same size.")
+	def _impose(self, plan, sheet, outputpage, embedder, number=None):
+		if embedder.reuse_sheet(sheet, outputpage):
+			return
+
+		content = SheetContent(outputpage)
+
+		# the crop marks are only generated once and then referenced by all sheets using them
+		crop_marks = None
+		with self._phase("crop_marks", number):
+			if sheet.crop_marks is not None:
+				if not embedder.has_template(sheet.crop_marks):
+					embedder.add_crop_marks(sheet.crop_marks, plan.crop_marks[sheet.crop_marks], outputpage.mediabox, plan.crop_mark_thickness)
+				crop_marks = embedder.template(sheet.crop_marks)
+
+			if crop_marks is not None and plan.crop_marks_below:
+				content.place(crop_marks, outputpage.mediabox)
+
+		with self._phase("placement", number):
+			for slot in sheet.slots:
+				content.place(embedder.form(slot.page), fitz.Rect(slot.rect), slot.rotation, slot.flipped)
+
+			if crop_marks is not None and not plan.crop_marks_below:
+				content.place(crop_marks, outputpage.mediabox)
+
+			embedder.add_sheet(sheet, content.commit())
+
+	def _card_rects(self, rows, cols, cardwidth, cardheight, bleed) -> list[fitz.Rect]:
+		"""The bounding boxes of all cards on a sheet, row by row."""
 
 		# The center of the resulting page
-		center_x = outputbox.x1 / 2
-		center_y = outputbox.y1 / 2
+		center_x = self.output_size[0] / 2
+		center_y = self.output_size[1] / 2
 
 		# The coordinates of the top left corner of the top left card on the page
 		start_x = center_x - (cols * cardwidth / 2) - ((cols-1) * self.gutter_x / 2)
@@ -215,22 +804,26 @@ class CardImpose:
 		if start_x < self.margin_x or start_y < self.margin_y:
 			raise RuntimeError("Imposition does not fit page size.")
 
-		if cardwidth / 2 <= self.bleed or cardheight / 2 <= self.bleed:
+		if cardwidth / 2 <= bleed or cardheight / 2 <= bleed:
 			raise RuntimeError("Bleed too large for card size.")
 
-		for x in range(cols):
-			for y in range(rows):
-
+		rects = []
+		for y in range(rows):
+			for x in range(cols):
 				# The top left corner of the current card on the page
 				x_pos = start_x + x * cardwidth + x * self.gutter_x
 				y_pos = start_y + y * cardheight + y * self.gutter_y
 
-				# The bounding box of the current card
-				rect = fitz.Rect(x_pos, y_pos, x_pos + cardwidth, y_pos + cardheight)
+				rects.append(fitz.Rect(x_pos, y_pos, x_pos + cardwidth, y_pos + cardheight))
+		return rects
 
-				page = pages[y*cols + x]
-				if page is not None:
-					outputpage.show_pdf_page(rect, self.card, page, clip=card_page.bleedbox)
+	def _crop_lines(self, rows, cols, rects, bleed, distance) -> list:
+		"""The crop marks around all cards of a sheet."""
+
+		lines = []
+		for y in range(rows):
+			for x in range(cols):
+				rect = rects[y*cols + x]
 
 				# Whether the current card in in the top/bottom row, left/right column
 				# Used to detect whether crop marks are on the inside of the grid
@@ -240,32 +833,37 @@ class CardImpose:
 				is_bottom_row = y == rows-1
 
 				# the corners of the actual card where the crop marks point to
-				top_left_crop = rect.top_left + (self.bleed, self.bleed)
-				top_right_crop = rect.top_right + (-self.bleed, self.bleed)
-				bottom_left_crop = rect.bottom_left + (self.bleed, -self.bleed)
-				bottom_right_crop = rect.bottom_right + (-self.bleed, -self.bleed)
-
-				crop_lines = [
-					self.crop_line(top_left_crop, "left", not is_left_col),
-					self.crop_line(top_left_crop, "top", not is_top_row),
-					self.crop_line(top_right_crop, "top", not is_top_row),
-					self.crop_line(top_right_crop, "right", not is_right_col),
-					self.crop_line(bottom_left_crop, "left", not is_left_col),
-					self.crop_line(bottom_left_crop, "bottom", not is_bottom_row),
-					self.crop_line(bottom_right_crop, "right", not is_right_col),
-					self.crop_line(bottom_right_crop, "bottom", not is_bottom_row),
+				top_left_crop = rect.top_left + (bleed, bleed)
+				top_right_crop = rect.top_right + (-bleed, bleed)
+				bottom_left_crop = rect.bottom_left + (bleed, -bleed)
+				bottom_right_crop = rect.bottom_right + (-bleed, -bleed)
+
+				lines += [
+					self.crop_line(top_left_crop, "left", not is_left_col, bleed, distance),
+					self.crop_line(top_left_crop, "top", not is_top_row, bleed, distance),
+					self.crop_line(top_right_crop, "top", not is_top_row, bleed, distance),
+					self.crop_line(top_right_crop, "right", not is_right_col, bleed, distance),
+					self.crop_line(bottom_left_crop, "left", not is_left_col, bleed, distance),
+					self.crop_line(bottom_left_crop, "bottom", not is_bottom_row, bleed, distance),
+					self.crop_line(bottom_right_crop, "right", not is_right_col, bleed, distance),
+					self.crop_line(bottom_right_crop, "bottom", not is_bottom_row, bleed, distance),
 				]
-				for line in crop_lines:
-					if line:
-						outputpage.draw_line(*line, width=self.crop_mark_thickness)
+		return [line for line in lines if line]
+
+	def crop_line(self, corner, direction, inner, bleed=None, distance=None):
+		"""The crop mark pointing from `corner` into `direction` (by default with the configured bleed and distance)."""
 
-	def crop_line(self, corner, direction, inner):
 		if inner and self.crop_mark_no_inner or self.disable_crop_marks:
 			return
 
+		if bleed is None:
+			bleed = self.bleed
+		if distance is None:
+			distance = self.crop_mark_distance
+
 		# the maximal length a cropmark can have on the inside to not bleed into other cards
-		inner_max_x = self.gutter_x + 2*self.bleed - 2*self.crop_mark_distance
-		inner_max_y = self.gutter_y + 2*self.bleed - 2*self.crop_mark_distance
+		inner_max_x = self.gutter_x + 2*bleed - 2*distance
+		inner_max_y = self.gutter_y + 2*bleed - 2*distance
 
 		if direction == "left":
 			x_fact = -1
@@ -294,9 +892,9 @@ class CardImpose:
 		if length <= 0 or (self.crop_mark_no_smaller_than and length < self.crop_mark_no_smaller_than):
 			return
 
-		p1x = corner.x + x_fact * self.crop_mark_distance
-		p1y = corner.y + y_fact * self.crop_mark_distance
-		p2x = corner.x + x_fact * (self.crop_mark_distance + length)
-		p2y = corner.y + y_fact * (self.crop_mark_distance + length)
+		p1x = corner.x + x_fact * distance
+		p1y = corner.y + y_fact * distance
+		p2x = corner.x + x_fact * (distance + length)
+		p2y = corner.y + y_fact * (distance + length)
 
 		return ((p1x, p1y), (p2x, p2y))
\ No newline at end of file
@@ -0,0 +1,354 @@
+# Only modules which do not import PyMuPDF are imported here, so that the options are parsed and validated quickly.
+# The modules using PyMuPDF are imported by the functions which open the card pdf.
+from cardimpose.defaults import *
+from cardimpose.layout import Mode, Backside, ORDERINGS
+from cardimpose.cropmarks import CropMarkStyle
+from cardimpose.metrics import Profiler
+from cardimpose.parse import parse_length, parse_tuple, parse_nup, parse_prices, parse_quality
+
+import argparse
+import glob
+import json
+import os
+import sys
+import time
+
+def build_parser(allow_abbrev=True) -> argparse.ArgumentParser:
+	"""The parser for the command line options of a single imposition.
+	Without `allow_abbrev`, options have to be given by their full names.
+	"""
+
+	parser = argparse.ArgumentParser(
+                    prog='cardimpose',
+                    description='Impose multiple copies of a card onto a larger page.',
+                    allow_abbrev=allow_abbrev)
+
+	parser.add_argument("card", metavar="CARD", nargs="+", help="The path of the pdf file containing the card, a directory or glob pattern (e.g. 'cards/*.png') of card images, or - to read a pdf from stdin. "
+		"Several card pdfs are imposed together, each optionally followed by :PAGES to select some of its pages (e.g. a.pdf:1-4 b.pdf).")
+	parser.add_argument("-o", "--output", help="The path where the resulting document is stored, or - to write it to stdout (default: stdout when reading from stdin).")
+	parser.add_argument("--card-size", help="The size of card images, e.g. 63mmx88mm (default: derived from the resolution of the images).")
+	parser.add_argument("-p", "--pages", help="The pages of the card pdf to impose, numbered consecutively across several card pdfs (default: all pages).")
+
+	layout_group = parser.add_argument_group("Layout", "Configure the layout of the cards onto the resulting document.")
+	layout_group.add_argument("--nup", help="The number of rows and columns of cards to include.", default="auto")
+	layout_group.add_argument("--page-size", help=f"The size of the resulting document (default: {DEFAULT_PAPER_SIZE}).", default=DEFAULT_PAPER_SIZE)
+	layout_group.add_argument("--rotate-page", help="Rotate the resulting document before imposing.", action="store_true")
+	layout_group.add_argument("--gutter", help=f"The gutter inserted between cards (default: {DEFAULT_GUTTER}).", default=DEFAULT_GUTTER)
+	layout_group.add_argument("--margin", help=f"The margin included around the resulting document. (default: {DEFAULT_MARGIN}).", default=DEFAULT_MARGIN)
+	layout_group.add_argument("--bleed", help=f"The amount of bleed included in the card. (default: {DEFAULT_BLEED} or automatically).")
+	layout_group.add_argument("--backside", help=f"The kind of backsides generated in the resulting document. (default: singlesided).", choices=["singlesided", "last-page", "alternating"], default="singlesided")
+	layout_group.add_argument("--rotate-cards", help="Rotate the cards by 90 degrees on the resulting document.", action="store_true")
+	layout_group.add_argument("--mode", help=f"Whether to generate single card per input page or whole output page, or to pack cards of different sizes onto as few pages as possible (ignores --nup).", choices=["duplicates", "singles", "packed"], default="duplicates")
+	layout_group.add_argument("--order", help=f"The order of the cards on the sheets with --mode singles, cut-and-stack puts the piles of a cut stack of sheets in order. (default: sequential).", choices=list(ORDERINGS), default="sequential")
+
+	stock_group = parser.add_argument_group("Stock", "Choose the page size, its orientation and the rotation of the cards automatically.")
+	stock_group.add_argument("--optimize", help="try all stocks in both orientations with rotated and unrotated cards and use the layout needing the fewest pages, or the cheapest one with --stock-prices (ignores --page-size, --rotate-page and --rotate-cards).", action="store_true")
+	stock_group.add_argument("--stocks", help=f"the comma separated stocks tried by --optimize, paper formats or sizes like 330mmx480mm. (default: {','.join(DEFAULT_STOCKS)}).", default=",".join(DEFAULT_STOCKS))
+	stock_group.add_argument("--stock-prices", metavar="PRICES", help="the price of a sheet of each stock, e.g. A4=0.05,SRA3=0.18, to minimize the cost per card instead of the number of pages.")
+
+	crop_marks_group = parser.add_argument_group("Crop Marks", "Configure the crop marks included around the cards.")
+	crop_marks_group.add_argument("--no-crop-marks", action="store_true", help="do not include cropmarks in the resulting document.")
+	crop_marks_group.add_argument("--crop-mark-length", help=f"the length of the cropmarks. (default: {DEFAULT_CM_LENGTH}).", default=DEFAULT_CM_LENGTH)
+	crop_marks_group.add_argument("--crop-mark-distance", help=f"the distance of the cropmarks form the card. (default: {DEFAULT_CM_DISTANCE} or bleed).")
+	crop_marks_group.add_argument("--crop-mark-thickness", help=f"the thickness of the cropmarks. (default: {DEFAULT_CM_THICKNESS}).", default=DEFAULT_CM_THICKNESS)
+	crop_marks_group.add_argument("--no-inner-crop-marks", help=f"hide the cropmarks in between the cards.", action="store_true")
+	crop_marks_group.add_argument("--crop-mark-style", help=f"short marks at the card corners or cut lines across the whole page. (default: corners).", choices=["corners", "guides"], default="corners")
+
+	images_group = parser.add_argument_group("Images", "Reduce the resolution of the images of the cards.")
+	images_group.add_argument("--max-dpi", type=int, help="downsample the images of the cards shown at a higher resolution to this resolution.")
+	images_group.add_argument("--image-quality", help=f"the JPEG quality from 1 to 100 of the downsampled images, or lossless. (default: {DEFAULT_QUALITY}).")
+
+	output_group = parser.add_argument_group("Output", "Configure how the resulting document is written.")
+	output_group.add_argument("--plan", metavar="FILE", help="only compute the placement of all cards and store it as JSON in FILE, without generating the document.")
+	output_group.add_argument("--dry-run", action="store_true", help="only print the number of pages, cards and the paper utilisation, without generating the document.")
+	output_group.add_argument("--output-preset", help="the optimizations applied when saving the resulting document. (default: none).", choices=["none", "fast", "small", "web"], default=DEFAULT_OUTPUT_PRESET)
+	output_group.add_argument("--chunk-size", type=int, help="write the resulting document incrementally in chunks of the given number of pages to bound memory usage.")
+	output_group.add_argument("--jobs", type=int, help="the number of worker processes used to impose the pages. (default: 1).", default=DEFAULT_JOBS)
+	output_group.add_argument("--max-open", type=int, metavar="N", help=f"the number of card pdfs kept open at the same time when imposing several. (default: {DEFAULT_MAX_OPEN}).", default=DEFAULT_MAX_OPEN)
+	output_group.add_argument("--split", type=int, metavar="N", help="write the resulting document into separate files of N pages each, which also sets the chunk size.")
+	output_group.add_argument("--incremental", action="store_true", help="only impose the pages whose cards changed since the last run with the same output again.")
+	output_group.add_argument("--watch", action="store_true", help="impose incrementally whenever the card pdf changes, until interrupted.")
+	output_group.add_argument("--cache-dir", metavar="DIR", help="reuse resulting documents imposed earlier with the same card pdf and options, which are stored in DIR.")
+	output_group.add_argument("--cache-size", type=int, metavar="MB", help=f"the maximum size of the cache, the least recently used documents are removed first. (default: {DEFAULT_CACHE_SIZE // 1024 // 1024}).", default=DEFAULT_CACHE_SIZE // 1024 // 1024)
+	output_group.add_argument("--raster", choices=["png", "tiff"], help="write every page as an image named after the output instead of the pdf, e.g. cards_imposed_0001.png.")
+	output_group.add_argument("--dpi", type=int, help=f"the resolution of the images. (default: {DEFAULT_DPI}, or {THUMBNAIL_DPI} for thumbnails).")
+	output_group.add_argument("--thumbnails", action="store_true", help="write small png previews of every page, which are kept in --cache-dir when given.")
+	output_group.add_argument("--profile", metavar="FILE", help="store the time spent in each phase of the imposition as JSON in FILE.")
+
+	return parser
+
+def parse_args(argv=None, allow_abbrev=True):
+	"""Parse the command line options of a single imposition."""
+
+	parser = build_parser(allow_abbrev)
+	args = parser.parse_args(argv)
+
+	# the first card names the output
+	args.cards = [parse_card(card) for card in args.card]
+	args.card = args.cards[0][0]
+
+	# mistakes are reported like other invalid options, before the card pdf is opened
+	try:
+		validate_args(args)
+	except ValueError as e:
+		parser.error(str(e))
+
+	# argparse does not like enums
+	if args.mode == "duplicates":
+		args.mode = Mode.DUPLICATES
+	elif args.mode == "singles":
+		args.mode = Mode.SINGLES
+	elif args.mode == "packed":
+		args.mode = Mode.PACKED
+
+	if args.backside == "singlesided":
+		args.backside = Backside.SINGLESIDED
+	elif args.backside == "last-page":
+		args.backside = Backside.LAST_PAGE
+	elif args.backside == "alternating":
+		args.backside = Backside.ALTERNATING
+
+	if args.crop_mark_style == "corners":
+		args.crop_mark_style = CropMarkStyle.CORNERS
+	elif args.crop_mark_style == "guides":
+		args.crop_mark_style = CropMarkStyle.GUIDES
+
+	return args
+
+def validate_args(args):
+	"""Check the values of the options which can be checked without opening the card pdf."""
+
+	if args.nup != "auto":
+		parse_nup(args.nup)
+	for value in [args.gutter, args.margin] + ([args.card_size] if args.card_size else []):
+		parse_tuple(value)
+	for value in [args.bleed, args.crop_mark_length, args.crop_mark_distance, args.crop_mark_thickness]:
+		if value:
+			parse_length(value)
+	if args.stock_prices:
+		parse_prices(args.stock_prices)
+	if args.image_quality is not None:
+		parse_quality(args.image_quality)
+		if args.max_dpi is None:
+			raise ValueError("--image-quality only applies to the images downsampled with --max-dpi.")
+	if args.max_dpi is not None and args.max_dpi <= 0:
+		raise ValueError(f"--max-dpi must be positive, not {args.max_dpi}.")
+	if args.jobs < 1:
+		raise ValueError(f"Number of jobs must be at least 1, not {args.jobs}.")
+	for option, value in [("--chunk-size", args.chunk_size), ("--split", args.split)]:
+		if value is not None and value < 1:
+			raise ValueError(f"{option} must be at least 1, not {value}.")
+		# the chunks are written one after another
+		if value is not None and args.jobs > 1:
+			raise ValueError(f"{option} can not be used with more than one job.")
+
+def parse_card(card) -> tuple[str, str]:
+	"""Split a card pdf given as "cards.pdf:1-4" into the path and the page spec, which is None if not given."""
+
+	if ":" not in card or os.path.exists(card):
+		return card, None
+	path, _, pages = card.rpartition(":")
+	return path, pages
+
+def build_impose(args, impose=None) -> "CardImpose":
+	"""Construct the `CardImpose` configured by the parsed command line options.
+	If `impose` is given, it is configured instead of opening the card pdf of the options.
+	"""
+
+	from cardimpose.cardimpose import CardImpose
+	from cardimpose.cache import ResultCache
+
+	if impose is None:
+		if len(args.cards) > 1 or args.cards[0][1] is not None:
+			if any(path == "-" for path, _ in args.cards):
+				raise ValueError("Several card pdfs can not be read from stdin.")
+			card = [(path, pages or DEFAULT_PAGE_SPEC) for path, pages in args.cards]
+		else:
+			# "-" reads the card pdf from stdin
+			card = sys.stdin.buffer.read() if args.card == "-" else args.card
+		impose = CardImpose(card, args.card_size, args.jobs)
+
+	impose = impose \
+	.set_page_size(args.page_size, rotate=args.rotate_page) \
+	.set_gutter(args.gutter) \
+	.set_margin(args.margin) \
+	.set_crop_marks(
+		length=args.crop_mark_length,
+		thickness=args.crop_mark_thickness,
+		no_inner=args.no_inner_crop_marks,
+		disable_crop_marks=args.no_crop_marks,
+		style=args.crop_mark_style
+	) \
+	.set_mode(args.mode) \
+	.set_backside(args.backside) \
+	.set_ordering(args.order) \
+	.set_card_rotation(90 if args.rotate_cards else 0) \
+	.set_jobs(args.jobs) \
+	.set_max_open(args.max_open) \
+	.set_output_preset(args.output_preset)
+
+	if args.pages:
+		impose.set_pages(args.pages)
+
+	if args.cache_dir:
+		impose.set_cache(ResultCache(args.cache_dir, args.cache_size * 1024 * 1024))
+
+	if args.max_dpi is not None:
+		# uses the worker processes and the cache
+		quality = DEFAULT_QUALITY if args.image_quality is None else parse_quality(args.image_quality)
+		impose.downsample_images(args.max_dpi, quality)
+
+	if args.bleed:
+		impose.set_bleed(args.bleed)
+	
+	if args.crop_mark_distance:
+		impose.set_crop_marks(distance=args.crop_mark_distance)
+
+	if args.optimize:
+		if args.nup != "auto":
+			raise ValueError("The layout can only be optimized when filling the pages (--nup auto).")
+		prices = parse_prices(args.stock_prices) if args.stock_prices else None
+		impose.optimize_layout(args.stocks.split(","), prices)
+
+	return impose
+
+def print_layouts(layouts, runners_up=3):
+	"""Print the chosen layout and the best alternatives to stderr."""
+
+	for number, layout in enumerate(layouts[:runners_up + 1]):
+		orientation = "rotated" if layout.rotate_page else "unrotated"
+		nup = "packed" if layout.rows is None else f"{layout.rows}x{layout.cols}"
+		cost = "" if layout.cost is None else f", cost {layout.cost:.2f} ({layout.cost_per_card:.4f} per card)"
+		print(f"{'Chosen' if number == 0 else 'Runner-up'}: {layout.stock} {orientation}, cards rotated {layout.card_rotation}°, {nup}, "
+			f"{layout.sheets} pages, {layout.utilisation:.1%} utilisation{cost}", file=sys.stderr)
+
+def run(args) -> list[str]:
+	"""Run the imposition described by the parsed command line options and return the written files."""
+
+	if args.watch:
+		watch(args)
+		return [output_path(args)]
+
+	impose = build_impose(args)
+
+	if args.profile:
+		profiler = Profiler()
+		impose.add_observer(profiler)
+		try:
+			files = _run(impose, args)
+		finally:
+			profiler.save(args.profile)
+	else:
+		files = _run(impose, args)
+
+	stats = impose.deduplication
+	# a few shared resources are common and only worth mentioning if they are large
+	if stats.duplicates and stats.bytes_saved >= 0.1 * 1024 * 1024:
+		print(f"Stored {stats.duplicates} duplicated fonts, images and other resources of the cards only once, saving {stats.bytes_saved / 1024 / 1024:.1f} MB.", file=sys.stderr)
+	if impose.resampling is not None and impose.resampling.resampled:
+		resampling = impose.resampling
+		print(f"Downsampled {resampling.resampled} images of the cards to {args.max_dpi} dpi, from {resampling.bytes_before / 1024 / 1024:.1f} MB to {resampling.bytes_after / 1024 / 1024:.1f} MB.", file=sys.stderr)
+	return files
+
+def output_path(args) -> str:
+	"""The path of the resulting document, "-" for stdout."""
+
+	from cardimpose.images import is_image_source
+
+	if args.output:
+		return args.output
+	elif args.card == "-":
+		return "-"
+	elif is_image_source(args.card):
+		# named after the directory of the images
+		directory = os.path.dirname(args.card) if glob.has_magic(args.card) else args.card
+		return os.path.basename(os.path.abspath(directory)) + "_imposed.pdf"
+	else:
+		return os.path.basename(args.card).removesuffix('.pdf') + "_imposed.pdf"
+
+def watch(args, interval=0.5):
+	"""Impose the card pdf incrementally whenever it changes, until interrupted."""
+
+	if args.card == "-":
+		raise ValueError("The card pdf can not be watched when reading it from stdin.")
+
+	from cardimpose.images import is_image_source, find_images
+
+	output = output_path(args)
+	rows, cols = (None, None) if args.nup == "auto" else parse_nup(args.nup)
+	last = None
+	try:
+		while True:
+			try:
+				# a directory of images changes when any of the images changes
+				files = find_images(args.card) if is_image_source(args.card) else [path for path, _ in args.cards]
+				signature = [(path, stat.st_mtime_ns, stat.st_size) for path, stat in ((path, os.stat(path)) for path in files)]
+			except (FileNotFoundError, ValueError):
+				# the card pdf is being replaced
+				signature = None
+
+			if signature is not None and signature != last:
+				last = signature
+				start = time.perf_counter()
+				try:
+					changed = build_impose(args).impose_incremental(output, rows, cols)
+					print(f"Updated {len(changed)} pages of {output} in {time.perf_counter() - start:.2f}s.", file=sys.stderr)
+				except (ValueError, RuntimeError) as e:
+					# e.g. the card pdf is only partially written, it is imposed again after the next change
+					print(f"Error: {e}", file=sys.stderr)
+			time.sleep(interval)
+	except KeyboardInterrupt:
+		pass
+
+def _run(impose, args) -> list[str]:
+	output = output_path(args)
+
+	if args.nup == "auto":
+		rows, cols = None, None
+	else:
+		rows, cols = parse_nup(args.nup)
+
+	if args.optimize:
+		print_layouts(impose.layouts)
+
+	if args.plan or args.dry_run:
+		plan = impose.plan(rows, cols)
+		if args.dry_run:
+			summary = plan.summary()
+			if args.optimize:
+				summary["layouts"] = [layout.to_dict() for layout in impose.layouts]
+			print(json.dumps(summary))
+		if args.plan:
+			plan.save(args.plan)
+			return [args.plan]
+		return []
+
+	if args.raster or args.thumbnails:
+		if output == "-":
+			raise ValueError("Images can not be written to stdout.")
+		dpi = args.dpi or (THUMBNAIL_DPI if args.thumbnails else DEFAULT_DPI)
+		return impose.impose_to_images(output, rows, cols, dpi, args.raster or "png", args.thumbnails)
+
+	if output == "-":
+		# "-" writes the resulting document to stdout
+		if args.split:
+			raise ValueError("The resulting document can not be split when writing to stdout.")
+		impose.impose_to(sys.stdout.buffer, rows, cols)
+		sys.stdout.buffer.flush()
+		return [output]
+
+	if args.incremental:
+		impose.impose_incremental(output, rows, cols)
+		return [output]
+
+	if args.chunk_size or args.split:
+		# every chunk is written into its own file, so --split decides the size of the chunks
+		chunk_size = args.split or args.chunk_size
+		return impose.impose_to(output, rows, cols, chunk_size=chunk_size, split=bool(args.split))
+	else:
+		if rows is None:
+			document = impose.fill_page()
+		else:
+			document = impose.impose(rows, cols)
+		impose.save(document, output)
+		return [output]
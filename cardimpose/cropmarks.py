@@ -0,0 +1,80 @@
+from enum import Enum
+
+class CropMarkStyle(Enum):
+	"""The kind of crop marks drawn around the cards."""
+
+	CORNERS = 0 # short marks pointing at the corners of each card
+	GUIDES = 1  # cut lines spanning the whole sheet, drawn underneath the cards
+
+def _merge_intervals(intervals, tolerance):
+	merged = []
+	for start, end in sorted(intervals):
+		if merged and start <= merged[-1][1] + tolerance:
+			merged[-1][1] = max(merged[-1][1], end)
+		else:
+			merged.append([start, end])
+	return merged
+
+def merge_lines(lines, tolerance=0.001) -> list:
+	"""Merge the given axis-aligned crop mark lines of a whole sheet.
+	Duplicate lines are removed and collinear lines that touch or overlap are joined into a single line.
+	"""
+
+	horizontal = dict() # y -> list of x intervals
+	vertical = dict()   # x -> list of y intervals
+	others = []
+	for (x1, y1), (x2, y2) in lines:
+		if abs(y1 - y2) <= tolerance:
+			horizontal.setdefault(round(y1, 3), []).append((min(x1, x2), max(x1, x2)))
+		elif abs(x1 - x2) <= tolerance:
+			vertical.setdefault(round(x1, 3), []).append((min(y1, y2), max(y1, y2)))
+		else:
+			others.append(((x1, y1), (x2, y2)))
+
+	merged = []
+	for y, intervals in sorted(horizontal.items()):
+		merged += [((start, y), (end, y)) for start, end in _merge_intervals(intervals, tolerance)]
+	for x, intervals in sorted(vertical.items()):
+		merged += [((x, start), (x, end)) for start, end in _merge_intervals(intervals, tolerance)]
+	return merged + others
+
+def cut_guides(rects, bleed, sheetbox) -> list:
+	"""Lines across the whole sheet along every edge where the cards are cut."""
+
+	xs = set()
+	ys = set()
+	for rect in rects:
+		xs.update((round(rect.x0 + bleed, 3), round(rect.x1 - bleed, 3)))
+		ys.update((round(rect.y0 + bleed, 3), round(rect.y1 - bleed, 3)))
+
+	vertical = [((x, sheetbox.y0), (x, sheetbox.y1)) for x in sorted(xs)]
+	horizontal = [((sheetbox.x0, y), (sheetbox.x1, y)) for y in sorted(ys)]
+	return vertical + horizontal
+
+def _subtract(intervals, start, end):
+	remaining = []
+	for a, b in intervals:
+		if end <= a or start >= b:
+			remaining.append((a, b))
+			continue
+		if a < start:
+			remaining.append((a, start))
+		if end < b:
+			remaining.append((end, b))
+	return remaining
+
+def clip_lines(lines, rects, tolerance=0.001) -> list:
+	"""Remove the parts of the axis-aligned lines which run through any of the `rects`, e.g. other cards."""
+
+	clipped = []
+	for (x1, y1), (x2, y2) in lines:
+		horizontal = abs(y1 - y2) <= tolerance
+		intervals = [(min(x1, x2), max(x1, x2))] if horizontal else [(min(y1, y2), max(y1, y2))]
+		for rect in rects:
+			if horizontal and rect.y0 + tolerance < y1 < rect.y1 - tolerance:
+				intervals = _subtract(intervals, rect.x0, rect.x1)
+			elif not horizontal and rect.x0 + tolerance < x1 < rect.x1 - tolerance:
+				intervals = _subtract(intervals, rect.y0, rect.y1)
+		for start, end in intervals:
+			clipped.append(((start, y1), (end, y1)) if horizontal else ((x1, start), (x1, end)))
+	return clipped
@@ -0,0 +1,32 @@
+# The default settings, shared by the library and the command line.
+# This module must not import PyMuPDF, so that the command line can be parsed and validated without loading it.
+
+DEFAULT_GUTTER = "0mm"
+DEFAULT_MARGIN = "10mm"
+DEFAULT_BLEED = "0mm"
+DEFAULT_PAPER_SIZE = "A4"
+DEFAULT_CM_LENGTH = "5mm"
+DEFAULT_CM_THICKNESS = "0.2mm"
+DEFAULT_CM_DISTANCE = "2mm"
+DEFAULT_CM_NO_SMALLER_THAN = "0.5mm"
+DEFAULT_PAGE_SPEC = "."
+DEFAULT_CHUNK_SIZE = 100
+DEFAULT_JOBS = 1
+DEFAULT_OUTPUT_PRESET = "none"
+
+# the stocks tried when optimizing the layout
+DEFAULT_STOCKS = ["A4", "A3", "SRA3", "Letter"]
+
+# the resolution of sheets written as images
+DEFAULT_DPI = 300
+THUMBNAIL_DPI = 36
+
+# the JPEG quality of downsampled images
+DEFAULT_QUALITY = 85
+LOSSLESS = "lossless"
+
+# the number of card pdfs of a deck which are kept open at the same time
+DEFAULT_MAX_OPEN = 64
+
+# the size of the result cache in bytes
+DEFAULT_CACHE_SIZE = 1024 * 1024 * 1024
@@ -0,0 +1,232 @@
+import fitz
+import re
+
+from cardimpose.source import object_hash, card_page, REFERENCE, BACK_REFERENCE
+
+def format_number(number) -> str:
+	"""Format a number for use in a pdf content stream."""
+
+	text = f"{number:.4f}".rstrip("0").rstrip(".")
+	return "0" if text == "-0" else text
+
+class DeduplicationStats:
+	"""The objects (images, fonts, ...) copied from the card pdf, and the identical copies which were removed."""
+
+	def __init__(self):
+		self.objects = 0
+		self.duplicates = 0
+		self.bytes_saved = 0
+
+	def add(self, other):
+		self.objects += other.objects
+		self.duplicates += other.duplicates
+		self.bytes_saved += other.bytes_saved
+
+	def to_dict(self) -> dict:
+		return {"objects": self.objects, "duplicates": self.duplicates, "bytes_saved": self.bytes_saved}
+
+class Deduplicator:
+	"""Stores identical objects of a document, found by their content hash, only once."""
+
+	def __init__(self, stats=None):
+		self.stats = stats if stats is not None else DeduplicationStats()
+		self.objects = dict() # content hash -> xref of the first copy of an object
+		self.hashes = dict() # xref -> content hash
+		self.checked = set() # xrefs already checked for duplicates
+		self.replaced = dict() # xref of a removed duplicate -> xref of the identical object
+
+	def deduplicate(self, document, root):
+		"""Replace the objects reachable from `root` which are identical to objects checked before.
+		`root` itself is kept, e.g. the Form XObject of a card or a page.
+		"""
+
+		# the objects which were newly copied, e.g. for a card
+		objects = []
+		stack = [root]
+		while stack:
+			xref = stack.pop()
+			if xref in self.checked:
+				continue
+			self.checked.add(xref)
+			objects.append(xref)
+			source = BACK_REFERENCE.sub(b"", document.xref_object(xref, compressed=True).encode())
+			stack.extend(int(match[1]) for match in REFERENCE.finditer(source))
+
+		duplicates = []
+		for xref in objects[1:]:
+			first = self.objects.setdefault(object_hash(document, xref, self.hashes), xref)
+			if first == xref:
+				self.stats.objects += 1
+			else:
+				self.replaced[xref] = first
+				duplicates.append(xref)
+
+		# MuPDF copies every object of the card pdf only once, so a card can also refer to a duplicate removed before
+		if self.replaced:
+			def replace(match):
+				xref = int(match[1])
+				return f"{self.replaced.get(xref, xref)} 0 R"
+
+			for xref in objects:
+				if xref in self.replaced:
+					continue
+				for key in document.xref_get_keys(xref):
+					kind, value = document.xref_get_key(xref, key)
+					if kind in ("xref", "dict", "array"):
+						replaced = re.sub(r"(\d+) 0 R", replace, value)
+						if replaced != value:
+							document.xref_set_key(xref, key, replaced)
+
+		for xref in duplicates:
+			if document.xref_is_stream(xref):
+				self.stats.bytes_saved += len(document.xref_stream_raw(xref))
+			# the duplicate is not referenced anymore
+			document.update_object(xref, "null")
+		self.stats.duplicates += len(duplicates)
+
+class CardEmbedder:
+	"""Embeds the pages of the card pdf or of a `CardDeck` into an output document.
+	Every page is converted into a Form XObject at most once, which can then be placed on any number of sheets by reference.
+	Identical resources of different pages, e.g. the same background image or font embedded separately on every page, are stored only once.
+	"""
+
+	def __init__(self, output, card, geometry, stats=None):
+		self.output = output
+		self.card = card
+		self.geometry = geometry
+		self.forms = dict() # page id -> xref of the Form XObject
+		self.templates = dict() # layout -> xref of the crop mark Form XObject
+		self.sheets = dict() # id of a SheetPlan -> (SheetPlan, resources, xref of the content stream)
+		self.deduplicator = Deduplicator(stats)
+		self.sources = dict() # graft id -> card pdf embedded from
+
+	def reopen(self, output):
+		"""Continue embedding into `output`, which is the same document saved and opened again."""
+
+		self.output = output
+
+	def embed(self, pages):
+		"""Make sure all the given pages are embedded into the output document.
+		Embedding uses a temporary page, which invalidates all `fitz.Page` objects of the output document.
+		Therefore, this has to be called before creating the sheet the pages are placed on.
+		"""
+
+		for page_id in pages:
+			if page_id is not None and page_id not in self.forms:
+				self.forms[page_id] = self._embed(page_id)
+
+	def form(self, page_id) -> int:
+		"""The xref of the Form XObject showing the bleedbox of the given page."""
+
+		return self.forms[page_id]
+
+	def has_template(self, layout) -> bool:
+		return layout in self.templates
+
+	def template(self, layout) -> int:
+		"""The xref of the crop mark Form XObject for the given layout."""
+
+		return self.templates[layout]
+
+	def add_crop_marks(self, layout, lines, sheetbox, thickness):
+		"""Create a Form XObject stroking all crop mark `lines` of a sheet at once."""
+
+		# the lines are given in page coordinates, the content stream uses pdf coordinates
+		height = sheetbox.height
+		path = [f"{format_number(thickness)} w 0 G"]
+		for (x1, y1), (x2, y2) in lines:
+			path.append(f"{format_number(x1)} {format_number(height - y1)} m {format_number(x2)} {format_number(height - y2)} l")
+		path.append("S")
+
+		xref = self.output.get_new_xref()
+		self.output.update_object(xref, f"<< /Type /XObject /Subtype /Form /BBox [0 0 {format_number(sheetbox.width)} {format_number(height)}] >>")
+		self.output.update_stream(xref, "\n".join(path).encode())
+		self.templates[layout] = xref
+
+	def reuse_sheet(self, sheet, page) -> bool:
+		"""Let `page` show the content of the same `SheetPlan` rendered before, if there is one.
+		Identical sheets then share their content stream instead of writing it again.
+		"""
+
+		if id(sheet) not in self.sheets:
+			return False
+		_, resources, content_xref = self.sheets[id(sheet)]
+		self.output.xref_set_key(page.xref, "Resources", resources)
+		self.output.xref_set_key(page.xref, "Contents", f"{content_xref} 0 R")
+		return True
+
+	def add_sheet(self, sheet, content):
+		"""Remember the committed `SheetContent` of a sheet for `reuse_sheet`."""
+
+		# the sheet is kept, so that its id stays unique
+		self.sheets[id(sheet)] = (sheet, *content)
+
+	def _embed(self, page_id) -> int:
+		# show_pdf_page takes care of copying the page with all its resources into the output.
+		# We let it draw the card onto a scratch page of the same size and keep the resulting XObject,
+		# which then shows the card in the rectangle (0, 0, width, height).
+		bleedbox = self.geometry[page_id].bleedbox
+		scratch = self.output.new_page(width=bleedbox.width, height=bleedbox.height)
+		document, number = card_page(self.card, page_id)
+		scratch.show_pdf_page(scratch.rect, document, number, clip=bleedbox)
+		_, reference = self.output.xref_get_key(scratch.xref, "Resources/XObject/fzFrm0")
+		self.output.delete_page(scratch.number)
+		form = int(reference.split()[0])
+		self.deduplicator.deduplicate(self.output, form)
+		self._release(document)
+		return form
+
+	def _release(self, document):
+		# The output keeps a map of the objects copied from every card pdf, which also keeps the card pdf open.
+		# The maps of card pdfs closed by the `DocumentPool` of a deck are dropped, so that their files are closed.
+		self.sources[document._graft_id] = document
+		for graft_id, source in list(self.sources.items()):
+			if source.is_closed:
+				self.output.Graftmaps.pop(graft_id, None)
+				del self.sources[graft_id]
+
+class SheetContent:
+	"""The content of a single output sheet, written as one content stream."""
+
+	def __init__(self, page):
+		self.page = page
+		self.xobjects = dict() # resource name -> xref
+		self.operators = []
+
+	def place(self, xref, rect, rotation=0, flipped=False):
+		"""Place the Form XObject `xref` into `rect`, rotated clockwise by `rotation` degrees and optionally mirrored horizontally.
+		The XObject is not scaled, so `rect` has to match its (rotated) size.
+		"""
+
+		name = f"Fm{xref}"
+		self.xobjects[name] = xref
+
+		# rotate and mirror around the origin (fitz.Matrix rotates counterclockwise in pdf coordinates),
+		# then move the resulting bounding box into place
+		matrix = fitz.Matrix(-rotation)
+		if flipped:
+			matrix *= fitz.Matrix(-1, 1)
+		width, height = (rect.height, rect.width) if rotation % 180 else (rect.width, rect.height)
+		bbox = fitz.Rect(0, 0, width, height) * matrix
+
+		# the content stream uses pdf coordinates, with the origin in the bottom left corner
+		matrix.e = rect.x0 - bbox.x0
+		matrix.f = self.page.rect.height - rect.y1 - bbox.y0
+		numbers = " ".join(format_number(number) for number in matrix)
+		self.operators.append(f"q {numbers} cm /{name} Do Q")
+
+	def commit(self):
+		"""Write the collected content into the page.
+		Returns the resources and the xref of the content stream.
+		"""
+
+		document = self.page.parent
+		xobjects = " ".join(f"/{name} {xref} 0 R" for name, xref in self.xobjects.items())
+		resources = f"<< /XObject << {xobjects} >> >>"
+		document.xref_set_key(self.page.xref, "Resources", resources)
+
+		content_xref = document.get_new_xref()
+		document.update_object(content_xref, "<< >>")
+		document.update_stream(content_xref, "\n".join(self.operators).encode())
+		document.xref_set_key(self.page.xref, "Contents", f"{content_xref} 0 R")
+		return resources, content_xref
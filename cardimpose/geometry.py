@@ -0,0 +1,57 @@
+class PageGeometry:
+	"""The page boxes of a single page of the card pdf and the bleed derived from them."""
+
+	def __init__(self, mediabox, bleedbox, trimbox):
+		self.mediabox = mediabox
+		self.bleedbox = bleedbox
+		self.trimbox = trimbox
+
+		horizontal_bleed = round((bleedbox.width - trimbox.width)/2, 3)
+		vertical_bleed = round((bleedbox.height - trimbox.height)/2, 3)
+
+		# the bleed can only be derived if it is the same in both directions
+		self.bleed = horizontal_bleed if horizontal_bleed == vertical_bleed else None
+
+	@property
+	def size(self) -> tuple[float, float]:
+		"""The size of the card including bleed."""
+
+		return (self.bleedbox.width, self.bleedbox.height)
+
+class GeometryIndex:
+	"""The geometry of every page of a card pdf, collected with a single pass over the document."""
+
+	def __init__(self, document):
+		self.pages = [PageGeometry(page.mediabox, page.bleedbox, page.trimbox) for page in document]
+
+	def __getitem__(self, page_id) -> PageGeometry:
+		return self.pages[page_id]
+
+	def __len__(self):
+		return len(self.pages)
+
+	def check_sheet_sizes(self, sheets):
+		"""Check that all cards on each sheet have the same size.
+		Reports all mismatching pages at once instead of stopping at the first one.
+		"""
+
+		mismatched = dict()
+		sizes = dict() # page -> size, the same pages appear on many sheets of large jobs
+		previous = None
+		for sheet_number, pages in enumerate(sheets, 1):
+			# identical sheets are the same list
+			if pages is previous:
+				continue
+			previous = pages
+			for page_id in pages:
+				if page_id is not None and page_id not in sizes:
+					sizes[page_id] = self[page_id].size
+			# the first slot can be empty on the backside of a partially filled sheet
+			size = sizes[next(page_id for page_id in pages if page_id is not None)]
+			for page_id in pages:
+				if page_id is not None and sizes[page_id] != size:
+					mismatched.setdefault(page_id, sheet_number)
+
+		if mismatched:
+			details = ", ".join(f"page {page_id+1} (sheet {sheet_number})" for page_id, sheet_number in mismatched.items())
+			raise RuntimeError(f"All cards must have the same size. Mismatching: {details}.")
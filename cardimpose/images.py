@@ -0,0 +1,102 @@
+import concurrent.futures
+import fitz
+import glob
+import hashlib
+import os
+import re
+
+# the image formats read by MuPDF which are commonly used for cards
+IMAGE_EXTENSIONS = {".png", ".jpg", ".jpeg", ".tif", ".tiff", ".bmp", ".gif"}
+
+def is_image_source(source) -> bool:
+	"""Whether the card source is a directory or a glob pattern of images instead of a pdf."""
+
+	if not isinstance(source, (str, os.PathLike)):
+		return False
+	source = os.fspath(source)
+	if os.path.isfile(source):
+		# an existing file is taken as it is, even if its name looks like a glob pattern, e.g. "order[1].pdf"
+		return is_image_file(source)
+	return os.path.isdir(source) or glob.has_magic(source)
+
+def is_image_file(path) -> bool:
+	return os.path.splitext(path)[1].lower() in IMAGE_EXTENSIONS
+
+def _natural_key(path):
+	# "card2.png" comes before "card10.png"
+	return [int(part) if part.isdigit() else part.lower() for part in re.split(r"(\d+)", path)]
+
+def find_images(source) -> list[str]:
+	"""The image files of a directory or glob pattern, in natural order of their names."""
+
+	source = os.fspath(source)
+	if os.path.isdir(source):
+		paths = [entry.path for entry in os.scandir(source) if entry.is_file()]
+	elif os.path.isfile(source):
+		paths = [source]
+	else:
+		paths = [path for path in glob.glob(source) if os.path.isfile(path)]
+	paths = [path for path in paths if is_image_file(path)]
+	if not paths:
+		raise ValueError(f"No images found in \"{source}\".")
+	return sorted(paths, key=_natural_key)
+
+def file_hash(path) -> str:
+	digest = hashlib.sha256()
+	with open(path, "rb") as file:
+		for block in iter(lambda: file.read(1024 * 1024), b""):
+			digest.update(block)
+	return digest.hexdigest()
+
+def convert_image(path, size=None) -> bytes:
+	"""A pdf with a single page showing the image, with the given size or the size derived from the resolution of the image."""
+
+	with fitz.open(path) as image:
+		if image.page_count == 0:
+			raise RuntimeError(f"Invalid image file \"{path}\".")
+		rect = image[0].rect if size is None else fitz.Rect(0, 0, *size)
+
+	output = fitz.open()
+	page = output.new_page(width=rect.width, height=rect.height)
+	# MuPDF keeps JPEG images compressed as they are and only recompresses other formats
+	page.insert_image(page.rect, filename=path, keep_proportion=False)
+	data = output.tobytes(deflate=True)
+	output.close()
+	return data
+
+def _convert_task(task):
+	return convert_image(*task)
+
+def open_images(source, size=None, jobs=None) -> tuple[bytes, list[int], str]:
+	"""Convert the images of a directory or glob pattern into a card pdf with one page per distinct image.
+	Byte-identical images (e.g. a shared back design) become a single page, so they are embedded only once.
+	The images are decoded by `jobs` worker processes (default: number of CPUs) and added to the pdf as they are converted.
+	Returns the pdf, the page of the pdf showing each image and a hash of all images and the size.
+	"""
+
+	paths = find_images(source)
+	hashes = [file_hash(path) for path in paths]
+
+	pages = dict() # image hash -> page of the card pdf
+	unique = []
+	for path, image_hash in zip(paths, hashes):
+		if image_hash not in pages:
+			pages[image_hash] = len(unique)
+			unique.append(path)
+
+	tasks = [(path, size) for path in unique]
+	jobs = min(jobs or os.cpu_count() or 1, len(tasks))
+	card = fitz.open()
+	if jobs > 1:
+		with concurrent.futures.ProcessPoolExecutor(max_workers=jobs) as executor:
+			# map returns the pages in order while the later images are still being converted
+			for data in executor.map(_convert_task, tasks, chunksize=max(1, len(tasks) // (jobs * 4))):
+				card.insert_pdf(fitz.open("pdf", data))
+	else:
+		for task in tasks:
+			card.insert_pdf(fitz.open("pdf", _convert_task(task)))
+
+	data = card.tobytes(garbage=1)
+	card.close()
+	digest = hashlib.sha256(repr((hashes, size)).encode()).hexdigest()
+	return data, [pages[image_hash] for image_hash in hashes], digest
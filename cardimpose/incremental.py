@@ -0,0 +1,74 @@
+import fitz
+import hashlib
+import json
+import os
+
+from cardimpose.optimize import save_document
+
+# the version of the state file, a different version causes a full imposition
+STATE_VERSION = 1
+
+def state_path(path) -> str:
+	"""The path of the file remembering the input of the sheets written to `path`."""
+
+	return path + ".incremental.json"
+
+def _load_state(path) -> dict:
+	try:
+		with open(state_path(path)) as file:
+			state = json.load(file)
+	except (FileNotFoundError, ValueError):
+		return None
+	return state if state.get("version") == STATE_VERSION else None
+
+def impose_incremental(impose, path, rows=None, cols=None) -> list[int]:
+	"""Impose the cards into `path`, rendering only the sheets whose cards changed since the last call
+	and splicing them into the previous output. Everything is imposed again if the layout changed.
+	Returns the indices of the rendered sheets.
+	"""
+
+	# the name of the state file and of the temporary file are derived from the path
+	path = os.fspath(path)
+	plan = impose.plan(rows, cols)
+	hashes = impose.page_hashes()
+	# the plan describes the placement of every card, if it is unchanged only the content of the cards can differ
+	layout = hashlib.sha256(json.dumps([plan.to_dict(), impose.output_preset]).encode()).hexdigest()
+	sheets = [[hashes[slot.page] for slot in sheet.slots] for sheet in plan.sheets]
+
+	previous = _load_state(path)
+	if previous is not None and previous["layout"] == layout and os.path.exists(path):
+		changed = [number for number, (pages, previous_pages) in enumerate(zip(sheets, previous["sheets"])) if pages != previous_pages]
+		if changed:
+			_splice(impose, plan, changed, path)
+	else:
+		changed = list(range(plan.sheet_count))
+		_write(impose, impose.render(plan), path)
+
+	with open(state_path(path), "w") as file:
+		json.dump({"version": STATE_VERSION, "layout": layout, "sheets": sheets}, file)
+	return changed
+
+def _splice(impose, plan, changed, path):
+	"""Replace the changed sheets of the document at `path` with newly rendered ones."""
+
+	output = fitz.open(path)
+	if output.page_count != plan.sheet_count:
+		output.close()
+		_write(impose, impose.render(plan), path)
+		return
+
+	rendered = impose.render(plan.with_sheets([plan.sheets[number] for number in changed]))
+	# all sheets are inserted at once, so that the cards shared between them are copied only once
+	first = output.page_count
+	output.insert_pdf(rendered)
+	replacements = {number: first + index for index, number in enumerate(changed)}
+	output.select([replacements.get(number, number) for number in range(plan.sheet_count)])
+	_write(impose, output, path)
+
+def _write(impose, document, path):
+	# the document may have been opened from `path`, so it is written next to it and then moved
+	temporary = path + ".tmp"
+	# replaced sheets leave unused objects behind, which are always removed
+	save_document(document, temporary, impose.output_preset, collect_garbage=True)
+	document.close()
+	os.replace(temporary, path)
@@ -1,6 +1,7 @@
 from cardimpose.parse import parse_page_spec
+from cardimpose.pages import PageSequence
+import array
 import itertools
-import unittest
 
 from enum import Enum
 
@@ -16,21 +17,22 @@ class Mode(Enum):
 
 	DUPLICATES = 0 # Each output page consists of multiple copies of the same card
 	SINGLES = 1    # Each card is included once in the output
+	PACKED = 2     # Each card is included once, cards of different sizes are packed onto as few output pages as possible
 
 def split_front_back(pages, backside):
-	"""Split the list of pages into two separate lists: all pages describing front sides and all pages
+	"""Split the sequence of pages into two separate sequences: all pages describing front sides and all pages
 	describing backsides (depending on the value of `Backside`).
 	"""
 
 	# Backside.SINGLESIDED does not return any pages for the backs.
 	if backside == Backside.SINGLESIDED:
-		return pages, []
+		return pages, PageSequence()
 	# Backside.LAST_PAGE returns everything but the last page for the fronts,
 	# and the same number of duplicates of the last page for the backs
 	elif backside == Backside.LAST_PAGE:
 		if len(pages) <= 2:
 			raise RuntimeError("Last-Page doublesided is only possible with for than one input page.")
-		return pages[:-1], [pages[-1]]*(len(pages)-1)
+		return pages[:-1], PageSequence.repeat(pages[-1], len(pages)-1)
 	# for Backside.ALTERNATING, we split the pages into even and odd pages.
 	elif backside == Backside.ALTERNATING:
 		if len(pages) % 2 != 0:
@@ -44,20 +46,122 @@ def split_front_back(pages, backside):
 def generate_duplicates(pages, cards_per_page):
 	"""Generator which generates groups of pages, each page corresponding to a single output page.
 	For Mode.DUPLICATES, this fills the whole page with the same page.
+	Consecutive output pages showing the same page are the same list object, so they can be recognized as identical.
 	"""
 
-	for page in pages:
-		yield [page]*cards_per_page
+	for page, count in pages.iter_runs():
+		sheet = [page]*cards_per_page
+		for _ in range(count):
+			yield sheet
 
-def generate_singles(pages, cards_per_page):
+EMPTY = -1 # the page index of a slot without a card in a `LayoutGrid`
+
+def sequential_order(count, cards_per_sheet):
+	"""The cards in reading order, one sheet after the other."""
+
+	return array.array("q", range(count))
+
+def cut_and_stack_order(count, cards_per_sheet):
+	"""The cards run down through the stack of sheets, one slot after the other.
+	After cutting the whole stack at once, the piles of the slots put on top of each other are in order.
+	"""
+
+	sheets = -(-count // cards_per_sheet)
+	positions = array.array("q", range(count))
+	for slot in range(cards_per_sheet):
+		start = slot * sheets
+		end = min(start + sheets, count)
+		positions[start:end] = array.array("q", range(slot, slot + (end - start) * cards_per_sheet, cards_per_sheet))
+	return positions
+
+# An ordering maps the number of cards and the cards per sheet to the position of every card,
+# which is `sheet * cards_per_sheet + slot` with the slots in reading order.
+ORDERINGS = {
+	"sequential": sequential_order,
+	"cut-and-stack": cut_and_stack_order,
+}
+
+def get_ordering(ordering):
+	"""The function of an ordering given by its name in `ORDERINGS`, or the function itself."""
+
+	if callable(ordering):
+		return ordering
+	try:
+		return ORDERINGS[ordering]
+	except (KeyError, TypeError):
+		raise ValueError(f"unsupported ordering: {ordering}") from None
+
+class LayoutGrid:
+	"""The page indices of all sheets of a job as one flat array of shape (sheets, rows, cols),
+	with `EMPTY` in the slots without a card.
+	"""
+
+	def __init__(self, cells, rows, cols):
+		self.cells = cells
+		self.rows = rows
+		self.cols = cols
+
+	@staticmethod
+	def arrange(pages, rows, cols, ordering=sequential_order):
+		"""Place every page once on as many sheets as needed, at the positions given by `ordering`."""
+
+		cards_per_sheet = rows * cols
+		if ordering is sequential_order:
+			cells = array.array("q", pages)
+		else:
+			positions = ordering(len(pages), cards_per_sheet)
+			if len(positions) != len(pages):
+				raise ValueError("An ordering must place every card exactly once.")
+			sheets = (max(positions, default=-1) + cards_per_sheet) // cards_per_sheet
+			if len({position // cards_per_sheet for position in positions}) != sheets:
+				raise ValueError("An ordering must not leave sheets without cards.")
+			cells = array.array("q", [EMPTY]) * (sheets * cards_per_sheet)
+			for position, page in zip(positions, pages):
+				if position < 0 or cells[position] != EMPTY:
+					raise ValueError("An ordering must place every card exactly once.")
+				cells[position] = page
+		# the last sheet is filled up with empty slots
+		cells.extend([EMPTY] * (-len(cells) % cards_per_sheet))
+		return LayoutGrid(cells, rows, cols)
+
+	@property
+	def sheet_count(self) -> int:
+		return len(self.cells) // (self.rows * self.cols)
+
+	@property
+	def shape(self) -> tuple[int, int, int]:
+		return self.sheet_count, self.rows, self.cols
+
+	def flipped(self):
+		"""The grid with the cards of every row in reverse order, so that the backsides line up with their front sides."""
+
+		cells = array.array("q", self.cells)
+		for col in range(self.cols):
+			cells[col::self.cols] = self.cells[self.cols - 1 - col::self.cols]
+		return LayoutGrid(cells, self.rows, self.cols)
+
+	def sheet(self, number) -> list:
+		"""The pages of one sheet in reading order, None for empty slots."""
+
+		cards_per_sheet = self.rows * self.cols
+		start = number * cards_per_sheet
+		return [None if page == EMPTY else page for page in self.cells[start:start + cards_per_sheet]]
+
+	def __iter__(self):
+		# consecutive equal sheets are the same list object, so they can be recognized as identical
+		previous = None
+		for number in range(self.sheet_count):
+			sheet = self.sheet(number)
+			if sheet != previous:
+				previous = sheet
+			yield previous
+
+def generate_singles(pages, cards_per_page, ordering=sequential_order):
 	"""Generator which generates groups of pages, each page corresponding to a single output page.
 	For Mode.SINGLES, this returns all pages once, grouped into the number of cards per page.
 	"""
 
-	page_iterator = iter(pages)
-	while len(pages := list(itertools.islice(page_iterator, cards_per_page))) != 0:
-		if len(pages) < cards_per_page: pages.extend([None]*(cards_per_page-len(pages)))
-		yield pages
+	yield from LayoutGrid.arrange(pages, 1, cards_per_page, get_ordering(ordering))
 
 def flip_horizontal(pages, cols):
 	"""Flips the cards on a single output page horizontally (to align with the front sides)."""
@@ -69,13 +173,31 @@ def flip_horizontal(pages, cols):
 		flipped_pages.extend(col[::-1])
 	return flipped_pages
 
-def generate_layout(pages, rows, cols, mode, backside):
-	"""Generates lists of page indices, each list corresponding to the cards on one output page."""
+def generate_layout(pages, rows, cols, mode, backside, ordering="sequential"):
+	"""Generates lists of page indices, each list corresponding to the cards on one output page.
+	`pages` is a `PageSequence` or any other sequence of page indices.
+	For Mode.SINGLES, `ordering` is the name of one of the `ORDERINGS` or a function like them
+	which places the cards on the sheets. With Mode.DUPLICATES, every sheet shows a single card in the order of the pages.
+	"""
+
+	if not isinstance(pages, PageSequence):
+		pages = PageSequence(pages)
 
+	ordering = get_ordering(ordering)
 	if mode == Mode.DUPLICATES:
 		generator = generate_duplicates
 	elif mode == Mode.SINGLES:
-		generator = generate_singles
+		# all sheets are arranged at once, the backsides use the same positions as their front sides
+		front, back = split_front_back(pages, backside)
+		fronts = LayoutGrid.arrange(front, rows, cols, ordering)
+		if backside == Backside.SINGLESIDED:
+			yield from fronts
+		else:
+			for sheets in zip(fronts, LayoutGrid.arrange(back, rows, cols, ordering).flipped()):
+				yield from sheets
+		return
+	elif mode == Mode.PACKED:
+		raise ValueError("Packed cards are not placed in rows and columns, see `cardimpose.packing`.")
 	else:
 		raise ValueError(f"unsupported mode: {mode}")
 
@@ -86,7 +208,12 @@ def generate_layout(pages, rows, cols, mode, backside):
 	else:
 		front = pages
 		backsides = None
+
+	# identical backsides are flipped once, so that they stay the same object
+	back_output, flipped = None, None
 	for front_output in generator(front, cards_per_page):
 		yield front_output
 		if backsides:
-			yield flip_horizontal(next(backsides), cols)
\ No newline at end of file
+			if (next_back := next(backsides)) is not back_output:
+				back_output, flipped = next_back, flip_horizontal(next_back, cols)
+			yield flipped
\ No newline at end of file
@@ -0,0 +1,52 @@
+import json
+
+# The phases reported to the observers of a `CardImpose`:
+# open: opening the card pdf and indexing its page geometry
+# resample: downsampling the images of the card pdf
+# bleed_detection: deriving the bleed from the page boxes
+# layout: generating the layout and planning all sheets
+# embedding: copying card pages into the output (per sheet)
+# placement: placing the cards on a sheet (per sheet)
+# crop_marks: generating and placing the crop marks (per sheet)
+# render: rendering all sheets in worker processes (with multiple jobs)
+# save: writing the resulting document
+# rasterize: writing the sheets as images
+PHASES = ["open", "resample", "bleed_detection", "layout", "embedding", "placement", "crop_marks", "render", "save", "rasterize"]
+
+class Profiler:
+	"""An observer collecting the number of calls and the duration of each phase, in total and per sheet."""
+
+	def __init__(self):
+		self.phases = dict() # phase -> {"count": int, "seconds": float}
+		self.sheets = dict() # sheet -> phase -> seconds
+
+	def __call__(self, phase, seconds, sheet=None):
+		totals = self.phases.setdefault(phase, {"count": 0, "seconds": 0.0})
+		totals["count"] += 1
+		totals["seconds"] += seconds
+
+		if sheet is not None:
+			sheet_phases = self.sheets.setdefault(sheet, dict())
+			sheet_phases[phase] = sheet_phases.get(phase, 0.0) + seconds
+
+	def to_dict(self) -> dict:
+		"""The collected metrics.
+		The "counters" list flat Prometheus-style counters with their labels, ready to be exported.
+		"""
+
+		counters = []
+		for phase, totals in self.phases.items():
+			counters.append({"name": "cardimpose_phase_seconds_total", "labels": {"phase": phase}, "value": totals["seconds"]})
+			counters.append({"name": "cardimpose_phase_calls_total", "labels": {"phase": phase}, "value": totals["count"]})
+		counters.append({"name": "cardimpose_sheets_total", "labels": {}, "value": len(self.sheets)})
+
+		return {
+			"seconds": sum(totals["seconds"] for totals in self.phases.values()),
+			"phases": self.phases,
+			"sheets": [{"sheet": sheet, **phases} for sheet, phases in sorted(self.sheets.items())],
+			"counters": counters,
+		}
+
+	def save(self, path):
+		with open(path, "w") as file:
+			json.dump(self.to_dict(), file, indent=2)
@@ -0,0 +1,55 @@
+import fitz
+import os
+import warnings
+
+# The options passed to `fitz.Document.save` for each output preset.
+PRESETS = {
+	# store the document as it was generated
+	"none": dict(),
+	# drop unused objects and compress the content streams
+	"fast": dict(garbage=1, deflate=True),
+	# additionally merge duplicate objects (e.g. fonts and images), compress all streams and use object streams
+	"small": dict(garbage=4, clean=True, deflate=True, deflate_images=True, deflate_fonts=True, use_objstms=True),
+	# like "small", but linearized for viewing while downloading
+	"web": dict(garbage=4, clean=True, deflate=True, deflate_images=True, deflate_fonts=True, use_objstms=True, linear=True),
+}
+
+# The options which can also be used when saving incrementally
+INCREMENTAL_OPTIONS = ("deflate", "deflate_images", "deflate_fonts")
+
+def save_options(preset, incremental=False) -> dict:
+	"""The options of `fitz.Document.save` for the given preset."""
+
+	if preset not in PRESETS:
+		raise ValueError(f"Unsupported output preset \"{preset}\", choose one of {', '.join(PRESETS)}.")
+
+	options = dict(PRESETS[preset])
+	if incremental:
+		options = {option: value for option, value in options.items() if option in INCREMENTAL_OPTIONS}
+	return options
+
+def _save(document, path, options):
+	if isinstance(path, (str, os.PathLike)):
+		document.save(path, **options)
+	else:
+		# MuPDF would save file objects to the path given by their name, which does not work e.g. for stdout
+		path.write(document.tobytes(**options))
+
+def save_document(document, path, preset, collect_garbage=False):
+	"""Save the document with the options of the given preset.
+	`path` can also be a writable binary file object.
+	With `collect_garbage`, unused objects are removed even if the preset keeps them.
+	"""
+
+	options = save_options(preset)
+	if collect_garbage:
+		options["garbage"] = max(options.get("garbage", 0), 1)
+	if options.get("linear"):
+		try:
+			_save(document, path, options)
+			return
+		except Exception as e:
+			# recent versions of MuPDF no longer support linearization
+			warnings.warn(f"Could not linearize the document ({e}), saving it without linearization.")
+			del options["linear"]
+	_save(document, path, options)
@@ -0,0 +1,91 @@
+EPSILON = 1e-6
+
+class MaxRectsBin:
+	"""A single sheet filled with the MaxRects algorithm.
+	The free space is kept as the list of all maximal free rectangles (x, y, width, height), which may overlap.
+	"""
+
+	def __init__(self, width, height):
+		self.width = width
+		self.height = height
+		self.free = [(0, 0, width, height)]
+		self.rejected = set() # sizes which did not fit, and never will as the sheet only gets fuller
+
+	def find(self, width, height, allow_rotation):
+		"""Find the best position for a rectangle, the one leaving the shortest side of a free rectangle.
+		Returns (score, x, y, rotated) or None if it does not fit.
+		"""
+
+		if (width, height) in self.rejected:
+			return None
+
+		best = None
+		for x, y, free_width, free_height in self.free:
+			for rotated, (w, h) in enumerate([(width, height), (height, width)] if allow_rotation else [(width, height)]):
+				if w <= free_width + EPSILON and h <= free_height + EPSILON:
+					leftover = (free_width - w, free_height - h)
+					score = (min(leftover), max(leftover))
+					if best is None or score < best[0]:
+						best = (score, x, y, bool(rotated))
+
+		if best is None:
+			self.rejected.add((width, height))
+		return best
+
+	def place(self, x, y, width, height):
+		"""Mark the rectangle as used and split the free rectangles it overlaps."""
+
+		free = []
+		for fx, fy, fw, fh in self.free:
+			# no overlap, the free rectangle stays as it is
+			if x >= fx + fw - EPSILON or x + width <= fx + EPSILON or y >= fy + fh - EPSILON or y + height <= fy + EPSILON:
+				free.append((fx, fy, fw, fh))
+				continue
+
+			# the maximal rectangles left, right, above and below the used rectangle
+			if x > fx + EPSILON:
+				free.append((fx, fy, x - fx, fh))
+			if x + width < fx + fw - EPSILON:
+				free.append((x + width, fy, fx + fw - x - width, fh))
+			if y > fy + EPSILON:
+				free.append((fx, fy, fw, y - fy))
+			if y + height < fy + fh - EPSILON:
+				free.append((fx, y + height, fw, fy + fh - y - height))
+
+		self.free = [rect for index, rect in enumerate(free) if not any(
+			other_index != index and _contains(other, rect) and (other != rect or other_index < index)
+			for other_index, other in enumerate(free)
+		)]
+
+def _contains(outer, inner) -> bool:
+	ox, oy, ow, oh = outer
+	ix, iy, iw, ih = inner
+	return ox <= ix + EPSILON and oy <= iy + EPSILON and ix + iw <= ox + ow + EPSILON and iy + ih <= oy + oh + EPSILON
+
+def pack(sizes, width, height, allow_rotation=True) -> list:
+	"""Pack rectangles of the given sizes onto as few sheets of `width` and `height` as possible.
+	Returns the placement (sheet, x, y, rotated) of every rectangle, in the order of `sizes`.
+	The largest rectangles are placed first, each into the first sheet where it fits best.
+	"""
+
+	placements = [None] * len(sizes)
+	bins = []
+	for index in sorted(range(len(sizes)), key=lambda index: (max(sizes[index]), min(sizes[index])), reverse=True):
+		item_width, item_height = sizes[index]
+
+		for number, sheet in enumerate(bins):
+			found = sheet.find(item_width, item_height, allow_rotation)
+			if found is not None:
+				break
+		else:
+			sheet = MaxRectsBin(width, height)
+			found = sheet.find(item_width, item_height, allow_rotation)
+			if found is None:
+				raise RuntimeError(f"Page is to small to fit a card of size {item_width:.1f}x{item_height:.1f}.")
+			bins.append(sheet)
+			number = len(bins) - 1
+
+		_, x, y, rotated = found
+		sheet.place(x, y, *((item_height, item_width) if rotated else (item_width, item_height)))
+		placements[index] = (number, x, y, rotated)
+	return placements
@@ -0,0 +1,160 @@
+import bisect
+import itertools
+
+class PageSequence:
+	"""A sequence of page indices stored as runs instead of a list of all pages.
+	A run is either an arithmetic range of pages (e.g. 0, 1, 2, ...) or one page repeated a number of times,
+	so quantity specs like "5000x1" take constant memory. Length, indexing and slicing do not expand the runs.
+	"""
+
+	def __init__(self, pages=()):
+		self.runs = [] # (range of pages, repeat), either the range has a single page or the repeat is 1
+		self.offsets = [] # the index of the first page of each run
+		self.length = 0
+		if isinstance(pages, PageSequence):
+			for run, repeat in pages.runs:
+				self._append_run(run, repeat)
+		elif isinstance(pages, range):
+			self.extend_range(pages)
+		else:
+			for page in pages:
+				self.append(page)
+
+	@staticmethod
+	def repeat(page, count):
+		"""The sequence containing `page` `count` times."""
+
+		sequence = PageSequence()
+		sequence.append(page, count)
+		return sequence
+
+	def append(self, page, count=1):
+		"""Append `count` copies of `page`."""
+
+		self._append_run(range(page, page + 1), count)
+
+	def extend_range(self, pages):
+		"""Append all pages of the range `pages`."""
+
+		if len(pages) == 1:
+			self.append(pages[0])
+		elif len(pages) > 1:
+			self._append_run(pages, 1)
+
+	def _append_run(self, pages, repeat):
+		if len(pages) == 0 or repeat == 0:
+			return
+
+		if self.runs:
+			last, last_repeat = self.runs[-1]
+			merged = None
+			if len(last) == 1 and len(pages) == 1 and last[0] == pages[0]:
+				# more copies of the same page
+				merged = (last, last_repeat + repeat)
+			elif last_repeat == 1 and repeat == 1:
+				# continue an arithmetic range of pages
+				step = pages[0] - last[-1]
+				if step != 0 and (len(last) == 1 or last.step == step) and (len(pages) == 1 or pages.step == step):
+					merged = (range(last[0], pages[-1] + step, step), 1)
+			if merged is not None:
+				self.runs[-1] = merged
+				self.length += len(pages) * repeat
+				return
+
+		self.runs.append((pages, repeat))
+		self.offsets.append(self.length)
+		self.length += len(pages) * repeat
+
+	def __len__(self):
+		return self.length
+
+	def __iter__(self):
+		for pages, repeat in self.runs:
+			if repeat == 1:
+				yield from pages
+			else:
+				yield from itertools.repeat(pages[0], repeat)
+
+	def iter_runs(self):
+		"""Iterate over the pages as pairs (page, count) of consecutive equal pages."""
+
+		for pages, repeat in self.runs:
+			if repeat == 1:
+				yield from ((page, 1) for page in pages)
+			else:
+				yield pages[0], repeat
+
+	def __getitem__(self, index):
+		if isinstance(index, slice):
+			return self._slice(index)
+
+		if index < 0:
+			index += self.length
+		if not 0 <= index < self.length:
+			raise IndexError("page sequence index out of range")
+		run = bisect.bisect_right(self.offsets, index) - 1
+		pages, repeat = self.runs[run]
+		return pages[(index - self.offsets[run]) // repeat]
+
+	def _slice(self, index):
+		start, stop, step = index.indices(self.length)
+		count = len(range(start, stop, step))
+		if count == 0:
+			return PageSequence()
+		if step < 0:
+			# the same pages in ascending order, then reversed
+			first = start + step * (count - 1)
+			return self._slice(slice(first, start + 1, -step)).reversed()
+
+		sequence = PageSequence()
+		last = start + step * (count - 1)
+		for run in range(bisect.bisect_right(self.offsets, start) - 1, len(self.runs)):
+			offset = self.offsets[run]
+			if offset > last:
+				break
+			pages, repeat = self.runs[run]
+			# the first selected index in this run
+			first = max(start, offset)
+			first += (start - first) % step
+			end = min(last + 1, offset + len(pages) * repeat)
+			if first >= end:
+				continue
+			if repeat == 1:
+				sequence.extend_range(pages[first - offset:end - offset:step])
+			else:
+				sequence.append(pages[0], len(range(first, end, step)))
+		return sequence
+
+	def shifted(self, offset):
+		"""The same sequence with `offset` added to every page."""
+
+		sequence = PageSequence()
+		for pages, repeat in self.runs:
+			sequence._append_run(range(pages.start + offset, pages.stop + offset, pages.step), repeat)
+		return sequence
+
+	def reversed(self):
+		sequence = PageSequence()
+		for pages, repeat in reversed(self.runs):
+			sequence._append_run(pages[::-1], repeat)
+		return sequence
+
+	def __add__(self, other):
+		sequence = PageSequence(self)
+		for pages, repeat in PageSequence(other).runs:
+			sequence._append_run(pages, repeat)
+		return sequence
+
+	def __eq__(self, other):
+		try:
+			return len(self) == len(other) and all(a == b for a, b in zip(self, other))
+		except TypeError:
+			return NotImplemented
+
+	def to_list(self) -> list:
+		"""The runs as plain lists [first, stop, step, repeat], e.g. for hashing the sequence."""
+
+		return [[pages.start, pages.stop, pages.step, repeat] for pages, repeat in self.runs]
+
+	def __repr__(self):
+		return f"PageSequence({self.to_list()})"
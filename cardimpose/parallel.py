@@ -0,0 +1,58 @@
+import concurrent.futures
+import fitz
+import math
+import pickle
+
+from cardimpose.layout import Backside
+from cardimpose.embed import CardEmbedder, DeduplicationStats, Deduplicator
+
+# the `CardImpose` and `ImpositionPlan` of the current worker process, opened once by `_init_worker`
+_worker_impose = None
+_worker_plan = None
+
+def _init_worker(state, plan):
+	global _worker_impose, _worker_plan
+	_worker_impose = pickle.loads(state)
+	_worker_plan = plan
+
+def _render_shard(sheets):
+	output = fitz.Document()
+	stats = DeduplicationStats()
+	_worker_impose._render(_worker_plan, sheets, CardEmbedder(output, _worker_impose.card, _worker_impose.geometry, stats))
+	return output.tobytes(), stats
+
+def split_shards(sheets, jobs, backside):
+	"""Split the list of sheets into contiguous shards, a few per worker to balance the load.
+	Front and back of a sheet always end up in the same shard.
+	"""
+
+	shard_size = max(1, math.ceil(len(sheets) / (jobs * 4)))
+	if backside != Backside.SINGLESIDED and shard_size % 2 != 0:
+		shard_size += 1
+	return [sheets[start:start+shard_size] for start in range(0, len(sheets), shard_size)]
+
+def impose_parallel(impose, plan, jobs) -> fitz.Document:
+	"""Render the sheets of the `plan` using a pool of `jobs` worker processes.
+	Each worker opens the card pdf once and renders whole shards of sheets, which are then merged in order.
+	"""
+
+	shards = split_shards(plan.sheets, jobs, impose.backside)
+
+	# The settings are pickled explicitly, so that every worker opens its own handle of the card pdf
+	# instead of sharing the one of the parent process when the workers are forked.
+	state = pickle.dumps(impose)
+
+	output = fitz.Document()
+	# every shard contains its own copy of the cards, the copies are merged again
+	merged = Deduplicator()
+	with concurrent.futures.ProcessPoolExecutor(max_workers=jobs, initializer=_init_worker, initargs=(state, plan.with_sheets([]))) as executor:
+		# map returns the results in the order of the shards
+		for partial, stats in executor.map(_render_shard, shards):
+			first = output.page_count
+			output.insert_pdf(fitz.open("pdf", partial))
+			for number in range(first, output.page_count):
+				merged.deduplicate(output, output.page_xref(number))
+			impose.deduplication.add(stats)
+	impose.deduplication.duplicates += merged.stats.duplicates
+	impose.deduplication.bytes_saved += merged.stats.bytes_saved
+	return output
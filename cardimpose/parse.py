@@ -1,5 +1,7 @@
 import re
 
+from cardimpose.pages import PageSequence
+
 def parse_length(length) -> float:
 	"""Parses the given `length` and returns it as a floating point number in pixels."""
 
@@ -31,7 +33,29 @@ def parse_tuple(tup) -> tuple[float, float]:
 		length = parse_length(split[0])
 		return (length, length)
 
-def parse_page_spec(spec, num_pages):
+def parse_prices(prices) -> dict[str, float]:
+	"""Parses prices in the form \"A4=0.05,SRA3=0.18\" and returns them as a dict {"A4": 0.05, "SRA3": 0.18}."""
+
+	result = dict()
+	for price in prices.split(","):
+		name, _, value = price.partition("=")
+		try:
+			result[name.strip()] = float(value)
+		except ValueError:
+			raise ValueError(f"Unsupported price \"{price}\".") from None
+	return result
+
+def parse_quality(quality):
+	"""Parses an image quality, either a JPEG quality like \"85\" or \"lossless\"."""
+
+	if quality == "lossless":
+		return quality
+	try:
+		return int(quality)
+	except ValueError:
+		raise ValueError(f"Unsupported image quality \"{quality}\".") from None
+
+def parse_page_spec(spec, num_pages) -> PageSequence:
 
 	def convert_page_number(page_number):
 		try:
@@ -49,12 +73,12 @@ def parse_page_spec(spec, num_pages):
 
 		return page_index
 
-	pages = []
+	pages = PageSequence()
 	for spec_part in spec.split(","):
 
 		# the whole document
 		if spec_part == ".":
-			pages.extend(range(0, num_pages))
+			pages.extend_range(range(0, num_pages))
 
 		# a specific page
 		elif spec_part.isdigit() or spec_part[0] == "-":
@@ -69,16 +93,16 @@ def parse_page_spec(spec, num_pages):
 			if factor < 0:
 				raise ValueError(f"Error parsing page spec \"{spec}\": factor {r[0]} can not be negative.")
 			page = convert_page_number(r[1])
-			pages.extend([page]*factor)
+			pages.append(page, factor)
 
 		# a range of pages
 		elif len(r := spec_part.split("-")) == 2:
 			lb = convert_page_number(r[0])
 			ub = convert_page_number(r[1])
 			if lb < ub:
-				pages.extend(range(lb, ub+1))
+				pages.extend_range(range(lb, ub+1))
 			else:
-				pages.extend(range(lb, ub-1, -1))
+				pages.extend_range(range(lb, ub-1, -1))
 		else:
 			raise ValueError(f"Error parsing page spec \"{spec}\".")	
 	return pages
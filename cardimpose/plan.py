@@ -0,0 +1,153 @@
+import json
+
+class CardSlot:
+	"""A single card placed on a sheet.
+
+	page: the page of the card pdf shown in the slot.
+	rect: the bounding box (x0, y0, x1, y1) of the card on the sheet, including bleed.
+	rotation: the clockwise rotation of the card in degrees, a multiple of 90.
+	flipped: whether the card is mirrored horizontally.
+	"""
+
+	def __init__(self, page, rect, rotation=0, flipped=False):
+		self.page = page
+		self.rect = tuple(rect)
+		self.rotation = rotation
+		self.flipped = flipped
+
+	def to_dict(self) -> dict:
+		return {"page": self.page, "rect": list(self.rect), "rotation": self.rotation, "flipped": self.flipped}
+
+	@staticmethod
+	def from_dict(data):
+		return CardSlot(data["page"], data["rect"], data.get("rotation", 0), data.get("flipped", False))
+
+class SheetPlan:
+	"""The cards and crop marks of one output sheet.
+
+	slots: the `CardSlot`s on the sheet.
+	crop_marks: the index of the crop marks in `ImpositionPlan.crop_marks`, or None.
+	back: whether the sheet is the backside of the previous sheet.
+	"""
+
+	def __init__(self, slots, crop_marks=None, back=False):
+		self.slots = slots
+		self.crop_marks = crop_marks
+		self.back = back
+
+	def to_dict(self) -> dict:
+		return {"slots": [slot.to_dict() for slot in self.slots], "crop_marks": self.crop_marks, "back": self.back}
+
+	@staticmethod
+	def from_dict(data):
+		return SheetPlan([CardSlot.from_dict(slot) for slot in data["slots"]], data.get("crop_marks"), data.get("back", False))
+
+class ImpositionPlan:
+	"""The complete geometry of an imposition, computed without generating any output.
+
+	sheet_size: the width and height of the output sheets.
+	rows, cols: the grid of cards on each sheet, None for packed cards.
+	bleed: the bleed around each card.
+	crop_mark_thickness: the line width of the crop marks.
+	crop_marks_below: whether the crop marks are drawn underneath the cards.
+	"""
+
+	def __init__(self, sheet_size, rows, cols, bleed, crop_mark_thickness, crop_marks_below=False):
+		self.sheet_size = tuple(sheet_size)
+		self.rows = rows
+		self.cols = cols
+		self.bleed = bleed
+		self.crop_mark_thickness = crop_mark_thickness
+		self.crop_marks_below = crop_marks_below
+		self.crop_marks = [] # lists of crop mark lines ((x1, y1), (x2, y2)), shared by all sheets with the same layout
+		self.sheets = []
+
+	def add_crop_marks(self, lines) -> int:
+		"""Add a set of crop mark lines and return its index."""
+
+		self.crop_marks.append([(tuple(start), tuple(end)) for start, end in lines])
+		return len(self.crop_marks) - 1
+
+	def with_sheets(self, sheets):
+		"""A copy of the plan containing only the given sheets."""
+
+		plan = ImpositionPlan(self.sheet_size, self.rows, self.cols, self.bleed, self.crop_mark_thickness, self.crop_marks_below)
+		plan.crop_marks = self.crop_marks
+		plan.sheets = sheets
+		return plan
+
+	@property
+	def sheet_count(self) -> int:
+		return len(self.sheets)
+
+	@property
+	def cards_per_sheet(self) -> int:
+		if self.rows is None:
+			# packed cards are not placed in rows and columns
+			return max((len(sheet.slots) for sheet in self.sheets), default=0)
+		return self.rows * self.cols
+
+	@property
+	def card_count(self) -> int:
+		return sum(len(sheet.slots) for sheet in self.sheets)
+
+	@property
+	def utilisation(self) -> float:
+		"""The fraction of the paper that ends up as cards (without bleed)."""
+
+		paper = self.sheet_count * self.sheet_size[0] * self.sheet_size[1]
+		if paper == 0:
+			return 0.0
+
+		cards = 0
+		for sheet in self.sheets:
+			for slot in sheet.slots:
+				x0, y0, x1, y1 = slot.rect
+				cards += (x1 - x0 - 2 * self.bleed) * (y1 - y0 - 2 * self.bleed)
+		return cards / paper
+
+	def summary(self) -> dict:
+		"""The totals of the plan."""
+
+		return {
+			"sheets": self.sheet_count,
+			"cards": self.card_count,
+			"cards_per_sheet": self.cards_per_sheet,
+			"utilisation": round(self.utilisation, 4),
+		}
+
+	def to_dict(self) -> dict:
+		return {
+			"sheet_size": list(self.sheet_size),
+			"rows": self.rows,
+			"cols": self.cols,
+			"bleed": self.bleed,
+			"crop_mark_thickness": self.crop_mark_thickness,
+			"crop_marks_below": self.crop_marks_below,
+			"crop_marks": [[list(start) + list(end) for start, end in lines] for lines in self.crop_marks],
+			"sheets": [sheet.to_dict() for sheet in self.sheets],
+			"summary": self.summary(),
+		}
+
+	@staticmethod
+	def from_dict(data):
+		plan = ImpositionPlan(data["sheet_size"], data["rows"], data["cols"], data["bleed"], data["crop_mark_thickness"], data.get("crop_marks_below", False))
+		plan.crop_marks = [[((x1, y1), (x2, y2)) for x1, y1, x2, y2 in lines] for lines in data["crop_marks"]]
+		plan.sheets = [SheetPlan.from_dict(sheet) for sheet in data["sheets"]]
+		return plan
+
+	def to_json(self) -> str:
+		return json.dumps(self.to_dict())
+
+	@staticmethod
+	def from_json(text):
+		return ImpositionPlan.from_dict(json.loads(text))
+
+	def save(self, path):
+		with open(path, "w") as file:
+			file.write(self.to_json())
+
+	@staticmethod
+	def load(path):
+		with open(path) as file:
+			return ImpositionPlan.from_json(file.read())
@@ -0,0 +1,240 @@
+import concurrent.futures
+import fitz
+import hashlib
+import json
+import math
+import os
+import pickle
+import shutil
+import struct
+import zlib
+
+from cardimpose.defaults import DEFAULT_DPI, THUMBNAIL_DPI
+from cardimpose.embed import CardEmbedder
+
+# changes whenever the images change for the same sheets, invalidating cached thumbnails
+RASTER_VERSION = 1
+
+# the number of pixels rendered at once, bounding the memory needed for high resolutions (48 MB for RGB)
+BAND_PIXELS = 16 * 1024 * 1024
+
+class PngWriter:
+	"""Writes an RGB image to a PNG file row by row, without keeping the whole image in memory."""
+
+	def __init__(self, file, width, height, dpi):
+		self.file = file
+		self.compressor = zlib.compressobj(6)
+		file.write(b"\x89PNG\r\n\x1a\n")
+		# 8 bit RGB, no interlacing
+		self._chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0))
+		pixels_per_meter = round(dpi / 0.0254)
+		self._chunk(b"pHYs", struct.pack(">IIB", pixels_per_meter, pixels_per_meter, 1))
+
+	def _chunk(self, kind, data):
+		self.file.write(struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data)))
+
+	def write_rows(self, samples, stride):
+		# every row starts with its filter type, 0 for no filter
+		data = b"".join(b"\x00" + samples[start:start+stride] for start in range(0, len(samples), stride))
+		compressed = self.compressor.compress(data)
+		if compressed:
+			self._chunk(b"IDAT", compressed)
+
+	def close(self):
+		self._chunk(b"IDAT", self.compressor.flush())
+		self._chunk(b"IEND", b"")
+
+class TiffWriter:
+	"""Writes an RGB image to a TIFF file as one deflate compressed strip per band, without keeping the whole image in memory.
+	All bands except the last one must have the same number of rows.
+	"""
+
+	def __init__(self, file, width, height, dpi):
+		self.file = file
+		self.width = width
+		self.height = height
+		self.dpi = dpi
+		self.rows_per_strip = None
+		self.strips = [] # (offset, length)
+		# little endian, the offset of the directory is written when closing
+		file.write(b"II*\x00\x00\x00\x00\x00")
+
+	def write_rows(self, samples, stride):
+		if self.rows_per_strip is None:
+			self.rows_per_strip = len(samples) // stride
+		compressed = zlib.compress(samples, 6)
+		self.strips.append((self.file.tell(), len(compressed)))
+		self.file.write(compressed)
+
+	def close(self):
+		offset = self.file.tell()
+		# the values which do not fit into an entry follow the directory
+		entries = 13
+		values = offset + 2 + entries * 12 + 4
+		extra = b""
+
+		def external(data):
+			nonlocal extra
+			position = values + len(extra)
+			extra += data
+			return position
+
+		resolution = external(struct.pack("<II", round(self.dpi * 1000), 1000))
+		tags = [
+			(256, 4, 1, self.width), # image width
+			(257, 4, 1, self.height), # image length
+			(258, 3, 3, external(struct.pack("<HHH", 8, 8, 8))), # bits per sample
+			(259, 3, 1, 8), # compression: deflate
+			(262, 3, 1, 2), # photometric interpretation: RGB
+			(273, 4, len(self.strips), external(b"".join(struct.pack("<I", start) for start, _ in self.strips)) if len(self.strips) > 1 else self.strips[0][0]), # strip offsets
+			(277, 3, 1, 3), # samples per pixel
+			(278, 4, 1, self.rows_per_strip), # rows per strip
+			(279, 4, len(self.strips), external(b"".join(struct.pack("<I", length) for _, length in self.strips)) if len(self.strips) > 1 else self.strips[0][1]), # strip byte counts
+			(282, 5, 1, resolution), # x resolution
+			(283, 5, 1, resolution), # y resolution
+			(284, 3, 1, 1), # planar configuration: chunky
+			(296, 3, 1, 2), # resolution unit: inch
+		]
+		assert len(tags) == entries
+
+		directory = struct.pack("<H", entries)
+		for tag, kind, count, value in tags:
+			# short values are left aligned in the value field
+			directory += struct.pack("<HHI", tag, kind, count) + (struct.pack("<HH", value, 0) if kind == 3 and count == 1 else struct.pack("<I", value))
+		self.file.write(directory + b"\x00\x00\x00\x00" + extra)
+		self.file.seek(4)
+		self.file.write(struct.pack("<I", offset))
+
+WRITERS = {"png": PngWriter, "tiff": TiffWriter}
+
+def image_paths(path, count, format) -> list[str]:
+	"""The paths of the images of `count` sheets, numbered after `path` without its extension."""
+
+	base = path.removesuffix(".pdf")
+	digits = max(4, len(str(count)))
+	return [f"{base}_{number:0{digits}d}.{format}" for number in range(1, count + 1)]
+
+def sheet_key(plan, sheet, hashes, dpi, format) -> str:
+	"""The key of the image of a sheet, which only depends on what is visible on the sheet."""
+
+	visible = {
+		"version": RASTER_VERSION,
+		"size": plan.sheet_size,
+		"slots": [[hashes[slot.page], slot.rect, slot.rotation, slot.flipped] for slot in sheet.slots],
+		"crop_marks": None if sheet.crop_marks is None else plan.crop_marks[sheet.crop_marks],
+		"crop_mark_thickness": plan.crop_mark_thickness,
+		"crop_marks_below": plan.crop_marks_below,
+		"dpi": dpi,
+		"format": format,
+	}
+	return hashlib.sha256(json.dumps(visible).encode()).hexdigest()
+
+def write_image(page, path, dpi, format):
+	"""Rasterize the page into an image file, in horizontal bands of at most `BAND_PIXELS` pixels."""
+
+	zoom = dpi / 72
+	matrix = fitz.Matrix(zoom, zoom)
+	size = (page.rect * matrix).irect
+	band = max(1, BAND_PIXELS // size.width)
+	# the page is interpreted only once for all bands
+	display_list = page.get_displaylist()
+
+	with open(path, "wb") as file:
+		writer = WRITERS[format](file, size.width, size.height, dpi)
+		for top in range(0, size.height, band):
+			bottom = min(size.height, top + band)
+			# the clip is moved slightly inside the band, so that rounding never adds a row of the neighbouring band
+			clip = fitz.Rect(page.rect.x0, (top + 0.01) / zoom, page.rect.x1, (bottom - 0.01) / zoom)
+			pixmap = display_list.get_pixmap(matrix=matrix, clip=clip, alpha=False, colorspace=fitz.csRGB)
+			writer.write_rows(pixmap.samples, pixmap.stride)
+		writer.close()
+
+def thumbnail(page, dpi) -> bytes:
+	"""The page as a PNG image, rendered at once."""
+
+	pixmap = page.get_pixmap(dpi=dpi, alpha=False, colorspace=fitz.csRGB)
+	return pixmap.tobytes("png")
+
+def rasterize_sheets(impose, plan, tasks):
+	"""Render the sheets of `plan` given as tasks (sheet, path, dpi, format, thumbnail).
+	Returns the PNG images of the thumbnails, in the order of the tasks.
+	"""
+
+	output = fitz.Document()
+	impose._render(plan, [sheet for sheet, _, _, _, _ in tasks], CardEmbedder(output, impose.card, impose.geometry, impose.deduplication))
+	images = []
+	for page, (_, path, dpi, format, is_thumbnail) in zip(output, tasks):
+		if is_thumbnail:
+			images.append(thumbnail(page, dpi))
+		else:
+			write_image(page, path, dpi, format)
+			images.append(None)
+	output.close()
+	return images
+
+# the `CardImpose` and `ImpositionPlan` of the current worker process, opened once by `_init_worker`
+_worker_impose = None
+_worker_plan = None
+
+def _init_worker(state, plan):
+	global _worker_impose, _worker_plan
+	_worker_impose = pickle.loads(state)
+	_worker_plan = plan
+
+def _rasterize_shard(tasks):
+	return rasterize_sheets(_worker_impose, _worker_plan, tasks)
+
+def rasterize(impose, plan, path, dpi=DEFAULT_DPI, format="png", thumbnails=False) -> list[str]:
+	"""Write every sheet of the plan as an image next to `path`, using `impose.jobs` worker processes.
+	Identical sheets are rendered only once. With `thumbnails`, the whole sheet is rendered at once
+	and the images are kept in `impose.cache`, keyed by the content of the sheet.
+	Returns the written files.
+	"""
+
+	if format not in WRITERS:
+		raise ValueError(f"Unsupported image format \"{format}\".")
+	if thumbnails and format != "png":
+		raise ValueError("Thumbnails can only be written as png.")
+
+	paths = image_paths(os.fspath(path), plan.sheet_count, format)
+	hashes = impose.page_hashes()
+	keys = [sheet_key(plan, sheet, hashes, dpi, format) for sheet in plan.sheets]
+
+	first = dict() # key -> the index of the first sheet with this content
+	for number, key in enumerate(keys):
+		first.setdefault(key, number)
+
+	cache = impose.cache if thumbnails else None
+	pending = []
+	for key, number in first.items():
+		data = cache.get_data(key, ".png") if cache is not None else None
+		if data is None:
+			pending.append(number)
+		else:
+			with open(paths[number], "wb") as file:
+				file.write(data)
+
+	tasks = [(plan.sheets[number], paths[number], dpi, format, thumbnails) for number in pending]
+	with impose._phase("rasterize"):
+		if impose.jobs > 1 and len(tasks) > 1:
+			shard_size = max(1, math.ceil(len(tasks) / (impose.jobs * 4)))
+			shards = [tasks[start:start+shard_size] for start in range(0, len(tasks), shard_size)]
+			with concurrent.futures.ProcessPoolExecutor(max_workers=impose.jobs, initializer=_init_worker, initargs=(pickle.dumps(impose), plan.with_sheets([]))) as executor:
+				images = [image for shard in executor.map(_rasterize_shard, shards) for image in shard]
+		else:
+			images = rasterize_sheets(impose, plan, tasks)
+
+	for number, image in zip(pending, images):
+		if image is not None:
+			with open(paths[number], "wb") as file:
+				file.write(image)
+			if cache is not None:
+				cache.put_data(keys[number], image, ".png", evict=False)
+	if cache is not None:
+		cache.evict()
+
+	# identical sheets are copies of the first image
+	for number, key in enumerate(keys):
+		if first[key] != number:
+			shutil.copyfile(paths[first[key]], paths[number])
+	return paths
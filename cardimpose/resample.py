@@ -0,0 +1,188 @@
+import concurrent.futures
+import fitz
+import hashlib
+import json
+import math
+import zlib
+
+from cardimpose.defaults import DEFAULT_QUALITY, LOSSLESS
+from cardimpose.source import is_path, open_source, object_hash
+
+# changes whenever the resampled images change for the same settings, invalidating cached images
+RESAMPLE_VERSION = 1
+
+
+# colorspaces whose samples change meaning when the image is decoded, which are replaced by a device colorspace
+_EXPANDED_COLORSPACES = ("Indexed", "Separation", "DeviceN")
+_DEVICE_COLORSPACES = {"DeviceGray": "/DeviceGray", "DeviceRGB": "/DeviceRGB", "DeviceCMYK": "/DeviceCMYK"}
+
+class ResampleStats:
+	"""The number of images shown by the card pdf, and the number and size of the replaced images and soft masks."""
+
+	def __init__(self):
+		self.images = 0
+		self.resampled = 0
+		self.bytes_before = 0
+		self.bytes_after = 0
+
+	def to_dict(self) -> dict:
+		return {"images": self.images, "resampled": self.resampled, "bytes_before": self.bytes_before, "bytes_after": self.bytes_after}
+
+def check_quality(quality):
+	"""Validate an image quality, either a JPEG quality from 1 to 100 or "lossless"."""
+
+	if quality != LOSSLESS and not (isinstance(quality, int) and 1 <= quality <= 100):
+		raise ValueError(f"Image quality must be between 1 and 100 or \"{LOSSLESS}\", not {quality!r}.")
+
+def check_resolution(max_dpi):
+	"""Validate a maximum resolution, which must be positive."""
+
+	if max_dpi <= 0:
+		raise ValueError(f"The maximum resolution must be positive, not {max_dpi}.")
+
+def placed_sizes(card) -> dict:
+	"""The largest size in points at which each image xref is shown on any page of the card pdf,
+	with the number of components and the name of its colorspace.
+	"""
+
+	sizes = dict() # xref -> (width, height, components, colorspace name)
+	for page in card:
+		for info in page.get_image_info(xrefs=True):
+			# inline images have no xref and can not be replaced
+			if info["xref"] <= 0:
+				continue
+			a, b, c, d, _, _ = info["transform"]
+			width, height, _, _ = sizes.get(info["xref"], (0, 0, None, None))
+			sizes[info["xref"]] = (max(width, math.hypot(a, b)), max(height, math.hypot(c, d)), info["colorspace"], info["cs-name"])
+	return sizes
+
+def target_size(width, height, placed, max_dpi):
+	"""The pixel size of an image shown at `placed` points which has at most `max_dpi`, or None if it is small enough."""
+
+	target = (min(width, math.ceil(max_dpi * placed[0] / 72)), min(height, math.ceil(max_dpi * placed[1] / 72)))
+	if target == (width, height):
+		return None
+	return (max(1, target[0]), max(1, target[1]))
+
+def resample_image(card, xref, size, quality, components, cs_name):
+	"""Decode, scale and encode an image of the card pdf.
+	Returns the keys of the new image dictionary and the encoded samples.
+	"""
+
+	pixmap = fitz.Pixmap(card, xref)
+	keep = pixmap.n == components and not cs_name.startswith(_EXPANDED_COLORSPACES)
+	colorspace = None if keep else _DEVICE_COLORSPACES.get(pixmap.colorspace.name if pixmap.colorspace else None)
+	if not keep and colorspace is None:
+		pixmap = fitz.Pixmap(fitz.csRGB, pixmap)
+		colorspace = "/DeviceRGB"
+	pixmap = fitz.Pixmap(pixmap, size[0], size[1], None)
+
+	if quality == LOSSLESS:
+		data = zlib.compress(pixmap.samples, 9)
+		kind = "/FlateDecode"
+	else:
+		data = pixmap.tobytes("jpg", jpg_quality=quality)
+		kind = "/DCTDecode"
+	return {"Width": pixmap.width, "Height": pixmap.height, "ColorSpace": colorspace, "Filter": kind}, data
+
+# the card pdf of the current worker process, opened once by `_init_worker`
+_worker_card = None
+
+def _init_worker(card_data):
+	global _worker_card
+	_worker_card = open_source(card_data)
+
+def _resample_task(task):
+	return resample_image(_worker_card, *task)
+
+def _encode(keys, data) -> bytes:
+	return json.dumps(keys).encode() + b"\n" + data
+
+def _decode(cached):
+	header, data = cached.split(b"\n", 1)
+	return json.loads(header), data
+
+def replace_image(card, xref, keys, data):
+	"""Replace the samples of an image, keeping its other keys like /SMask and /Interpolate."""
+
+	card.update_stream(xref, data, compress=False)
+	card.xref_set_key(xref, "Width", str(keys["Width"]))
+	card.xref_set_key(xref, "Height", str(keys["Height"]))
+	card.xref_set_key(xref, "BitsPerComponent", "8")
+	card.xref_set_key(xref, "Filter", keys["Filter"])
+	if keys["ColorSpace"] is not None:
+		card.xref_set_key(xref, "ColorSpace", keys["ColorSpace"])
+	# these describe the old samples
+	for key in ["DecodeParms", "Decode", "SMaskInData"]:
+		if card.xref_get_key(xref, key)[0] != "null":
+			card.xref_set_key(xref, key, "null")
+
+def resample_images(card_data, max_dpi, quality=DEFAULT_QUALITY, jobs=1, cache=None) -> tuple[bytes, ResampleStats]:
+	"""Downsample the images of the card pdf shown at more than `max_dpi` and encode them as JPEG with `quality`,
+	or compressed without loss with "lossless". Images are only replaced if they become smaller.
+	Identical images are resampled once, by `jobs` worker processes, and kept in `cache` if given.
+	Returns the new card pdf and the statistics.
+	"""
+
+	check_resolution(max_dpi)
+	check_quality(quality)
+	card = open_source(card_data)
+	stats = ResampleStats()
+	hashes = dict() # xref -> hash, shared by all images
+	tasks = dict() # image key -> task
+	images = dict() # xref -> image key
+	results = dict() # image key -> (keys, data)
+
+	def queue(xref, task):
+		settings = {"version": RESAMPLE_VERSION, "image": object_hash(card, xref, hashes).hex(), "task": task}
+		key = hashlib.sha256(json.dumps(settings).encode()).hexdigest()
+		images[xref] = key
+		if key in tasks or key in results:
+			return
+		cached = cache.get_data(key, ".image") if cache is not None else None
+		if cached is not None:
+			results[key] = _decode(cached)
+		else:
+			tasks[key] = (xref, *task)
+
+	for xref, (width, height, components, cs_name) in placed_sizes(card).items():
+		stats.images += 1
+		# color key masks refer to the original samples
+		if card.xref_get_key(xref, "ImageMask")[1] == "true" or card.xref_get_key(xref, "Mask")[0] == "array":
+			continue
+		size = target_size(int(card.xref_get_key(xref, "Width")[1]), int(card.xref_get_key(xref, "Height")[1]), (width, height), max_dpi)
+		if size is None:
+			continue
+
+		queue(xref, (size, quality, components, cs_name))
+		kind, smask = card.xref_get_key(xref, "SMask")
+		if kind == "xref":
+			# the soft mask is scaled along with the image and kept free of compression artifacts
+			queue(int(smask.split()[0]), (size, LOSSLESS, 1, "DeviceGray"))
+
+	jobs = min(jobs, len(tasks))
+	if jobs > 1:
+		with concurrent.futures.ProcessPoolExecutor(max_workers=jobs, initializer=_init_worker, initargs=(card_data if is_path(card_data) else bytes(card_data),)) as executor:
+			resampled = executor.map(_resample_task, tasks.values(), chunksize=max(1, len(tasks) // (jobs * 4)))
+			results.update(zip(tasks, resampled))
+	else:
+		results.update((key, resample_image(card, *task)) for key, task in tasks.items())
+
+	if cache is not None:
+		for key in tasks:
+			cache.put_data(key, _encode(*results[key]), ".image", evict=False)
+		cache.evict()
+
+	for xref, key in images.items():
+		keys, data = results[key]
+		before = len(card.xref_stream_raw(xref))
+		if len(data) >= before:
+			continue
+		replace_image(card, xref, keys, data)
+		stats.resampled += 1
+		stats.bytes_before += before
+		stats.bytes_after += len(data)
+
+	data = card.tobytes(garbage=1)
+	card.close()
+	return data, stats
@@ -0,0 +1,349 @@
+from cardimpose.cardimpose import CardImpose
+from cardimpose.batch import parse_job
+from cardimpose.cli import build_impose
+from cardimpose.parse import parse_nup
+
+import argparse
+import bisect
+import collections
+import concurrent.futures
+import fitz
+import hashlib
+import http.server
+import json
+import multiprocessing
+import os
+import signal
+import sys
+import threading
+import time
+import urllib.parse
+
+try:
+	import resource
+except ImportError:
+	# not available on Windows
+	resource = None
+
+# the workers stop themselves after the timeout with an alarm, which is not available on Windows
+HAS_ALARM = hasattr(signal, "setitimer")
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8000
+DEFAULT_TIMEOUT = 60 # seconds per request
+DEFAULT_CACHE_SIZE = 16 # card pdfs kept open per worker
+DEFAULT_MAX_SIZE = 100 # megabytes per uploaded card pdf
+
+# options of the command line which do not make sense for a request
+UNSUPPORTED_OPTIONS = {"output", "plan", "dry-run", "chunk-size", "split", "jobs", "profile", "cache-dir", "cache-size", "incremental", "watch", "raster", "dpi", "thumbnails", "card-size"}
+
+# the upper bounds of the latency histogram, in seconds
+LATENCY_BUCKETS = [0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60]
+
+class RequestTimeout(Exception):
+	pass
+
+# the settings and the opened card pdfs of the current worker process, set by `_init_worker`
+_worker_timeout = None
+_worker_cache = None
+_worker_cache_size = None
+
+def _init_worker(timeout, memory_limit, cache_size, pids):
+	global _worker_timeout, _worker_cache, _worker_cache_size
+	_worker_timeout = timeout
+	_worker_cache = collections.OrderedDict() # content hash -> CardImpose with the default settings
+	_worker_cache_size = cache_size
+	# the pool does not tell which processes it started, they report themselves
+	pids.put(os.getpid())
+
+	if memory_limit:
+		# the workers handle one request at a time, so this limits the memory of each request
+		resource.setrlimit(resource.RLIMIT_AS, (memory_limit, memory_limit))
+
+	if HAS_ALARM:
+		def timeout_handler(signum, frame):
+			raise RequestTimeout()
+		signal.signal(signal.SIGALRM, timeout_handler)
+
+def _warm_up():
+	"""Initialize MuPDF in the worker, so that the first request does not have to."""
+
+	document = fitz.open()
+	document.new_page()
+	return document.tobytes()
+
+def _open_card(card) -> tuple[CardImpose, bool]:
+	"""The `CardImpose` of the card pdf with the given content, opened only once per worker.
+	Returns whether the pdf was already open.
+	"""
+
+	key = hashlib.sha256(card).hexdigest()
+	if key in _worker_cache:
+		_worker_cache.move_to_end(key)
+		return _worker_cache[key], True
+
+	impose = CardImpose(card)
+	_worker_cache[key] = impose
+	if len(_worker_cache) > _worker_cache_size:
+		_worker_cache.popitem(last=False)
+	return impose, False
+
+def impose_request(options, card, submitted) -> dict:
+	"""Impose the uploaded card pdf with the given command line options in a worker process."""
+
+	start = time.time()
+	if HAS_ALARM:
+		signal.setitimer(signal.ITIMER_REAL, _worker_timeout)
+	try:
+		args = parse_job({**options, "card": "-"})
+		prototype, cached = _open_card(card)
+		# the cached `CardImpose` keeps its default settings, the request configures a copy
+		impose = build_impose(args, prototype.copy())
+		rows, cols = (None, None) if args.nup == "auto" else parse_nup(args.nup)
+		pdf = impose.impose_to_bytes(rows, cols)
+	finally:
+		if HAS_ALARM:
+			signal.setitimer(signal.ITIMER_REAL, 0)
+
+	return {"pdf": pdf, "cached": cached, "queue_seconds": max(0.0, start - submitted), "seconds": time.time() - start}
+
+class ServiceMetrics:
+	"""The metrics of the running service, exposed in the Prometheus text format."""
+
+	def __init__(self, workers):
+		self.lock = threading.Lock()
+		self.workers = workers
+		self.in_flight = 0
+		self.requests = collections.Counter() # status -> count
+		self.latency_buckets = [0] * (len(LATENCY_BUCKETS) + 1)
+		self.latency_sum = 0.0
+		self.queue_seconds = 0.0
+		self.cache_hits = 0
+		self.cache_misses = 0
+
+	@property
+	def queue_depth(self) -> int:
+		"""The number of requests waiting for a free worker."""
+
+		return max(0, self.in_flight - self.workers)
+
+	def started(self):
+		with self.lock:
+			self.in_flight += 1
+
+	def finished(self, status, seconds, result=None):
+		with self.lock:
+			self.in_flight -= 1
+			self.requests[status] += 1
+			self.latency_buckets[bisect.bisect_left(LATENCY_BUCKETS, seconds)] += 1
+			self.latency_sum += seconds
+			if result is not None:
+				self.queue_seconds += result["queue_seconds"]
+				if result["cached"]:
+					self.cache_hits += 1
+				else:
+					self.cache_misses += 1
+
+	def render(self) -> str:
+		with self.lock:
+			lines = [
+				"# TYPE cardimpose_workers gauge",
+				f"cardimpose_workers {self.workers}",
+				"# TYPE cardimpose_requests_in_flight gauge",
+				f"cardimpose_requests_in_flight {self.in_flight}",
+				"# TYPE cardimpose_queue_depth gauge",
+				f"cardimpose_queue_depth {self.queue_depth}",
+				"# TYPE cardimpose_requests_total counter",
+			]
+			lines += [f'cardimpose_requests_total{{status="{status}"}} {count}' for status, count in sorted(self.requests.items())]
+
+			lines.append("# TYPE cardimpose_request_seconds histogram")
+			count = 0
+			for bound, bucket in zip(LATENCY_BUCKETS + ["+Inf"], self.latency_buckets):
+				count += bucket
+				lines.append(f'cardimpose_request_seconds_bucket{{le="{bound}"}} {count}')
+			lines += [
+				f"cardimpose_request_seconds_sum {self.latency_sum}",
+				f"cardimpose_request_seconds_count {count}",
+				"# TYPE cardimpose_queue_seconds_total counter",
+				f"cardimpose_queue_seconds_total {self.queue_seconds}",
+				"# TYPE cardimpose_card_cache_hits_total counter",
+				f"cardimpose_card_cache_hits_total {self.cache_hits}",
+				"# TYPE cardimpose_card_cache_misses_total counter",
+				f"cardimpose_card_cache_misses_total {self.cache_misses}",
+			]
+		return "\n".join(lines) + "\n"
+
+def _terminate(pids):
+	while not pids.empty():
+		try:
+			# TerminateProcess on Windows
+			os.kill(pids.get(), signal.SIGTERM)
+		except OSError:
+			pass # already stopped
+
+class ImpositionService:
+	"""Imposes uploaded card pdfs with a pool of pre-warmed worker processes."""
+
+	def __init__(self, workers=None, timeout=DEFAULT_TIMEOUT, memory_limit=None, cache_size=DEFAULT_CACHE_SIZE):
+		if memory_limit and resource is None:
+			raise ValueError("The memory limit of the workers is not supported on this system.")
+
+		self.workers = workers or os.cpu_count() or 1
+		self.timeout = timeout
+		self.memory_limit = memory_limit
+		self.cache_size = cache_size
+		self.metrics = ServiceMetrics(self.workers)
+		self.lock = threading.Lock()
+		self.context = multiprocessing.get_context()
+		self.pids = {} # pool -> queue of the process ids of its workers
+		self.executor = self._start_pool()
+
+	def _start_pool(self) -> concurrent.futures.ProcessPoolExecutor:
+		pids = self.context.SimpleQueue()
+		executor = concurrent.futures.ProcessPoolExecutor(max_workers=self.workers, mp_context=self.context,
+			initializer=_init_worker, initargs=(self.timeout, self.memory_limit, self.cache_size, pids))
+		self.pids[executor] = pids
+
+		# the workers are started on demand, submitting one task per worker starts all of them
+		for future in [executor.submit(_warm_up) for _ in range(self.workers)]:
+			future.result()
+		return executor
+
+	def _replace_pool(self, executor, grace=0) -> concurrent.futures.ProcessPoolExecutor:
+		"""Replace the pool `executor` after one of its workers crashed or got stuck, and return the current pool.
+		The workers of the old pool are terminated after `grace` seconds, which lets them finish their current requests.
+		"""
+
+		with self.lock:
+			# several requests may notice the same broken pool
+			if self.executor is executor:
+				self.executor = self._start_pool()
+				executor.shutdown(wait=False, cancel_futures=True)
+				timer = threading.Timer(grace, _terminate, (self.pids.pop(executor),))
+				timer.daemon = True
+				timer.start()
+			return self.executor
+
+	def impose(self, options, card) -> tuple[int, str, bytes]:
+		"""Impose the card pdf with the given options and return the HTTP status, content type and body of the response."""
+
+		unsupported = UNSUPPORTED_OPTIONS.intersection(options)
+		if unsupported:
+			return self._error(400, f"Unsupported options: {', '.join(sorted(unsupported))}.")
+
+		start = time.time()
+		self.metrics.started()
+		result = None
+		executor = self.executor
+		try:
+			try:
+				future = executor.submit(impose_request, options, card, start)
+			except concurrent.futures.BrokenExecutor:
+				# a worker crashed during an earlier request
+				executor = self._replace_pool(executor)
+				future = executor.submit(impose_request, options, card, start)
+			# the worker stops itself after the timeout, waiting longer only guards against a stuck worker
+			result = future.result(timeout=self.timeout * 2 + 1 if self.timeout else None)
+			response = (200, "application/pdf", result["pdf"])
+		except concurrent.futures.BrokenExecutor:
+			self._replace_pool(executor)
+			response = self._error(500, "The worker process stopped unexpectedly, e.g. by exceeding the memory limit.")
+		except concurrent.futures.CancelledError:
+			response = self._error(503, "The worker processes were restarted, please retry the request.")
+		except concurrent.futures.TimeoutError:
+			# an alarm can not interrupt a long call into MuPDF, the stuck worker is replaced
+			# once the other workers of its pool have finished their requests
+			self._replace_pool(executor, grace=self.timeout + 1)
+			response = self._error(504, f"The imposition took longer than {self.timeout} seconds.")
+		except RequestTimeout:
+			response = self._error(504, f"The imposition took longer than {self.timeout} seconds.")
+		except (ValueError, RuntimeError) as e:
+			response = self._error(400, str(e))
+		except MemoryError:
+			response = self._error(507, "The imposition exceeded the memory limit.")
+		except Exception as e:
+			response = self._error(500, f"{type(e).__name__}: {e}")
+
+		self.metrics.finished(response[0], time.time() - start, result)
+		return response
+
+	def _error(self, status, message) -> tuple[int, str, bytes]:
+		return status, "application/json", json.dumps({"error": message}).encode()
+
+	def close(self):
+		self.executor.shutdown(cancel_futures=True)
+
+def make_handler(service, max_size):
+	class Handler(http.server.BaseHTTPRequestHandler):
+		def do_GET(self):
+			path = urllib.parse.urlsplit(self.path).path
+			if path == "/metrics":
+				self._respond(200, "text/plain; version=0.0.4", service.metrics.render().encode())
+			elif path == "/health":
+				self._respond(200, "application/json", b'{"status": "ok"}')
+			else:
+				self._respond(*service._error(404, "Not found."))
+
+		def do_POST(self):
+			url = urllib.parse.urlsplit(self.path)
+			if url.path != "/impose":
+				self._respond(*service._error(404, "Not found."))
+				return
+
+			length = int(self.headers.get("Content-Length") or 0)
+			if length <= 0:
+				self._respond(*service._error(400, "The request does not contain a card pdf."))
+				return
+			if length > max_size:
+				self._respond(*service._error(413, f"The card pdf is larger than {max_size} bytes."))
+				return
+
+			# the options are given like the command line options, e.g. ?nup=2x2&bleed=3mm&no-crop-marks=true
+			options = dict(urllib.parse.parse_qsl(url.query, keep_blank_values=True))
+			self._respond(*service.impose(options, self.rfile.read(length)))
+
+		def _respond(self, status, content_type, body):
+			self.send_response(status)
+			self.send_header("Content-Type", content_type)
+			self.send_header("Content-Length", str(len(body)))
+			self.end_headers()
+			self.wfile.write(body)
+
+		def log_message(self, format, *args):
+			print(f"{self.address_string()} - {format % args}", file=sys.stderr)
+
+	return Handler
+
+def create_server(service, host=DEFAULT_HOST, port=DEFAULT_PORT, max_size=DEFAULT_MAX_SIZE * 1024 * 1024) -> http.server.ThreadingHTTPServer:
+	"""Create an HTTP server answering requests with the `service`."""
+
+	return http.server.ThreadingHTTPServer((host, port), make_handler(service, max_size))
+
+def serve_main(argv):
+	parser = argparse.ArgumentParser(
+                    prog='cardimpose serve',
+                    description='Run a local HTTP server imposing uploaded card pdfs. POST the card pdf to /impose?OPTIONS, where the options are the long command line options, e.g. /impose?nup=2x2&bleed=3mm.')
+	parser.add_argument("--host", help=f"The address the server listens on. (default: {DEFAULT_HOST}).", default=DEFAULT_HOST)
+	parser.add_argument("--port", type=int, help=f"The port the server listens on. (default: {DEFAULT_PORT}).", default=DEFAULT_PORT)
+	parser.add_argument("--workers", type=int, help="The number of worker processes imposing the cards. (default: number of CPUs).")
+	parser.add_argument("--timeout", type=float, help=f"The maximum time in seconds for a single request, 0 for no limit. (default: {DEFAULT_TIMEOUT}).", default=DEFAULT_TIMEOUT)
+	parser.add_argument("--memory-limit", type=int, metavar="MB", help="The maximum memory (address space) of each worker process in megabytes.")
+	parser.add_argument("--cache-size", type=int, help=f"The number of recently used card pdfs kept open by each worker. (default: {DEFAULT_CACHE_SIZE}).", default=DEFAULT_CACHE_SIZE)
+	parser.add_argument("--max-size", type=int, metavar="MB", help=f"The maximum size of an uploaded card pdf in megabytes. (default: {DEFAULT_MAX_SIZE}).", default=DEFAULT_MAX_SIZE)
+	args = parser.parse_args(argv)
+
+	if args.memory_limit and resource is None:
+		parser.error("--memory-limit is only supported on POSIX systems.")
+
+	memory_limit = args.memory_limit * 1024 * 1024 if args.memory_limit else None
+	service = ImpositionService(args.workers, args.timeout, memory_limit, args.cache_size)
+	server = create_server(service, args.host, args.port, args.max_size * 1024 * 1024)
+	print(f"Serving on http://{args.host}:{server.server_port} with {service.workers} workers", file=sys.stderr)
+	try:
+		server.serve_forever()
+	except KeyboardInterrupt:
+		pass
+	finally:
+		server.server_close()
+		service.close()
@@ -0,0 +1,109 @@
+import fitz
+import hashlib
+import mmap
+import os
+import re
+
+# file objects backed by a file at least this large are memory-mapped instead of read into memory
+MMAP_THRESHOLD = 16 * 1024 * 1024
+
+def is_path(source) -> bool:
+	return isinstance(source, (str, os.PathLike))
+
+def source_name(source) -> str:
+	"""A name of the card pdf for messages and for deriving the output name."""
+
+	if is_path(source):
+		return os.fspath(source)
+	name = getattr(source, "name", None)
+	return name if isinstance(name, str) else "<memory>"
+
+def read_source(source):
+	"""The content of an in-memory or file-like card pdf as a buffer which can be opened by MuPDF without copying it again.
+	Paths are returned unchanged, since MuPDF reads them on demand.
+	"""
+
+	if is_path(source):
+		return source
+	if isinstance(source, (bytes, memoryview)):
+		return source
+	if isinstance(source, (bytearray, mmap.mmap)):
+		return memoryview(source)
+
+	if hasattr(source, "read"):
+		try:
+			fileno = source.fileno()
+			size = os.fstat(fileno).st_size
+		except (AttributeError, OSError, ValueError):
+			# e.g. io.BytesIO or a pipe
+			fileno, size = None, 0
+
+		if fileno is not None and size >= MMAP_THRESHOLD and source.tell() == 0:
+			return memoryview(mmap.mmap(fileno, 0, access=mmap.ACCESS_READ))
+		if hasattr(source, "getvalue"):
+			# io.BytesIO shares its buffer with the returned bytes as long as neither is modified
+			return source.getvalue()
+		return source.read()
+
+	raise ValueError(f"Unsupported card pdf source of type {type(source).__name__}.")
+
+def open_source(data) -> fitz.Document:
+	"""Open the card pdf returned by `read_source`."""
+
+	if is_path(data):
+		return fitz.open(data)
+	return fitz.open("pdf", data)
+
+def content_hash(data) -> str:
+	"""The SHA-256 of the card pdf returned by `read_source`."""
+
+	digest = hashlib.sha256()
+	if is_path(data):
+		with open(data, "rb") as file:
+			for block in iter(lambda: file.read(1024 * 1024), b""):
+				digest.update(block)
+	else:
+		digest.update(data)
+	return digest.hexdigest()
+
+# references to other objects, which are hashed in place of their xref numbers
+REFERENCE = re.compile(rb"(\d+)\s+(\d+)\s+R")
+# references back up the page tree (/Parent) and from annotations to their page (/P) would include every page in the hash
+BACK_REFERENCE = re.compile(rb"/(?:Parent|P)\s+\d+\s+\d+\s+R")
+
+def object_hash(document, xref, hashes, visiting=None) -> bytes:
+	"""The hash of an object and all objects it references, independent of the xref numbers.
+	`hashes` (xref -> hash) remembers the objects hashed before.
+	"""
+
+	visiting = set() if visiting is None else visiting
+
+	if xref in hashes:
+		return hashes[xref]
+	if xref in visiting or not 0 < xref < document.xref_length():
+		return b"cycle"
+
+	visiting.add(xref)
+	source = BACK_REFERENCE.sub(b"", document.xref_object(xref, compressed=True).encode())
+	digest = hashlib.sha256(REFERENCE.sub(lambda match: object_hash(document, int(match[1]), hashes, visiting).hex().encode(), source))
+	if document.xref_is_stream(xref):
+		digest.update(document.xref_stream_raw(xref))
+	visiting.remove(xref)
+
+	hashes[xref] = digest.digest()
+	return hashes[xref]
+
+def page_hashes(document) -> list[str]:
+	"""The hash of the content, resources and boxes of every page of the document.
+	Objects shared by several pages (e.g. fonts) are only hashed once.
+	"""
+
+	hashes = dict() # xref -> hash
+	return [object_hash(document, document.page_xref(page), hashes, set()).hex() for page in range(document.page_count)]
+
+def card_page(card, page) -> tuple[fitz.Document, int]:
+	"""The document and the page number of a page of a card pdf or a `CardDeck`."""
+
+	if isinstance(card, fitz.Document):
+		return card, page
+	return card.page(page)
@@ -0,0 +1,137 @@
+import bisect
+import collections
+import fitz
+import hashlib
+
+from cardimpose.defaults import DEFAULT_MAX_OPEN
+from cardimpose.geometry import GeometryIndex
+from cardimpose.images import is_image_source
+from cardimpose.pages import PageSequence
+from cardimpose.parse import parse_page_spec
+from cardimpose.source import is_path, read_source, open_source, source_name, content_hash, page_hashes
+
+class DocumentPool:
+	"""Opens the card pdfs of a deck on demand and keeps at most `max_open` of them open,
+	closing the least recently used one when another one is needed.
+	"""
+
+	def __init__(self, data, names, max_open=DEFAULT_MAX_OPEN):
+		self.data = data
+		self.names = names
+		self.max_open = max_open
+		self.documents = collections.OrderedDict() # source -> opened document, the most recently used last
+
+	def get(self, source) -> fitz.Document:
+		document = self.documents.get(source)
+		if document is not None:
+			self.documents.move_to_end(source)
+			return document
+
+		try:
+			document = open_source(self.data[source])
+		except RuntimeError:
+			raise RuntimeError(f"Invalid pdf file \"{self.names[source]}\".") from None
+		self.documents[source] = document
+		self.trim()
+		return document
+
+	def trim(self):
+		"""Close the least recently used documents beyond `max_open`."""
+
+		while len(self.documents) > self.max_open:
+			_, closed = self.documents.popitem(last=False)
+			closed.close()
+
+	def close(self):
+		for document in self.documents.values():
+			document.close()
+		self.documents.clear()
+
+class CardDeck:
+	"""Several card pdfs imposed together, each with its own page spec.
+	The pages of all card pdfs are numbered consecutively, so that a deck can be used like a single card pdf,
+	and each page is resolved into a (source, page) pair when it is embedded.
+	`sources` are paths, buffers or file objects like the card of `CardImpose`, optionally as (source, page spec) pairs.
+	"""
+
+	def __init__(self, sources, max_open=DEFAULT_MAX_OPEN):
+		if not sources:
+			raise ValueError("A deck needs at least one card pdf.")
+
+		self.names = []
+		self.specs = []
+		data = []
+		for source in sources:
+			source, spec = source if isinstance(source, tuple) else (source, ".")
+			if is_image_source(source):
+				raise ValueError(f"Card images can not be combined with other card pdfs: \"{source_name(source)}\".")
+			self.names.append(source_name(source))
+			self.specs.append(spec)
+			data.append(read_source(source))
+		self.pool = DocumentPool(data, self.names, max_open)
+
+		self.offsets = [] # the number of the first page of each source
+		self.page_count = 0
+		# every card pdf is opened once to number its pages and read their boxes
+		self.geometry = GeometryIndex(self._scan())
+
+	def _scan(self):
+		for source in range(len(self)):
+			document = self.pool.get(source)
+			self.offsets.append(self.page_count)
+			self.page_count += document.page_count
+			yield from document
+
+	def __getstate__(self):
+		# the open documents can not be pickled, they are opened again on demand
+		state = self.__dict__.copy()
+		state["pool"] = DocumentPool([data if is_path(data) else bytes(data) for data in self.data], self.names, self.pool.max_open)
+		return state
+
+	def __len__(self):
+		return len(self.names)
+
+	@property
+	def data(self) -> list:
+		return self.pool.data
+
+	def pages(self) -> PageSequence:
+		"""The pages selected by the page specs of the card pdfs."""
+
+		pages = PageSequence()
+		for source, spec in enumerate(self.specs):
+			count = self.source_page_count(source)
+			pages += parse_page_spec(spec, count).shifted(self.offsets[source])
+		return pages
+
+	def source_page_count(self, source) -> int:
+		end = self.offsets[source + 1] if source + 1 < len(self) else self.page_count
+		return end - self.offsets[source]
+
+	def locate(self, page) -> tuple[int, int]:
+		"""The (source, page) pair of a page of the deck."""
+
+		source = bisect.bisect_right(self.offsets, page) - 1
+		return source, page - self.offsets[source]
+
+	def page(self, page) -> tuple[fitz.Document, int]:
+		"""The opened card pdf and the number of the page within it."""
+
+		source, number = self.locate(page)
+		return self.pool.get(source), number
+
+	def page_hashes(self) -> list[str]:
+		"""The hash of every page of all card pdfs, see `cardimpose.source.page_hashes`."""
+
+		return [digest for source in range(len(self)) for digest in page_hashes(self.pool.get(source))]
+
+	def content_hash(self) -> str:
+		"""The hash of the content of all card pdfs, in order."""
+
+		digest = hashlib.sha256()
+		for data in self.data:
+			digest.update(content_hash(data).encode())
+		return digest.hexdigest()
+
+	def close(self):
+		self.pool.close()
@@ -0,0 +1,108 @@
+import fitz
+
+from cardimpose.defaults import DEFAULT_STOCKS
+from cardimpose.layout import Mode
+from cardimpose.parse import parse_length, parse_tuple
+
+# sizes of common press sheets which are not known to `fitz.paper_size`
+STOCK_SIZES = {
+	"sra4": (parse_length("225mm"), parse_length("320mm")),
+	"sra3": (parse_length("320mm"), parse_length("450mm")),
+	"sra2": (parse_length("450mm"), parse_length("640mm")),
+}
+
+def stock_size(stock) -> tuple[float, float]:
+	"""The size of a paper format (e.g. "A4", "SRA3") or of a custom stock given as "WIDTHxHEIGHT" (e.g. "330mmx480mm")."""
+
+	if stock.lower() in STOCK_SIZES:
+		return STOCK_SIZES[stock.lower()]
+	size = fitz.paper_size(stock)
+	if size != (-1, -1):
+		return size
+	return parse_tuple(stock)
+
+class LayoutCandidate:
+	"""A possible layout of a job: the stock, its orientation and the rotation of the cards, with the resulting number of sheets.
+
+	stock: the name of the stock.
+	page_size: the width and height of the sheets, after rotating the page.
+	rotate_page: whether the stock is used in landscape instead of portrait orientation (or the other way round).
+	card_rotation: the clockwise rotation of the cards on the sheets.
+	rows, cols: the grid of cards on each sheet, None for packed cards.
+	sheets: the number of sheets needed for the job.
+	price: the price of a single sheet of the stock, or None.
+	"""
+
+	def __init__(self, stock, page_size, rotate_page, card_rotation, rows, cols, sheets, cards, utilisation, price=None):
+		self.stock = stock
+		self.page_size = page_size
+		self.rotate_page = rotate_page
+		self.card_rotation = card_rotation
+		self.rows = rows
+		self.cols = cols
+		self.sheets = sheets
+		self.cards = cards
+		self.utilisation = utilisation
+		self.price = price
+
+	@property
+	def cost(self) -> float:
+		return None if self.price is None else self.sheets * self.price
+
+	@property
+	def cost_per_card(self) -> float:
+		return None if self.price is None or self.cards == 0 else self.cost / self.cards
+
+	def to_dict(self) -> dict:
+		return {
+			"stock": self.stock,
+			"page_size": [round(length, 3) for length in self.page_size],
+			"rotate_page": self.rotate_page,
+			"card_rotation": self.card_rotation,
+			"nup": None if self.rows is None else f"{self.rows}x{self.cols}",
+			"sheets": self.sheets,
+			"utilisation": round(self.utilisation, 4),
+			"cost": self.cost,
+			"cost_per_card": None if self.cost_per_card is None else round(self.cost_per_card, 6),
+		}
+
+def search_layouts(impose, stocks=None, prices=None) -> list[LayoutCandidate]:
+	"""Try all `stocks` in both orientations with unrotated and rotated cards, and rank the layouts which fit.
+	With `prices` (stock -> price per sheet), the layouts are ranked by the cost per card, otherwise by the number of sheets.
+	Ties are broken by the paper utilisation, the order of the stocks and then in favour of unrotated cards.
+	"""
+
+	stocks = stocks or DEFAULT_STOCKS
+	if prices is not None:
+		missing = [stock for stock in stocks if stock not in prices]
+		if missing:
+			raise ValueError(f"No price given for the stock {', '.join(missing)}.")
+
+	candidates = []
+	for stock in stocks:
+		size = stock_size(stock)
+		# a square stock looks the same in both orientations
+		orientations = [False] if size[0] == size[1] else [False, True]
+		# packed cards are rotated individually
+		rotations = [0] if impose.mode == Mode.PACKED else [0, 90]
+		for rotate_page in orientations:
+			for rotation in rotations:
+				candidate = impose.copy().set_page_size(stock, rotate=rotate_page).set_card_rotation(rotation)
+				try:
+					plan = candidate.plan()
+				except RuntimeError:
+					# the cards do not fit onto the stock
+					continue
+				candidates.append(LayoutCandidate(stock, candidate.output_size, rotate_page, rotation, plan.rows, plan.cols,
+					plan.sheet_count, plan.card_count, plan.utilisation, prices[stock] if prices else None))
+
+	if not candidates:
+		raise RuntimeError(f"The cards do not fit onto any of the stocks {', '.join(stocks)}.")
+
+	order = {stock: index for index, stock in enumerate(stocks)}
+	return sorted(candidates, key=lambda candidate: (
+		candidate.cost_per_card if prices else candidate.sheets,
+		-round(candidate.utilisation, 6),
+		order[candidate.stock],
+		candidate.card_rotation,
+	))
@@ -0,0 +1,41 @@
+import fitz
+import json
+import os
+import tempfile
+import unittest
+from cardimpose.batch import read_manifest, job_arguments, run_batch
+
+class BatchTest(unittest.TestCase):
+	def test_job_arguments(self):
+		job = {"card": "card.pdf", "nup": "2x2", "page-size": "A3", "no-crop-marks": True, "rotate-page": False}
+		self.assertEqual(job_arguments(job), ["--nup", "2x2", "--page-size", "A3", "--no-crop-marks", "--", "card.pdf"])
+
+	def test_manifests(self):
+		with tempfile.TemporaryDirectory() as directory:
+			json_path = os.path.join(directory, "jobs.json")
+			with open(json_path, "w") as file:
+				json.dump([{"card": "tests/card.pdf", "nup": "2x2"}], file)
+			csv_path = os.path.join(directory, "jobs.csv")
+			with open(csv_path, "w") as file:
+				file.write("card,nup,no-crop-marks\ntests/card.pdf,,true\n")
+
+			self.assertEqual(read_manifest(json_path), [{"card": "tests/card.pdf", "nup": "2x2"}])
+			self.assertEqual(read_manifest(csv_path), [{"card": "tests/card.pdf", "no-crop-marks": "true"}])
+
+	def test_run_batch(self):
+		with tempfile.TemporaryDirectory() as directory:
+			jobs = [
+				{"card": "tests/card.pdf", "nup": "2x2", "output": os.path.join(directory, "a.pdf")},
+				{"card": "tests/card.pdf", "nup": "20x20", "output": os.path.join(directory, "b.pdf")},
+				{"card": "tests/card.pdf", "unknown-option": "1"},
+				"tests/card.pdf",
+				{"card": "tests/card.pdf", "output": "-"},
+				{"card": "tests/card.pdf", "watch": True},
+			]
+			report = run_batch(jobs)
+			self.assertEqual(report["succeeded"], 1)
+			self.assertEqual(report["failed"], 5)
+			self.assertEqual([result["status"] for result in report["jobs"]], ["ok"] + ["error"] * 5)
+			self.assertEqual(report["jobs"][0]["outputs"], [os.path.join(directory, "a.pdf")])
+			self.assertEqual(fitz.open(report["jobs"][0]["outputs"][0]).page_count, 1)
+			self.assertIn("unknown-option", report["jobs"][2]["error"])
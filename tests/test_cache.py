@@ -0,0 +1,71 @@
+import fitz
+import os
+import tempfile
+import unittest
+from cardimpose.cardimpose import CardImpose
+from cardimpose.cache import ResultCache
+from cardimpose.cli import parse_args, run
+from cardimpose.layout import Mode
+
+class CacheTest(unittest.TestCase):
+	def test_hits(self):
+		with tempfile.TemporaryDirectory() as directory:
+			cache = ResultCache(directory)
+			expected = CardImpose("tests/card.pdf").set_pages("5x1").impose(2, 2)
+
+			first = CardImpose("tests/card.pdf").set_pages("5x1").set_cache(cache).impose(2, 2)
+			with open("tests/card.pdf", "rb") as file:
+				# the same content read from memory gives the same key
+				second = CardImpose(file.read()).set_pages("5x1").set_cache(cache).impose(2, 2)
+			self.assertEqual(cache.stats()["misses"], 1)
+			self.assertEqual(cache.stats()["hits"], 1)
+			self.assertGreater(cache.stats()["bytes_saved"], 0)
+			self.assertEqual(cache.stats()["entries"], 1)
+			for doc in [first, second]:
+				self.assertEqual(doc.page_count, expected.page_count)
+				self.assertEqual(doc[0].get_pixmap().samples, expected[0].get_pixmap().samples)
+
+			CardImpose("tests/card.pdf").set_pages("5x1").set_mode(Mode.SINGLES).set_cache(cache).impose(2, 2)
+			CardImpose("tests/card.pdf").set_pages("5x1").set_cache(cache).set_bleed("1mm").impose(2, 2)
+			self.assertEqual(cache.stats()["misses"], 3)
+			self.assertEqual(cache.stats()["entries"], 3)
+
+	def test_eviction(self):
+		with tempfile.TemporaryDirectory() as directory:
+			cache = ResultCache(directory, max_size=0)
+			impose = CardImpose("tests/card.pdf").set_cache(cache)
+			impose.impose(2, 2)
+			self.assertEqual(cache.stats()["entries"], 0)
+
+			cache.max_size = 10 ** 6
+			impose.impose(1, 1)
+			impose.impose(2, 2)
+			oldest = cache.entries()[0]
+			cache.max_size = cache.stats()["size"] - 1
+			cache.evict()
+			self.assertEqual(cache.stats()["entries"], 1)
+			self.assertFalse(os.path.exists(oldest.path))
+
+	def test_foreign_files(self):
+		with tempfile.TemporaryDirectory() as directory:
+			# the cache may share its directory with other files, which are kept
+			foreign = os.path.join(directory, "notes.pdf")
+			with open(foreign, "wb") as file:
+				file.write(b"not cached")
+			cache = ResultCache(directory, max_size=0)
+			CardImpose("tests/card.pdf").set_cache(cache).impose(2, 2)
+			cache.evict()
+			self.assertEqual(cache.stats()["entries"], 0)
+			cache.clear()
+			self.assertTrue(os.path.exists(foreign))
+
+			with self.assertRaises(ValueError):
+				cache.put_data("../notes", b"", ".pdf")
+
+	def test_cache_dir_option(self):
+		with tempfile.TemporaryDirectory() as directory:
+			cache = os.path.join(directory, "cache")
+			for _ in range(2):
+				run(parse_args(["tests/card.pdf", "--nup", "2x2", "-o", os.path.join(directory, "out.pdf"), "--cache-dir", cache]))
+				self.assertEqual(fitz.open(os.path.join(directory, "out.pdf")).page_count, 1)
+			self.assertEqual(ResultCache(cache).stats()["hits"], 1)
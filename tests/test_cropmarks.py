@@ -0,0 +1,46 @@
+import fitz
+import unittest
+from cardimpose.cardimpose import CardImpose
+from cardimpose.cropmarks import CropMarkStyle, merge_lines
+
+class MergeLinesTest(unittest.TestCase):
+	def test_duplicates(self):
+		line = ((0, 10), (5, 10))
+		self.assertEqual(merge_lines([line, line]), [line])
+
+	def test_collinear(self):
+		lines = [((0, 10), (5, 10)), ((5, 10), (8, 10)), ((7, 10), (12, 10))]
+		self.assertEqual(merge_lines(lines), [((0, 10), (12, 10))])
+
+	def test_vertical(self):
+		lines = [((3, 5), (3, 0)), ((3, 4), (3, 9)), ((4, 0), (4, 1))]
+		self.assertEqual(merge_lines(lines), [((3, 0), (3, 9)), ((4, 0), (4, 1))])
+
+	def test_separate(self):
+		# lines with a gap in between stay separate
+		lines = [((0, 0), (1, 0)), ((2, 0), (3, 0))]
+		self.assertEqual(merge_lines(lines), lines)
+
+class CropMarkTest(unittest.TestCase):
+	def count_segments(self, doc):
+		return sum(len(drawing["items"]) for drawing in doc.load_page(0).get_drawings())
+
+	def test_merged_grid(self):
+		doc = CardImpose("tests/card.pdf").set_bleed("3mm").set_crop_marks(distance="1mm").impose(2, 2)
+		# 16 outer crop marks, the 16 inner crop marks of neighbouring cards coincide pairwise
+		self.assertEqual(self.count_segments(doc), 24)
+
+	def test_guides(self):
+		doc = CardImpose("tests/card.pdf").set_crop_marks(style=CropMarkStyle.GUIDES).impose(2, 2)
+		page = doc.load_page(0)
+		# three cut positions in each direction, each spanning the whole sheet
+		self.assertEqual(self.count_segments(doc), 6)
+		for drawing in page.get_drawings():
+			for item in drawing["items"]:
+				start, end = item[1], item[2]
+				self.assertAlmostEqual(abs(end - start), page.rect.height if start.x == end.x else page.rect.width, 3)
+
+	def test_crop_line_defaults(self):
+		impose = CardImpose("tests/card.pdf").set_bleed("3mm").set_crop_marks(distance="1mm")
+		# without a bleed and distance, the configured ones are used
+		self.assertEqual(impose.crop_line(fitz.Point(10, 10), "left", False), impose.crop_line(fitz.Point(10, 10), "left", False, impose.bleed, impose.crop_mark_distance))
@@ -0,0 +1,72 @@
+import contextlib
+import fitz
+import io
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+from cardimpose.cardimpose import CardImpose
+from cardimpose.cli import parse_args, run
+from cardimpose.layout import Mode
+
+def write_deck(path, count):
+	"""A card pdf where every page embeds its own copy of the same background image and font."""
+
+	background = fitz.Pixmap(fitz.csRGB, fitz.IRect(0, 0, 300, 420), False)
+	background.set_rect(background.irect, (10, 120, 200))
+	image = background.tobytes("png")
+	font = fitz.Font("tiro").buffer
+
+	deck = fitz.open()
+	for number in range(count):
+		card = fitz.open()
+		page = card.new_page(width=180, height=252)
+		page.insert_image(page.rect, stream=image)
+		page.insert_font(fontname="F0", fontbuffer=font)
+		page.insert_text((20, 100), f"Card {number}", fontname="F0")
+		deck.insert_pdf(card)
+	deck.save(path)
+
+class DeduplicationTest(unittest.TestCase):
+	def test_shared_resources(self):
+		with tempfile.TemporaryDirectory() as directory:
+			path = os.path.join(directory, "deck.pdf")
+			write_deck(path, 6)
+			card = fitz.open(path)
+			self.assertEqual(len({image[0] for page in card for image in page.get_images(full=True)}), 6)
+
+			impose = CardImpose(path).set_mode(Mode.SINGLES)
+			document = fitz.open("pdf", impose.fill_page().tobytes(garbage=1))
+			self.assertEqual(len({image[0] for page in document for image in page.get_images(full=True)}), 1)
+			self.assertEqual(len({font[0] for page in document for font in page.get_fonts(full=True)}), 1)
+			self.assertGreater(impose.deduplication.bytes_saved, 5 * len(card.xref_stream_raw(card[0].get_images()[0][0])))
+
+			# the cards still look the same
+			for number in range(card.page_count):
+				self.assertIn(f"Card {number}", document[0].get_text())
+
+			# the shards of multiple workers are merged again
+			parallel = CardImpose(path).set_mode(Mode.SINGLES).set_pages("1-6,1-6").set_jobs(2)
+			document = parallel.fill_page()
+			self.assertEqual(len({image[0] for page in document for image in page.get_images(full=True)}), 1)
+
+	def test_message(self):
+		with tempfile.TemporaryDirectory() as directory:
+			path = os.path.join(directory, "deck.pdf")
+			write_deck(path, 6)
+			for card, pages, expected in [(path, "1-6", True), ("examples/flash_cards.pdf", "1-16", False)]:
+				stderr = io.StringIO()
+				with contextlib.redirect_stderr(stderr):
+					run(parse_args([card, "--pages", pages, "--mode", "singles", "-o", os.path.join(directory, "out.pdf")]))
+				# small savings are not reported
+				self.assertEqual("Stored" in stderr.getvalue(), expected)
+
+	def test_dependencies(self):
+		# the embedding only depends on hashing the card pdf, not on incremental imposition or decks
+		code = "import sys, cardimpose.embed; print(sorted(name for name in sys.modules if name.startswith('cardimpose.')))"
+		result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True)
+		self.assertEqual(result.stdout.strip().splitlines()[-1], "['cardimpose.embed', 'cardimpose.source']")
+
+if __name__ == '__main__':
+	unittest.main()
@@ -0,0 +1,72 @@
+import fitz
+import os
+import shutil
+import tempfile
+import unittest
+from cardimpose.cardimpose import CardImpose
+from cardimpose.layout import Mode
+from cardimpose.images import find_images, open_images
+from cardimpose.parse import parse_length
+
+def write_image(path, color, dpi=300):
+	# a 63x88mm card at 300 dpi
+	pixmap = fitz.Pixmap(fitz.csRGB, fitz.IRect(0, 0, 744, 1039), False)
+	pixmap.clear_with(color)
+	pixmap.set_dpi(dpi, dpi)
+	pixmap.save(path)
+
+class ImagesTest(unittest.TestCase):
+	def setUp(self):
+		self.directory = tempfile.TemporaryDirectory()
+		for number in range(1, 12):
+			write_image(os.path.join(self.directory.name, f"card{number}.png"), number * 20)
+		# the same back design for every card
+		for number in range(1, 12):
+			write_image(os.path.join(self.directory.name, f"card{number}_back.png"), 0)
+		with open(os.path.join(self.directory.name, "notes.txt"), "w") as file:
+			file.write("not an image")
+
+	def tearDown(self):
+		self.directory.cleanup()
+
+	def test_find_images(self):
+		names = [os.path.basename(path) for path in find_images(self.directory.name)]
+		self.assertEqual(names[:4], ["card1.png", "card1_back.png", "card2.png", "card2_back.png"])
+		self.assertEqual(names[-2:], ["card11.png", "card11_back.png"])
+		self.assertEqual(len(find_images(os.path.join(self.directory.name, "*_back.png"))), 11)
+		with self.assertRaises(ValueError):
+			find_images(os.path.join(self.directory.name, "*.jpg"))
+
+	def test_deduplication(self):
+		data, pages, _ = open_images(self.directory.name, jobs=1)
+		card = fitz.open("pdf", data)
+		# the identical backs share a page of the card pdf
+		self.assertEqual(card.page_count, 12)
+		self.assertEqual(pages[1::2], [1] * 11)
+		self.assertAlmostEqual(card[0].rect.width, parse_length("63mm"), places=0)
+
+		self.assertEqual(open_images(self.directory.name, jobs=2)[1], pages)
+
+	def test_impose(self):
+		impose = CardImpose(self.directory.name).set_pages("1-4,2x3")
+		self.assertEqual(impose.input_page_count, 22)
+		self.assertEqual(list(impose.pages), [0, 1, 2, 1, 2, 2])
+
+		document = CardImpose(os.path.join(self.directory.name, "card1*.png"), card_size="2inx3in").set_mode(Mode.SINGLES).fill_page()
+		images = {image[0] for page in document for image in page.get_images(full=True)}
+		# card1, card10, card11 and their shared back
+		self.assertEqual(len(images), 4)
+
+		with self.assertRaises(ValueError):
+			CardImpose("tests/card.pdf", card_size="2inx3in")
+
+	def test_glob_characters(self):
+		# existing files are not mistaken for glob patterns
+		path = os.path.join(self.directory.name, "order[1].pdf")
+		shutil.copy("tests/card.pdf", path)
+		self.assertEqual(CardImpose(path).input_page_count, 1)
+		write_image(os.path.join(self.directory.name, "card[1].png"), 0)
+		self.assertEqual(CardImpose(os.path.join(self.directory.name, "card[1].png")).input_page_count, 1)
+
+if __name__ == '__main__':
+	unittest.main()
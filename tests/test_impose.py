@@ -1,6 +1,14 @@
+import contextlib
 import fitz
+import io
+import os
+import pathlib
+import tempfile
 import unittest
+import unittest.mock
 from cardimpose.cardimpose import CardImpose
+from cardimpose.cli import parse_args, run
+from cardimpose.layout import Mode, Backside
 from cardimpose.parse import parse_length
 
 class ResultAnalyzer:
@@ -99,4 +107,135 @@ class TestImpose(unittest.TestCase):
 			.fill_page()
 		analyzer = ResultAnalyzer(doc)
 		analyzer.check_margin(parse_length("15mm"))
-		analyzer.check_rows_cols(4,1)
\ No newline at end of file
+		analyzer.check_rows_cols(4,1)
+
+	def test_mixed_sizes(self):
+		card = fitz.open("tests/card.pdf")
+		card.new_page(width=100, height=100)
+		card.insert_pdf(fitz.open("tests/card.pdf"))
+		card.new_page(width=100, height=100)
+		with tempfile.TemporaryDirectory() as directory:
+			path = os.path.join(directory, "mixed.pdf")
+			card.save(path)
+			impose = CardImpose(path).set_mode(Mode.SINGLES)
+		with self.assertRaises(RuntimeError) as error:
+			impose.impose(2, 2)
+		# all mismatching pages are reported at once
+		self.assertIn("page 2", str(error.exception))
+		self.assertIn("page 4", str(error.exception))
+
+	def test_shared_card(self):
+		doc = CardImpose("tests/card.pdf").set_pages("2x1").impose(2, 2)
+		# both sheets reference the same embedded card and the same crop marks
+		xobjects = [[xobject for xobject in doc.get_page_xobjects(page) if xobject[2] == 0] for page in range(doc.page_count)]
+		self.assertEqual(len(xobjects[0]), 2)
+		self.assertEqual(xobjects[0], xobjects[1])
+		self.assertEqual(doc.load_page(0).read_contents().count(b" Do "), 5)
+
+	def test_no_crop_marks(self):
+		doc = CardImpose("tests/card.pdf").set_crop_marks(disable_crop_marks=True).impose(2, 2)
+		self.assertEqual(doc.load_page(0).get_drawings(), [])
+
+	def test_impose_to(self):
+		impose = CardImpose("tests/card.pdf").set_pages("5x1")
+		expected = impose.impose(2, 2)
+		with tempfile.TemporaryDirectory() as directory:
+			path = os.path.join(directory, "out.pdf")
+			self.assertEqual(impose.impose_to(path, 2, 2, chunk_size=2), [path])
+			doc = fitz.open(path)
+			self.assertEqual(doc.page_count, expected.page_count)
+			for page in range(doc.page_count):
+				self.assertEqual(doc[page].get_pixmap().samples, expected[page].get_pixmap().samples)
+
+	def test_impose_to_split(self):
+		impose = CardImpose("tests/card.pdf").set_pages("5x1")
+		with tempfile.TemporaryDirectory() as directory:
+			paths = impose.impose_to(os.path.join(directory, "out.pdf"), 2, 2, chunk_size=2, split=True)
+			self.assertEqual([os.path.basename(path) for path in paths], ["out_1.pdf", "out_2.pdf", "out_3.pdf"])
+			self.assertEqual([fitz.open(path).page_count for path in paths], [2, 2, 1])
+			paths = impose.impose_to(pathlib.Path(directory, "path.pdf"), 2, 2, chunk_size=2, split=True)
+			self.assertEqual([os.path.basename(path) for path in paths], ["path_1.pdf", "path_2.pdf", "path_3.pdf"])
+
+			# --split decides the size of the files, also with a chunk size
+			paths = run(parse_args(["tests/card.pdf", "--pages", "5x1", "--nup", "2x2", "-o", os.path.join(directory, "cli.pdf"), "--split", "2", "--chunk-size", "1"]))
+			self.assertEqual([fitz.open(path).page_count for path in paths], [2, 2, 1])
+
+			with self.assertRaises(ValueError):
+				impose.impose_to(os.path.join(directory, "out.pdf"), 2, 2, chunk_size=-1)
+			for option in ["--split", "--chunk-size"]:
+				with self.assertRaises(SystemExit), contextlib.redirect_stderr(io.StringIO()):
+					parse_args(["tests/card.pdf", option, "0"])
+				with self.assertRaises(SystemExit), contextlib.redirect_stderr(io.StringIO()):
+					parse_args(["tests/card.pdf", option, "2", "--jobs", "2"])
+
+	def test_parallel(self):
+		impose = CardImpose("tests/card.pdf").set_pages("12x1").set_mode(Mode.SINGLES).set_backside(Backside.ALTERNATING)
+		expected = impose.impose(1, 2)
+		doc = impose.set_jobs(2).impose(1, 2)
+		self.assertEqual(doc.page_count, expected.page_count)
+		for page in range(doc.page_count):
+			self.assertEqual(doc[page].get_pixmap().samples, expected[page].get_pixmap().samples)
+
+	def test_output_preset(self):
+		impose = CardImpose("tests/card.pdf").set_pages("10x1")
+		doc = impose.impose(2, 2)
+		sizes = dict()
+		with tempfile.TemporaryDirectory() as directory:
+			for preset in ["none", "small"]:
+				path = os.path.join(directory, f"{preset}.pdf")
+				impose.set_output_preset(preset).save(doc, path)
+				sizes[preset] = os.path.getsize(path)
+				self.assertEqual(fitz.open(path).page_count, 10)
+		self.assertLess(sizes["small"], sizes["none"])
+
+		with self.assertRaises(ValueError):
+			impose.set_output_preset("tiny")
+
+	def test_partial_backside(self):
+		# the last backside sheet starts with an empty slot
+		doc = CardImpose("tests/card.pdf").set_pages("10x1").set_mode(Mode.SINGLES).set_backside(Backside.ALTERNATING).impose(2, 2)
+		self.assertEqual(doc.page_count, 4)
+
+	def test_in_memory(self):
+		with open("tests/card.pdf", "rb") as file:
+			data = file.read()
+		expected = CardImpose("tests/card.pdf").set_pages("5x1").impose(2, 2)
+
+		with open("tests/card.pdf", "rb") as file:
+			sources = [data, memoryview(data), io.BytesIO(data), file]
+			imposes = [CardImpose(card).set_pages("5x1") for card in sources]
+		for impose in imposes:
+			doc = fitz.open("pdf", impose.impose_to_bytes(2, 2))
+			self.assertEqual(doc.page_count, expected.page_count)
+			self.assertEqual(doc[0].get_pixmap().samples, expected[0].get_pixmap().samples)
+
+		# the pdf is passed to worker processes as well
+		doc = CardImpose(data).set_pages("5x1").set_jobs(2).impose(2, 2)
+		self.assertEqual(doc.page_count, expected.page_count)
+
+		buffer = io.BytesIO()
+		CardImpose(data).impose_to(buffer, 2, 2)
+		self.assertEqual(fitz.open("pdf", buffer.getvalue()).page_count, 1)
+		with self.assertRaises(ValueError):
+			CardImpose(data).impose_to(buffer, 2, 2, split=True)
+
+		# file objects are written through, even if they have a name
+		with tempfile.TemporaryFile() as file:
+			file.write(b"%")
+			CardImpose(data).impose_to(file, 2, 2)
+			file.seek(1)
+			self.assertEqual(fitz.open("pdf", file.read()).page_count, 1)
+
+	def test_memory_mapped(self):
+		with tempfile.TemporaryFile() as file:
+			with open("tests/card.pdf", "rb") as card:
+				file.write(card.read())
+			file.seek(0)
+			with unittest.mock.patch("cardimpose.source.MMAP_THRESHOLD", 0):
+				impose = CardImpose(file)
+			self.assertIsInstance(impose.card_data, memoryview)
+			self.assertEqual(impose.impose(2, 2).page_count, 1)
+
+	def test_invalid_data(self):
+		with self.assertRaises(RuntimeError):
+			CardImpose(b"no pdf")
@@ -0,0 +1,53 @@
+import fitz
+import os
+import pathlib
+import tempfile
+import unittest
+from cardimpose.cardimpose import CardImpose
+from cardimpose.source import page_hashes
+from cardimpose.layout import Mode
+
+def write_deck(path, changed=None):
+	document = fitz.open()
+	for number in range(6):
+		page = document.new_page(width=150, height=100)
+		page.insert_text((20, 50), f"Card {number + 1}" + (" (fixed)" if number == changed else ""))
+	document.save(path)
+
+class IncrementalTest(unittest.TestCase):
+	def test_page_hashes(self):
+		with tempfile.TemporaryDirectory() as directory:
+			path = os.path.join(directory, "deck.pdf")
+			write_deck(path)
+			hashes = page_hashes(fitz.open(path))
+			self.assertEqual(len(set(hashes)), 6)
+
+			# the hashes do not depend on the xref numbers
+			fitz.open(path).save(os.path.join(directory, "copy.pdf"), garbage=4)
+			self.assertEqual(page_hashes(fitz.open(os.path.join(directory, "copy.pdf"))), hashes)
+
+			write_deck(path, changed=4)
+			changed = page_hashes(fitz.open(path))
+			self.assertEqual([number for number in range(6) if hashes[number] != changed[number]], [4])
+
+	def test_impose_incremental(self):
+		with tempfile.TemporaryDirectory() as directory:
+			path = os.path.join(directory, "deck.pdf")
+			output = os.path.join(directory, "out.pdf")
+			write_deck(path)
+
+			self.assertEqual(CardImpose(path).set_mode(Mode.SINGLES).impose_incremental(output, 2, 2), [0, 1])
+			self.assertEqual(CardImpose(path).set_mode(Mode.SINGLES).impose_incremental(output, 2, 2), [])
+			# the same output given as a pathlib.Path
+			self.assertEqual(CardImpose(path).set_mode(Mode.SINGLES).impose_incremental(pathlib.Path(output), 2, 2), [])
+
+			write_deck(path, changed=4)
+			self.assertEqual(CardImpose(path).set_mode(Mode.SINGLES).impose_incremental(output, 2, 2), [1])
+			expected = CardImpose(path).set_mode(Mode.SINGLES).impose(2, 2)
+			doc = fitz.open(output)
+			self.assertEqual(doc.page_count, expected.page_count)
+			for page in range(doc.page_count):
+				self.assertEqual(doc[page].get_pixmap().samples, expected[page].get_pixmap().samples)
+
+			# a different layout imposes everything again
+			self.assertEqual(CardImpose(path).set_mode(Mode.SINGLES).impose_incremental(output, 1, 2), [0, 1, 2])
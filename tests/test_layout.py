@@ -1,4 +1,6 @@
 from cardimpose.layout import *
+from cardimpose.parse import parse_page_spec
+import unittest
 
 class LayoutGeneratorTest(unittest.TestCase):
 	def test_duplicate_singlesided(self):
@@ -61,6 +63,42 @@ class LayoutGeneratorTest(unittest.TestCase):
 		self.assertEqual(layout[2], [8,None,None,None])
 		self.assertEqual(layout[3], [None,9,None,None])
 
+	def test_cut_and_stack(self):
+		pages = parse_page_spec("1-10", 10)
+		layout = list(generate_layout(pages, 2, 2, Mode.SINGLES, Backside.SINGLESIDED, "cut-and-stack"))
+		# the piles of each slot are in order after cutting the stack of sheets
+		self.assertEqual(layout, [[0,3,6,9], [1,4,7,None], [2,5,8,None]])
+
+		pages = parse_page_spec("1-12", 12)
+		layout = list(generate_layout(pages, 2, 2, Mode.SINGLES, Backside.ALTERNATING, "cut-and-stack"))
+		# the backsides take the positions of their front sides, flipped horizontally
+		self.assertEqual(layout[0], [0,4,8,None])
+		self.assertEqual(layout[1], [5,1,None,9])
+		self.assertEqual(layout[2], [2,6,10,None])
+		self.assertEqual(layout[3], [7,3,None,11])
+
+	def test_custom_ordering(self):
+		pages = parse_page_spec("1-5", 5)
+		reverse = lambda count, cards_per_sheet: range(count - 1, -1, -1)
+		layout = list(generate_layout(pages, 1, 3, Mode.SINGLES, Backside.SINGLESIDED, reverse))
+		self.assertEqual(layout, [[4,3,2], [1,0,None]])
+
+		with self.assertRaises(ValueError):
+			list(generate_layout(pages, 1, 3, Mode.SINGLES, Backside.SINGLESIDED, lambda count, cards_per_sheet: [0] * count))
+		with self.assertRaises(ValueError):
+			# the first sheet stays empty
+			list(generate_layout(pages, 1, 3, Mode.SINGLES, Backside.SINGLESIDED, lambda count, cards_per_sheet: range(3, 3 + count)))
+		with self.assertRaises(ValueError):
+			list(generate_layout(pages, 1, 3, Mode.SINGLES, Backside.SINGLESIDED, "random"))
+
+	def test_grid(self):
+		grid = LayoutGrid.arrange(parse_page_spec("1-10", 10), 2, 3)
+		self.assertEqual(grid.shape, (2, 2, 3))
+		self.assertEqual(grid.flipped().sheet(1), [8,7,6,None,None,9])
+		# equal sheets are the same list
+		sheets = list(LayoutGrid.arrange(parse_page_spec("8x1", 1), 2, 2))
+		self.assertIs(sheets[0], sheets[1])
+
 	def test_wrong_format(self):
 		pages = parse_page_spec("1-9", 9)
 		with self.assertRaises(RuntimeError):
@@ -0,0 +1,42 @@
+import json
+import os
+import tempfile
+import unittest
+from cardimpose.cardimpose import CardImpose
+from cardimpose.cli import parse_args, run
+from cardimpose.layout import Mode
+from cardimpose.metrics import Profiler
+
+class MetricsTest(unittest.TestCase):
+	def test_observer(self):
+		calls = []
+		impose = CardImpose("tests/card.pdf").set_pages("6x1").set_mode(Mode.SINGLES).add_observer(lambda *call: calls.append(call))
+		impose.impose(2, 2)
+
+		phases = [phase for phase, seconds, sheet in calls]
+		self.assertEqual(phases[0], "open")
+		for phase in ["bleed_detection", "layout", "embedding", "placement", "crop_marks"]:
+			self.assertIn(phase, phases)
+		self.assertEqual({sheet for phase, seconds, sheet in calls if phase == "placement"}, {0, 1})
+
+	def test_profiler(self):
+		profiler = Profiler()
+		impose = CardImpose("tests/card.pdf").set_pages("6x1").set_mode(Mode.SINGLES).add_observer(profiler)
+		with tempfile.TemporaryDirectory() as directory:
+			impose.impose_to(os.path.join(directory, "out.pdf"), 2, 2, chunk_size=1)
+
+		metrics = profiler.to_dict()
+		self.assertEqual(metrics["phases"]["save"]["count"], 2)
+		self.assertEqual([sheet["sheet"] for sheet in metrics["sheets"]], [0, 1])
+		counters = {(counter["name"], tuple(counter["labels"].values())): counter["value"] for counter in metrics["counters"]}
+		self.assertEqual(counters[("cardimpose_phase_calls_total", ("placement",))], 2)
+		self.assertEqual(counters[("cardimpose_sheets_total", ())], 2)
+
+	def test_profile_option(self):
+		with tempfile.TemporaryDirectory() as directory:
+			profile = os.path.join(directory, "profile.json")
+			run(parse_args(["tests/card.pdf", "--nup", "2x2", "-o", os.path.join(directory, "out.pdf"), "--profile", profile]))
+			with open(profile) as file:
+				metrics = json.load(file)
+		self.assertIn("save", metrics["phases"])
+		self.assertGreater(metrics["seconds"], 0)
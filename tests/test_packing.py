@@ -0,0 +1,75 @@
+import fitz
+import os
+import tempfile
+import time
+import unittest
+from cardimpose.cardimpose import CardImpose
+from cardimpose.cropmarks import clip_lines
+from cardimpose.layout import Mode, Backside
+from cardimpose.packing import pack
+
+def write_mixed_deck(path, sizes):
+	document = fitz.open()
+	for width, height in sizes:
+		page = document.new_page(width=width, height=height)
+		page.set_trimbox(fitz.Rect(5, 5, width - 5, height - 5))
+		page.draw_rect(page.rect, fill=(0.5, 0.5, 0.5))
+	document.save(path)
+
+class PackingTest(unittest.TestCase):
+	def assertNoOverlaps(self, rects, bounds):
+		for index, rect in enumerate(rects):
+			self.assertTrue(rect in bounds, rect)
+			for other in rects[:index]:
+				self.assertLess((rect & other).get_area(), 1e-6, (rect, other))
+
+	def test_pack(self):
+		placements = pack([(60, 40), (60, 40), (40, 60), (100, 20)], 100, 100)
+		self.assertEqual({sheet for sheet, _, _, _ in placements}, {0})
+		rects = [fitz.Rect(x, y, x + (h if rotated else w), y + (w if rotated else h)) for (sheet, x, y, rotated), (w, h) in zip(placements, [(60, 40), (60, 40), (40, 60), (100, 20)])]
+		self.assertNoOverlaps(rects, fitz.Rect(0, 0, 100, 100))
+
+		# the card only fits when rotated
+		self.assertTrue(pack([(120, 50)], 100, 150)[0][3])
+		with self.assertRaises(RuntimeError):
+			pack([(120, 50)], 100, 100)
+
+	def test_mixed_sizes(self):
+		with tempfile.TemporaryDirectory() as directory:
+			path = os.path.join(directory, "mixed.pdf")
+			write_mixed_deck(path, [(258, 173), (437, 315), (159, 102), (196, 266)] * 50)
+
+			start = time.perf_counter()
+			impose = CardImpose(path).set_mode(Mode.PACKED).set_gutter("2mm")
+			plan = impose.plan()
+			self.assertLess(time.perf_counter() - start, 5)
+
+			self.assertEqual(plan.card_count, 200)
+			# at least as many sheets as the area of the cards requires
+			self.assertLess(plan.sheet_count, 2 * plan.card_count / plan.cards_per_sheet)
+			for sheet in plan.sheets:
+				rects = [fitz.Rect(slot.rect) for slot in sheet.slots]
+				self.assertNoOverlaps([rect + (0, 0, impose.gutter_x - 0.001, impose.gutter_y - 0.001) for rect in rects], fitz.Rect(impose.margin_x, impose.margin_y, plan.sheet_size[0] - impose.margin_x + impose.gutter_x, plan.sheet_size[1] - impose.margin_y + impose.gutter_y))
+
+				# no crop mark runs through a card
+				lines = plan.crop_marks[sheet.crop_marks]
+				length = lambda lines: sum(abs(x2 - x1) + abs(y2 - y1) for (x1, y1), (x2, y2) in lines)
+				self.assertAlmostEqual(length(clip_lines(lines, rects)), length(lines))
+
+			doc = impose.render(plan)
+			self.assertEqual(doc.page_count, plan.sheet_count)
+
+	def test_backsides(self):
+		with tempfile.TemporaryDirectory() as directory:
+			path = os.path.join(directory, "mixed.pdf")
+			write_mixed_deck(path, [(258, 173), (258, 173), (437, 315), (437, 315)])
+			plan = CardImpose(path).set_mode(Mode.PACKED).set_backside(Backside.ALTERNATING).plan()
+			self.assertEqual([sheet.back for sheet in plan.sheets], [False, True])
+			front, back = plan.sheets
+			for front_slot, back_slot in zip(front.slots, back.slots):
+				self.assertEqual(back_slot.page, front_slot.page + 1)
+				self.assertAlmostEqual(back_slot.rect[0], plan.sheet_size[0] - front_slot.rect[2])
+
+			write_mixed_deck(path, [(258, 173), (437, 315)])
+			with self.assertRaises(RuntimeError):
+				CardImpose(path).set_mode(Mode.PACKED).set_backside(Backside.ALTERNATING).plan()
@@ -0,0 +1,50 @@
+import itertools
+import unittest
+from cardimpose.cardimpose import CardImpose
+from cardimpose.layout import Mode, Backside, generate_layout
+from cardimpose.pages import PageSequence
+from cardimpose.parse import parse_page_spec
+
+class PageSequenceTest(unittest.TestCase):
+	def test_runs(self):
+		pages = parse_page_spec("5000x1,3000x2", 2)
+		self.assertEqual(len(pages), 8000)
+		self.assertEqual(pages.to_list(), [[0, 1, 1, 5000], [1, 2, 1, 3000]])
+		self.assertEqual(pages[4999], 0)
+		self.assertEqual(pages[5000], 1)
+		self.assertEqual(pages[-1], 1)
+
+		# huge quantities do not expand the runs
+		self.assertEqual(len(parse_page_spec("1000000000x1", 1).runs), 1)
+		self.assertEqual(parse_page_spec("1,2,3,4", 4).to_list(), [[0, 4, 1, 1]])
+		self.assertEqual(parse_page_spec("3-1,2x2", 3).shifted(10), [12, 11, 10, 11, 11])
+
+	def test_slicing(self):
+		pages = parse_page_spec("1-7,3x2,4,4,9-5,.", 10)
+		expected = list(pages)
+		self.assertEqual(len(expected), 27)
+		for start, stop, step in itertools.product([None, 0, 3, 8, -1, -7], [None, 0, 5, 9, -2], [None, 1, 2, 3, -1, -2]):
+			self.assertEqual(list(pages[start:stop:step]), expected[start:stop:step], (start, stop, step))
+		self.assertEqual(pages, expected)
+
+	def test_identical_sheets(self):
+		layout = list(generate_layout(parse_page_spec("3x1,2", 2), 2, 2, Mode.DUPLICATES, Backside.SINGLESIDED))
+		self.assertEqual(layout, [[0] * 4] * 3 + [[1] * 4])
+		self.assertIs(layout[0], layout[2])
+
+		plan = CardImpose("tests/card.pdf").set_pages(PageSequence.repeat(0, 20)).plan(2, 2)
+		self.assertEqual(plan.sheet_count, 20)
+		self.assertEqual(len({id(sheet) for sheet in plan.sheets}), 1)
+
+	def test_shared_content(self):
+		doc = CardImpose("tests/card.pdf").set_pages("20x1").impose(2, 2)
+		self.assertEqual(doc.page_count, 20)
+		contents = {doc.xref_get_key(page.xref, "Contents") for page in doc}
+		self.assertEqual(len(contents), 1)
+
+		with self.assertRaises(ValueError):
+			CardImpose("tests/card.pdf").set_pages(PageSequence([0, 1]))
+		with self.assertRaises(ValueError):
+			# the stop of the range is not its last page
+			CardImpose("examples/flash_cards.pdf").set_pages(PageSequence(range(1, 18, 3)))
+		self.assertEqual(len(CardImpose("examples/flash_cards.pdf").set_pages(PageSequence(range(0, 16, 3))).pages), 6)
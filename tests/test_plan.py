@@ -0,0 +1,52 @@
+import unittest
+from cardimpose.cardimpose import CardImpose
+from cardimpose.layout import Mode, Backside
+from cardimpose.plan import ImpositionPlan
+
+class PlanTest(unittest.TestCase):
+	def test_summary(self):
+		plan = CardImpose("tests/card.pdf").set_pages("10x1").set_mode(Mode.SINGLES).plan(2, 2)
+		self.assertEqual(plan.summary()["sheets"], 3)
+		self.assertEqual(plan.summary()["cards"], 10)
+		self.assertEqual(plan.summary()["cards_per_sheet"], 4)
+		self.assertEqual([len(sheet.slots) for sheet in plan.sheets], [4, 4, 2])
+		self.assertGreater(plan.utilisation, 0)
+		self.assertLess(plan.utilisation, 1)
+
+	def test_backsides(self):
+		plan = CardImpose("tests/card.pdf").set_pages("8x1").set_mode(Mode.SINGLES).set_backside(Backside.ALTERNATING).plan(2, 2)
+		self.assertEqual([sheet.back for sheet in plan.sheets], [False, True])
+
+	def test_ordering(self):
+		impose = CardImpose("examples/flash_cards.pdf").set_pages("1-6").set_mode(Mode.SINGLES).set_ordering("cut-and-stack")
+		plan = impose.plan(2, 2)
+		self.assertEqual([[slot.page for slot in sheet.slots] for sheet in plan.sheets], [[0, 2, 4], [1, 3, 5]])
+		self.assertNotEqual(impose.settings(2, 2), impose.copy().set_ordering("sequential").settings(2, 2))
+
+		reverse = impose.copy().set_ordering(lambda count, size: range(count - 1, -1, -1))
+		identity = impose.copy().set_ordering(lambda count, size: range(count))
+		self.assertNotEqual(reverse.settings(2, 2), identity.settings(2, 2))
+
+		with self.assertRaises(ValueError):
+			impose.set_ordering("shuffled")
+		with self.assertRaises(ValueError):
+			impose.set_mode(Mode.PACKED).plan()
+
+	def test_no_side_effects(self):
+		impose = CardImpose("tests/card.pdf").set_bleed("2mm")
+		distance = impose.crop_mark_distance
+		plan = impose.plan(2, 2)
+		self.assertEqual(impose.crop_mark_distance, distance)
+		self.assertEqual(plan.bleed, impose.bleed)
+
+	def test_json(self):
+		impose = CardImpose("tests/card.pdf").set_pages("5x1").set_mode(Mode.SINGLES)
+		plan = impose.plan(2, 2)
+		loaded = ImpositionPlan.from_json(plan.to_json())
+		self.assertEqual(loaded.to_dict(), plan.to_dict())
+
+		# rendering the deserialized plan gives the same document
+		expected = impose.render(plan)
+		doc = impose.render(loaded)
+		for page in range(doc.page_count):
+			self.assertEqual(doc[page].get_pixmap().samples, expected[page].get_pixmap().samples)
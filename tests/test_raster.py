@@ -0,0 +1,67 @@
+import fitz
+import os
+import pathlib
+import tempfile
+import unittest
+from unittest import mock
+from cardimpose.cardimpose import CardImpose
+from cardimpose.cache import ResultCache
+from cardimpose import raster
+
+class RasterTest(unittest.TestCase):
+	def assertPixmapsClose(self, first, second):
+		self.assertEqual((first.width, first.height), (second.width, second.height))
+		# anti-aliasing may differ slightly along the edges of the bands
+		different = sum(a != b for a, b in zip(first.samples, second.samples))
+		self.assertLess(different, len(first.samples) / 1000)
+
+	def test_images(self):
+		impose = CardImpose("tests/card.pdf").set_pages("1,1")
+		with tempfile.TemporaryDirectory() as directory:
+			path = os.path.join(directory, "cards.pdf")
+			expected = impose.fill_page()[0].get_pixmap(dpi=96, alpha=False)
+
+			for format in ["png", "tiff"]:
+				# small bands, so that every image consists of many of them
+				with mock.patch.object(raster, "BAND_PIXELS", 5000):
+					paths = impose.impose_to_images(path, dpi=96, format=format)
+				self.assertEqual([os.path.basename(path) for path in paths], [f"cards_0001.{format}", f"cards_0002.{format}"])
+				image = fitz.Pixmap(paths[0])
+				self.assertEqual(image.xres, 96)
+				self.assertPixmapsClose(image, expected)
+				# identical sheets are rendered once and copied
+				with open(paths[0], "rb") as first, open(paths[1], "rb") as second:
+					self.assertEqual(first.read(), second.read())
+
+			paths = impose.impose_to_images(pathlib.Path(directory, "path.pdf"), dpi=30)
+			self.assertEqual([os.path.basename(path) for path in paths], ["path_0001.png", "path_0002.png"])
+
+	def test_parallel(self):
+		impose = CardImpose("examples/flash_cards.pdf").set_pages("1-4")
+		with tempfile.TemporaryDirectory() as directory:
+			serial = impose.impose_to_images(os.path.join(directory, "serial.pdf"), dpi=30)
+			parallel = impose.copy().set_jobs(2).impose_to_images(os.path.join(directory, "parallel.pdf"), dpi=30)
+			for first, second in zip(serial, parallel):
+				with open(first, "rb") as a, open(second, "rb") as b:
+					self.assertEqual(a.read(), b.read())
+
+	def test_thumbnails(self):
+		with tempfile.TemporaryDirectory() as directory:
+			cache = ResultCache(os.path.join(directory, "cache"))
+			impose = CardImpose("examples/flash_cards.pdf").set_pages("1-4").set_cache(cache)
+			paths = impose.impose_to_images(os.path.join(directory, "cards.pdf"), dpi=raster.THUMBNAIL_DPI, thumbnails=True)
+			self.assertEqual(cache.stats()["misses"], 4)
+			self.assertEqual(cache.stats()["entries"], 4)
+
+			# changing a sheet only renders its thumbnail again
+			impose.set_pages("1-3,5")
+			again = impose.impose_to_images(os.path.join(directory, "cards.pdf"), dpi=raster.THUMBNAIL_DPI, thumbnails=True)
+			self.assertEqual(cache.stats()["hits"], 3)
+			self.assertEqual(cache.stats()["misses"], 5)
+			self.assertEqual(again, paths)
+
+			with self.assertRaises(ValueError):
+				impose.impose_to_images(os.path.join(directory, "cards.pdf"), format="tiff", thumbnails=True)
+
+if __name__ == '__main__':
+	unittest.main()
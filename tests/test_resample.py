@@ -0,0 +1,98 @@
+import contextlib
+import fitz
+import io
+import os
+import tempfile
+import unittest
+from cardimpose.cardimpose import CardImpose
+from cardimpose.cache import ResultCache
+from cardimpose.cli import parse_args
+from cardimpose.resample import resample_images
+
+def card_pdf() -> bytes:
+	# two 2.5x3.5in cards showing the same 600 dpi image, the second one with a soft mask
+	image = fitz.Pixmap(fitz.csRGB, fitz.IRect(0, 0, 1500, 2100), False)
+	image.clear_with(200)
+	for step in range(50):
+		image.set_rect(fitz.IRect(step * 30, step * 40, step * 30 + 200, step * 40 + 100), (step * 5, 255 - step * 5, 100))
+	mask = fitz.Pixmap(fitz.csGRAY, fitz.IRect(0, 0, 1500, 2100), False)
+	mask.clear_with(128)
+
+	card = fitz.open()
+	page = card.new_page(width=180, height=252)
+	page.insert_image(page.rect, stream=image.tobytes("png"))
+	page = card.new_page(width=180, height=252)
+	page.insert_image(page.rect, pixmap=fitz.Pixmap(image, mask))
+	return card.tobytes()
+
+class ResampleTest(unittest.TestCase):
+	def setUp(self):
+		self.card = card_pdf()
+
+	def images(self, data):
+		card = fitz.open("pdf", data)
+		return [(info["width"], info["height"]) for page in card for info in page.get_image_info()]
+
+	def test_resample(self):
+		original = fitz.open("pdf", self.card)
+		for quality in [85, "lossless"]:
+			data, stats = resample_images(self.card, 150, quality)
+			# 2.5in at 150 dpi, the soft mask is scaled along with its image
+			self.assertEqual(self.images(data), [(375, 525), (375, 525)])
+			self.assertEqual((stats.images, stats.resampled), (2, 3))
+			self.assertLess(len(data), len(self.card) / 10)
+
+			card = fitz.open("pdf", data)
+			smask = card.xref_get_key(card[1].get_images()[0][0], "SMask")
+			self.assertEqual(smask[0], "xref")
+			for number in range(2):
+				expected = original[number].get_pixmap(dpi=36)
+				pixmap = card[number].get_pixmap(dpi=36)
+				difference = sum(abs(a - b) for a, b in zip(expected.samples, pixmap.samples)) / len(pixmap.samples)
+				self.assertLess(difference, 2)
+
+		# images shown at a lower resolution are kept
+		data, stats = resample_images(self.card, 1200)
+		self.assertEqual(stats.resampled, 0)
+		self.assertEqual(self.images(data), self.images(self.card))
+
+		with self.assertRaises(ValueError):
+			resample_images(self.card, 150, 0)
+		for max_dpi in [0, -100]:
+			with self.assertRaises(ValueError):
+				resample_images(self.card, max_dpi)
+			with self.assertRaises(SystemExit), contextlib.redirect_stderr(io.StringIO()):
+				parse_args(["tests/card.pdf", "--max-dpi", str(max_dpi)])
+		with self.assertRaises(SystemExit), contextlib.redirect_stderr(io.StringIO()):
+			parse_args(["tests/card.pdf", "--image-quality", "50"])
+
+	def test_parallel(self):
+		serial, _ = resample_images(self.card, 100)
+		parallel, _ = resample_images(self.card, 100, jobs=2)
+		serial, parallel = fitz.open("pdf", serial), fitz.open("pdf", parallel)
+		for number in range(2):
+			self.assertEqual(serial[number].get_image_info(hashes=True), parallel[number].get_image_info(hashes=True))
+
+	def test_impose(self):
+		with tempfile.TemporaryDirectory() as directory:
+			cache = ResultCache(os.path.join(directory, "cache"))
+			impose = CardImpose(self.card).set_cache(cache)
+			settings = impose.settings()
+			self.assertEqual(impose.downsample_images(150).resampled, 3)
+			self.assertNotEqual(impose.settings(), settings)
+			self.assertEqual(set(self.images(impose.fill_page().tobytes())), {(375, 525)})
+
+			# the resampled images are taken from the cache
+			hits = cache.stats()["hits"]
+			again = CardImpose(self.card).set_cache(cache)
+			again.downsample_images(150)
+			self.assertEqual(cache.stats()["hits"], hits + 3)
+			self.assertEqual(again.card_hash, impose.card_hash)
+
+			with self.assertRaises(RuntimeError):
+				impose.downsample_images(100)
+			with self.assertRaises(ValueError):
+				CardImpose(self.card).downsample_images(150, "best")
+
+if __name__ == '__main__':
+	unittest.main()
@@ -0,0 +1,100 @@
+import fitz
+import http.client
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import unittest
+from cardimpose.serve import ImpositionService, create_server
+
+class ServeTest(unittest.TestCase):
+	@classmethod
+	def setUpClass(cls):
+		cls.service = ImpositionService(workers=1, timeout=30)
+		cls.server = create_server(cls.service, port=0)
+		threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+		with open("tests/card.pdf", "rb") as file:
+			cls.card = file.read()
+
+	@classmethod
+	def tearDownClass(cls):
+		cls.server.shutdown()
+		cls.server.server_close()
+		cls.service.close()
+
+	def request(self, method, path, body=None):
+		connection = http.client.HTTPConnection("127.0.0.1", self.server.server_port)
+		connection.request(method, path, body)
+		response = connection.getresponse()
+		result = (response.status, response.read())
+		connection.close()
+		return result
+
+	def test_impose(self):
+		for _ in range(2):
+			status, body = self.request("POST", "/impose?nup=2x2&no-crop-marks=true", self.card)
+			self.assertEqual(status, 200)
+			doc = fitz.open("pdf", body)
+			self.assertEqual(doc.page_count, 1)
+			self.assertEqual(doc[0].get_drawings(), [])
+
+		status, body = self.request("GET", "/metrics")
+		self.assertEqual(status, 200)
+		metrics = body.decode()
+		self.assertIn("cardimpose_queue_depth 0", metrics)
+		self.assertIn('cardimpose_requests_total{status="200"}', metrics)
+		self.assertIn("cardimpose_card_cache_hits_total", metrics)
+		self.assertIn('cardimpose_request_seconds_bucket{le="+Inf"}', metrics)
+
+	def test_errors(self):
+		status, body = self.request("POST", "/impose?unknown-option=1", self.card)
+		self.assertEqual(status, 400)
+		self.assertIn("unknown-option", json.loads(body)["error"])
+
+		status, body = self.request("POST", "/impose?output=out.pdf", self.card)
+		self.assertEqual(status, 400)
+
+		status, body = self.request("POST", "/impose", b"no pdf")
+		self.assertEqual(status, 400)
+
+		status, body = self.request("GET", "/unknown")
+		self.assertEqual(status, 404)
+
+	def test_abbreviated_options(self):
+		with tempfile.TemporaryDirectory() as directory:
+			foreign = os.path.join(directory, "notes.txt")
+			open(foreign, "w").close()
+			# abbreviations of unsupported options are not accepted either
+			status = self.service.impose({"nup": "2x2", "cache-d": directory, "cache-s": "0"}, self.card)[0]
+			self.assertEqual(status, 400)
+			self.assertEqual(self.service.impose({"job": "32"}, self.card)[0], 400)
+			self.assertTrue(os.path.exists(foreign))
+
+	def test_crashed_worker(self):
+		# a crashed worker breaks the pool, which is replaced for the following requests
+		crash = self.service.executor.submit(os._exit, 1)
+		self.assertIsNotNone(crash.exception())
+		self.assertEqual(self.service.impose({"nup": "2x2"}, self.card)[0], 200)
+		self.assertEqual(self.service.impose({"nup": "2x2"}, self.card)[0], 200)
+
+	def test_replaced_workers(self):
+		# the workers of a replaced pool are terminated, even if they are stuck
+		executor = self.service.executor
+		pid = executor.submit(os.getpid).result()
+		executor.submit(time.sleep, 60)
+		self.service._replace_pool(executor)
+		for _ in range(50):
+			if not os.path.exists(f"/proc/{pid}"):
+				break
+			time.sleep(0.1)
+		self.assertFalse(os.path.exists(f"/proc/{pid}"))
+		self.assertEqual(self.service.impose({"nup": "2x2"}, self.card)[0], 200)
+
+	def test_without_posix(self):
+		# the server can be used without the resource module and alarms, e.g. on Windows
+		code = "import signal, sys; sys.modules['resource'] = None; del signal.setitimer; import cardimpose.serve as serve; print(serve.HAS_ALARM, serve.resource)"
+		result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True)
+		self.assertEqual(result.stdout.strip().splitlines()[-1], "False None")
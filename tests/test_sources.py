@@ -0,0 +1,66 @@
+import fitz
+import os
+import tempfile
+import unittest
+from cardimpose.cardimpose import CardImpose
+from cardimpose.cli import parse_args, parse_card
+from cardimpose.layout import Mode
+from cardimpose.sources import CardDeck
+
+def write_card(path, text):
+	card = fitz.open()
+	page = card.new_page(width=180, height=252)
+	page.insert_text((20, 50), text)
+	card.save(path)
+
+class SourcesTest(unittest.TestCase):
+	def setUp(self):
+		self.directory = tempfile.TemporaryDirectory()
+		self.paths = []
+		for number in range(20):
+			self.paths.append(os.path.join(self.directory.name, f"card{number}.pdf"))
+			write_card(self.paths[-1], f"card {number}")
+
+	def tearDown(self):
+		self.directory.cleanup()
+
+	def test_deck(self):
+		deck = CardDeck([("examples/flash_cards.pdf", "2,1"), "tests/card.pdf", ("examples/flash_cards.pdf", "3x4")], max_open=2)
+		self.assertEqual(deck.page_count, 33)
+		self.assertEqual(list(deck.pages()), [1, 0, 16, 20, 20, 20])
+		self.assertEqual(deck.locate(16), (1, 0))
+		self.assertEqual(deck.locate(20), (2, 3))
+		# at most two of the card pdfs are kept open
+		self.assertEqual(len(deck.pool.documents), 2)
+
+		with self.assertRaises(RuntimeError):
+			CardDeck(["tests/card.pdf", b"no pdf"])
+
+	def test_impose(self):
+		impose = CardImpose([(path, "1") for path in self.paths]).set_mode(Mode.SINGLES).set_max_open(3)
+		self.assertLessEqual(len(impose.card.pool.documents), 3)
+		self.assertEqual(impose.input_page_count, 20)
+
+		document = impose.fill_page()
+		self.assertLessEqual(len(impose.card.pool.documents), 3)
+		text = "".join(page.get_text() for page in document)
+		self.assertEqual([line for line in text.splitlines()], [f"card {number}" for number in range(20)])
+
+		# the workers open the card pdfs again
+		parallel = impose.copy().set_jobs(2).fill_page()
+		self.assertEqual("".join(page.get_text() for page in parallel), text)
+
+		# equal card pdfs give the same key in the cache
+		self.assertEqual(CardImpose(self.paths).content_hash(), impose.content_hash())
+		self.assertNotEqual(CardImpose(self.paths[::-1]).content_hash(), impose.content_hash())
+
+	def test_command_line(self):
+		self.assertEqual(parse_card("tests/card.pdf"), ("tests/card.pdf", None))
+		self.assertEqual(parse_card("tests/card.pdf:1-3"), ("tests/card.pdf", "1-3"))
+
+		args = parse_args([self.paths[0], f"{self.paths[1]}:3x1", "--mode", "singles"])
+		self.assertEqual(args.card, self.paths[0])
+		self.assertEqual(args.cards, [(self.paths[0], None), (self.paths[1], "3x1")])
+
+if __name__ == '__main__':
+	unittest.main()
@@ -0,0 +1,36 @@
+import subprocess
+import sys
+import unittest
+
+def run_python(*arguments) -> subprocess.CompletedProcess:
+	return subprocess.run([sys.executable, *arguments], capture_output=True, text=True)
+
+def loads_pymupdf(code) -> bool:
+	result = run_python("-c", code + "\nimport sys; print('fitz' in sys.modules or 'pymupdf' in sys.modules)")
+	return result.stdout.strip().splitlines()[-1] == "True"
+
+class StartupTest(unittest.TestCase):
+	def test_lazy_imports(self):
+		self.assertFalse(loads_pymupdf("import cardimpose, cardimpose.cli, cardimpose.parse, cardimpose.layout"))
+		self.assertFalse(loads_pymupdf("from cardimpose.cli import parse_args; parse_args(['card.pdf', '--nup', '2x2', '--bleed', '3mm'])"))
+		self.assertFalse(loads_pymupdf(
+			"from cardimpose.cli import parse_args\n"
+			"try:\n\tparse_args(['card.pdf', '--nup', 'two'])\n"
+			"except SystemExit as e:\n\tprint(e.code)"
+		))
+		self.assertTrue(loads_pymupdf("from cardimpose import CardImpose"))
+
+		# invalid options are rejected by the parser
+		result = run_python("-m", "cardimpose", "card.pdf", "--nup", "two")
+		self.assertEqual(result.returncode, 2)
+		self.assertIn("--nup", result.stderr)
+		self.assertEqual(run_python("-m", "cardimpose", "--help").returncode, 0)
+
+	def test_messages(self):
+		# only the command line redirects the messages of PyMuPDF, away from the document written to stdout
+		result = subprocess.run([sys.executable, "-m", "cardimpose", "tests/card.pdf", "-o", "-"], capture_output=True)
+		self.assertTrue(result.stdout.startswith(b"%PDF"))
+		self.assertEqual(run_python("-c", "import os, cardimpose; print(os.environ.get('PYMUPDF_MESSAGE'))").stdout.strip(), "None")
+
+if __name__ == '__main__':
+	unittest.main()
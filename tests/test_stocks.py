@@ -0,0 +1,63 @@
+import unittest
+from cardimpose.cardimpose import CardImpose
+from cardimpose.layout import Backside
+from cardimpose.parse import parse_prices
+from cardimpose.stocks import stock_size, search_layouts
+
+class StocksTest(unittest.TestCase):
+	def test_stock_size(self):
+		self.assertEqual(stock_size("A4"), (595, 842))
+		self.assertAlmostEqual(stock_size("SRA3")[0], 320 / 25.4 * 72)
+		self.assertAlmostEqual(stock_size("100mmx200mm")[1], 200 / 25.4 * 72)
+		self.assertEqual(parse_prices("A4=0.05, SRA3=0.2"), {"A4": 0.05, "SRA3": 0.2})
+		with self.assertRaises(ValueError):
+			parse_prices("A4")
+
+	def test_card_rotation(self):
+		impose = CardImpose("tests/card.pdf").set_page_size("A4").set_margin("0mm").set_gutter("0mm")
+		self.assertEqual(impose._calculate_nup(), (5, 2))
+		self.assertEqual(impose.set_card_rotation(90)._calculate_nup(), (3, 3))
+
+		plan = impose.set_pages("1,1").set_backside(Backside.ALTERNATING).plan()
+		self.assertEqual({slot.rotation for slot in plan.sheets[0].slots}, {90})
+		# the backs are turned the other way, so that they line up when the sheet is flipped
+		self.assertEqual({slot.rotation for slot in plan.sheets[1].slots}, {270})
+		for slot in plan.sheets[0].slots:
+			x0, y0, x1, y1 = slot.rect
+			self.assertGreater(y1 - y0, x1 - x0)
+
+		with self.assertRaises(ValueError):
+			impose.set_card_rotation(45)
+
+	def test_search_layouts(self):
+		impose = CardImpose("tests/card.pdf").set_pages("20x1")
+		layouts = search_layouts(impose, ["A4", "A3"])
+		self.assertEqual(len(layouts), 8)
+		self.assertEqual(layouts[0].sheets, min(layout.sheets for layout in layouts))
+		self.assertEqual(layouts, sorted(layouts, key=lambda layout: (layout.sheets, -layout.utilisation)))
+
+		# a cheap stock wins even when more sheets are needed
+		layouts = search_layouts(impose, ["A4", "A3"], {"A4": 0.01, "A3": 1.0})
+		self.assertEqual(layouts[0].stock, "A4")
+		self.assertAlmostEqual(layouts[0].cost, 0.01 * layouts[0].sheets)
+		with self.assertRaises(ValueError):
+			search_layouts(impose, ["A4", "A3"], {"A4": 0.01})
+
+		# cards which do not fit onto a stock skip it
+		self.assertEqual({layout.stock for layout in search_layouts(impose, ["A4", "2inx2in"])}, {"A4"})
+		with self.assertRaises(RuntimeError):
+			search_layouts(impose, ["2inx2in"])
+
+	def test_optimize_layout(self):
+		impose = CardImpose("tests/card.pdf").set_pages("20x1")
+		layouts = impose.optimize_layout(["A4", "SRA3"])
+		self.assertEqual(impose.output_size, layouts[0].page_size)
+		self.assertEqual(impose.card_rotation, layouts[0].card_rotation)
+
+		document = impose.fill_page()
+		self.assertEqual(document.page_count, layouts[0].sheets)
+		self.assertAlmostEqual(document[0].rect.width, layouts[0].page_size[0], places=3)
+		self.assertAlmostEqual(document[0].rect.height, layouts[0].page_size[1], places=3)
+
+if __name__ == '__main__':
+	unittest.main()